@@ -0,0 +1,60 @@
+"""One-off migration for databases created before the stage timestamp columns.
+
+    python add_timestamp_columns.py
+
+Adds orders.ready_at, orders.picked_up_at, orders.delivered_at and
+rider_profiles.location_updated_at, creates the indexes declared on the
+models and backfills the stage columns from order_status_history. Safe to
+run again; columns that already exist are left alone. Run it once, before
+starting the new app version.
+"""
+from sqlalchemy import inspect, text
+from sqlmodel import Session
+from database import create_db_and_tables, engine
+from app.models.orders import Order
+from app.models.order_status_history import OrderStatusHistory
+from app.models.rider import RiderProfile
+from app.order_status import backfill_stage_timestamps
+
+# Naive UTC timestamps, see app.models.types.UTCDateTime
+TIMESTAMP_TYPES = {
+    "postgresql": "TIMESTAMP WITHOUT TIME ZONE",
+    "sqlite": "DATETIME",
+}
+
+STATEMENTS = [
+    ("orders", "ready_at", "ALTER TABLE orders ADD COLUMN ready_at {timestamp}"),
+    ("orders", "picked_up_at", "ALTER TABLE orders ADD COLUMN picked_up_at {timestamp}"),
+    ("orders", "delivered_at", "ALTER TABLE orders ADD COLUMN delivered_at {timestamp}"),
+    ("rider_profiles", "location_updated_at", "ALTER TABLE rider_profiles ADD COLUMN location_updated_at {timestamp}"),
+]
+
+
+def add_columns() -> list[str]:
+    timestamp = TIMESTAMP_TYPES[engine.dialect.name]
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as connection:
+        for table, column, statement in STATEMENTS:
+            if not inspector.has_table(table):
+                # create_all makes it with every column
+                continue
+            if column in {existing["name"] for existing in inspector.get_columns(table)}:
+                continue
+            connection.execute(text(statement.format(timestamp=timestamp)))
+            added.append(f"{table}.{column}")
+    return added
+
+
+def main():
+    print("-> Adding stage timestamp columns...")
+    added = add_columns()
+    print(f"-> Added {', '.join(added)}." if added else "-> Nothing to add.")
+    create_db_and_tables()
+    print("-> Backfilling order stage timestamps from status history...")
+    with Session(engine) as session:
+        backfill_stage_timestamps(session)
+    print("-> Migration complete.")
+
+if __name__ == "__main__":
+    main()
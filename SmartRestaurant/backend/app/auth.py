@@ -1,12 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
+import asyncio
+import hashlib
+import os
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 import bcrypt
-from sqlmodel import Session, select
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models.user import User
-from database import engine
+from app.ttl_cache import TTLCache
+from database import get_session
 
 # Configuration
 # In a real app, use environment variables!
@@ -14,7 +22,17 @@ SECRET_KEY = "supersecretkey"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-import bcrypt
+# Resolved users, keyed by user id and checked against the token version
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# bcrypt cost factor for new hashes; stored hashes with another cost are
+# upgraded on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 # pwd_context removed
 
@@ -24,9 +42,24 @@ def verify_password(plain_password, hashed_password):
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def get_password_hash(password):
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
     return hashed.decode('utf-8')
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    # bcrypt hashes look like $2b$<cost>$<salt+hash>
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+async def verify_password_async(plain_password, hashed_password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
@@ -37,29 +70,87 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_session():
-    with Session(engine) as session:
-        yield session
+def token_version(user: User) -> str:
+    # Changes whenever the password, role or email changes, which retires the
+    # user's outstanding tokens and any cached copy of the user
+    raw = f"{user.email}:{user.role}:{user.password_hash}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+def token_claims(user: User) -> dict:
+    return {"sub": user.email, "role": user.role, "uid": user.user_id, "ver": token_version(user)}
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], session: Session = Depends(get_session)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def invalidate_user(user_id: int):
+    user_cache.pop(user_id)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_user(target.user_id)
+
+class TokenUser(BaseModel):
+    user_id: int
+    email: str
+    role: str
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = session.exec(select(User).where(User.email == email)).first()
-    if user is None:
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return payload
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], session: AsyncSession = Depends(get_session)):
+    payload = decode_token(token)
+    email: str = payload.get("sub")
+    user_id = payload.get("uid")
+    version = payload.get("ver")
+
+    if user_id is None or version is None:
+        # Token issued before user ids were embedded
+        user = (await session.exec(select(User).where(User.email == email))).first()
+        if user is None:
+            raise credentials_exception
+        return user
+
+    cached = user_cache.get(user_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    user = await session.get(User, user_id)
+    if user is None or user.email != email or token_version(user) != version:
         raise credentials_exception
+    # Cache a detached copy that isn't tied to this request's session
+    user = User.model_validate(user)
+    user_cache.set(user_id, (version, user))
     return user
 
+def token_user(token: str) -> TokenUser:
+    """Identity taken from the signed token alone, without a database lookup.
+
+    Good enough for role checks: a role change only applies to tokens issued
+    after it, i.e. within ACCESS_TOKEN_EXPIRE_MINUTES.
+    """
+    payload = decode_token(token)
+    if payload.get("uid") is None or payload.get("role") is None:
+        raise credentials_exception
+    return TokenUser(user_id=payload["uid"], email=payload["sub"], role=payload["role"])
+
+async def get_token_user(token: Annotated[str, Depends(oauth2_scheme)]) -> TokenUser:
+    return token_user(token)
+
+async def get_token_admin(current_user: Annotated[TokenUser, Depends(get_token_user)]):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return current_user
+
 async def get_current_admin(current_user: Annotated[User, Depends(get_current_user)]):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -0,0 +1,373 @@
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import func, or_, select
+from sqlmodel import Session
+from app.models.categories import Category
+from app.models.menu_items import MenuItem
+from app.models.order_items import OrderItem
+from app.models.order_status_history import OrderStatusHistory
+from app.models.orders import Order
+from app.models.payments import Payment
+from app.models.user import User
+
+# Local directory holding the columnar copy of the order tables (export_columnar.py)
+COLUMNAR_DIR = os.getenv("COLUMNAR_DIR", "columnar")
+# Rows fetched per round trip while exporting
+COLUMNAR_BATCH_SIZE = int(os.getenv("COLUMNAR_BATCH_SIZE", "10000"))
+# Months with orders created this long before the previous run started are
+# re-exported regardless of the id watermarks, for transactions that took
+# their ids before the previous run but committed after it
+COLUMNAR_LOOKBACK_SECONDS = float(os.getenv("COLUMNAR_LOOKBACK_SECONDS", "600"))
+
+TERMINAL_STATUSES = ("delivered", "cancelled")
+
+# Layout: manifest.json names the current directory of every monthly partition
+# and of the dimension snapshot. A partition holds the four order tables for the
+# orders created in that month, one .npy file per column plus meta.json, so
+# columns are memory-mapped as they are and a query only reads the columns and
+# months it needs. Strings are dictionary encoded (int32 codes, -1 for NULL),
+# timestamps are naive UTC datetime64[us] (NaT for NULL), nullable ids use -1.
+# Directories are never modified in place: a rebuilt month gets a new directory
+# and the manifest is swapped atomically, so readers always see whole exports.
+# Directories the new manifest replaced are kept until the run after, so a
+# reader that pinned the previous manifest can still open them.
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    model: type
+    # Monotonic primary key, used as the export watermark
+    key: str
+    # Column name -> "int", "float", "time" or "str"
+    columns: dict[str, str]
+    # Columns copied from the order, so child rows filter and group without a join
+    order_columns: tuple[str, ...] = ()
+
+
+ORDER_COLUMN_KINDS = {
+    "order_id": "int", "order_number": "str", "status": "str", "customer_id": "int", "assigned_rider_id": "int",
+    "total_amount": "float", "rider_earning": "float", "customer_lat": "float", "customer_lng": "float",
+    "created_at": "time", "ready_at": "time", "picked_up_at": "time", "delivered_at": "time",
+}
+
+PARTITIONED = {
+    "orders": TableSpec(Order, "order_id", ORDER_COLUMN_KINDS),
+    "order_items": TableSpec(
+        OrderItem, "id",
+        {"id": "int", "order_id": "int", "item_id": "int", "quantity": "int", "price_each": "float", "created_at": "time"},
+        ("created_at", "status", "customer_id", "assigned_rider_id"),
+    ),
+    "order_status_history": TableSpec(
+        OrderStatusHistory, "id",
+        {"id": "int", "order_id": "int", "old_status": "str", "new_status": "str", "changed_at": "time"},
+        ("created_at",),
+    ),
+    "payments": TableSpec(
+        Payment, "payment_id",
+        {"payment_id": "int", "order_id": "int", "method": "str", "amount": "float", "status": "str", "created_at": "time"},
+        ("created_at",),
+    ),
+}
+
+# Small tables, snapshotted whole on every run
+DIMENSIONS = {
+    "users": TableSpec(User, "user_id", {"user_id": "int", "name": "str", "role": "str"}),
+    "menu_items": TableSpec(MenuItem, "item_id", {"item_id": "int", "name": "str", "category_id": "int", "price": "float"}),
+    "categories": TableSpec(Category, "category_id", {"category_id": "int", "name": "str"}),
+}
+
+
+def table_columns(spec: TableSpec) -> dict[str, str]:
+    """Stored columns; copied order columns are prefixed with order_."""
+    columns = dict(spec.columns)
+    for name in spec.order_columns:
+        columns[f"order_{name}"] = ORDER_COLUMN_KINDS[name]
+    return columns
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def encode(kind: str, values: tuple, dictionary: dict[str, int]) -> np.ndarray:
+    if kind == "str":
+        return np.array([-1 if value is None else dictionary.setdefault(value, len(dictionary)) for value in values], dtype=np.int32)
+    if kind == "time":
+        return np.array([None if value is None else _naive_utc(value) for value in values], dtype="datetime64[us]")
+    if kind == "float":
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    return np.array([-1 if value is None else value for value in values], dtype=np.int64)
+
+
+def write_table(session: Session, statement, columns: dict[str, str], path: str) -> int:
+    """Run `statement` (selecting `columns` in order) into a table directory."""
+    chunks: dict[str, list[np.ndarray]] = {name: [] for name in columns}
+    dictionaries: dict[str, dict[str, int]] = {name: {} for name, kind in columns.items() if kind == "str"}
+    rows = 0
+    result = session.execute(statement.execution_options(yield_per=COLUMNAR_BATCH_SIZE))
+    for partition in result.partitions():
+        rows += len(partition)
+        for (name, kind), values in zip(columns.items(), zip(*partition)):
+            chunks[name].append(encode(kind, values, dictionaries.get(name)))
+
+    os.makedirs(path)
+    for name, kind in columns.items():
+        if chunks[name]:
+            array = np.concatenate(chunks[name])
+        else:
+            array = encode(kind, (), {})
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    with open(os.path.join(path, "meta.json"), "w") as handle:
+        json.dump({
+            "rows": rows,
+            "columns": columns,
+            "dictionaries": {name: list(dictionary) for name, dictionary in dictionaries.items()},
+        }, handle)
+    return rows
+
+
+def month_start(day: date) -> datetime:
+    return datetime(day.year, day.month, 1)
+
+
+def next_month(start: datetime) -> datetime:
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def as_date(value) -> date:
+    # func.date() comes back as a string on SQLite
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def read_manifest(root: str) -> dict | None:
+    try:
+        with open(os.path.join(root, "manifest.json")) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+class ColumnarExporter:
+    """Incrementally copies the order tables into the columnar store.
+
+    A month is re-exported whole when any of its orders, or their items,
+    status changes or payments, has appeared since the previous run, when it
+    still had open orders then, or when it falls within the lookback window.
+    Delivered and cancelled orders of older months never change, so those
+    partitions are left alone.
+    """
+
+    def __init__(self, session: Session, root: str = COLUMNAR_DIR):
+        self.session = session
+        self.root = root
+
+    def _max_ids(self) -> dict[str, int]:
+        return {
+            name: self.session.execute(select(func.max(getattr(spec.model, spec.key)))).scalar() or 0
+            for name, spec in PARTITIONED.items()
+        }
+
+    def _changed_months(self, manifest: dict | None) -> set[str]:
+        day = func.date(Order.created_at)
+        statement = select(day).distinct()
+        if manifest is not None:
+            watermarks = manifest["watermarks"]
+            lookback = datetime.fromisoformat(manifest["started_at"]) - timedelta(seconds=COLUMNAR_LOOKBACK_SECONDS)
+            changed = [Order.order_id > watermarks["orders"], Order.created_at >= lookback]
+            for name, spec in PARTITIONED.items():
+                if name != "orders":
+                    column = getattr(spec.model, spec.key)
+                    changed.append(Order.order_id.in_(select(spec.model.order_id).where(column > watermarks[name])))
+            statement = statement.where(or_(*changed))
+        return {as_date(value).strftime("%Y-%m") for value in self.session.execute(statement).scalars()}
+
+    def _write_partition(self, month: str, path: str) -> tuple[dict[str, int], bool]:
+        start = month_start(date.fromisoformat(f"{month}-01"))
+        in_month = (Order.created_at >= start, Order.created_at < next_month(start))
+        counts = {}
+        for name, spec in PARTITIONED.items():
+            columns = table_columns(spec)
+            selected = [getattr(spec.model, column) for column in spec.columns]
+            selected += [getattr(Order, column) for column in spec.order_columns]
+            statement = select(*selected).where(*in_month).order_by(getattr(spec.model, spec.key))
+            if spec.model is not Order:
+                statement = statement.join(Order, Order.order_id == spec.model.order_id)
+            counts[name] = write_table(self.session, statement, columns, os.path.join(path, name))
+        has_open = self.session.execute(
+            select(func.count()).select_from(Order).where(*in_month, Order.status.not_in(TERMINAL_STATUSES))
+        ).scalar() > 0
+        return counts, has_open
+
+    def run(self, full: bool = False) -> dict:
+        """Export what changed since the last run (everything with `full`); returns a summary."""
+        os.makedirs(os.path.join(self.root, "partitions"), exist_ok=True)
+        previous = None if full else read_manifest(self.root)
+        started_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        stamp = started_at.strftime("%Y%m%dT%H%M%S%f")
+        # Taken before reading any rows: whatever lands meanwhile is picked up again next run
+        watermarks = self._max_ids()
+
+        partitions = dict(previous["partitions"]) if previous else {}
+        months = self._changed_months(previous) | set(previous["open_months"] if previous else ())
+        exported = {}
+        open_months = set()
+        for month in sorted(months):
+            directory = f"{month}-{stamp}"
+            counts, has_open = self._write_partition(month, os.path.join(self.root, "partitions", directory))
+            if counts["orders"]:
+                partitions[month] = directory
+                exported[month] = counts
+            else:
+                shutil.rmtree(os.path.join(self.root, "partitions", directory))
+                partitions.pop(month, None)
+            if has_open:
+                open_months.add(month)
+
+        dimensions = f"dimensions-{stamp}"
+        for name, spec in DIMENSIONS.items():
+            statement = select(*(getattr(spec.model, column) for column in spec.columns)).order_by(getattr(spec.model, spec.key))
+            write_table(self.session, statement, spec.columns, os.path.join(self.root, dimensions, name))
+        # Read transactions end here; the rest only touches the disk
+        self.session.rollback()
+
+        manifest = {
+            "started_at": started_at.isoformat(),
+            "exported_at": datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+            "watermarks": watermarks,
+            "partitions": dict(sorted(partitions.items())),
+            "open_months": sorted(open_months),
+            "dimensions": dimensions,
+        }
+        # Read again rather than reusing `previous`, which a full run leaves out
+        replaced = read_manifest(self.root)
+        temporary = os.path.join(self.root, "manifest.json.tmp")
+        with open(temporary, "w") as handle:
+            json.dump(manifest, handle, indent=1)
+        os.replace(temporary, os.path.join(self.root, "manifest.json"))
+        self._remove_stale(manifest, replaced)
+        return {"exported": exported, "months": len(partitions), "full": previous is None}
+
+    def _remove_stale(self, manifest: dict, replaced: dict | None):
+        # Directories of the manifest just replaced stay for readers that pinned it
+        # and open them lazily; older ones go. Readers pinned even further back
+        # retry on the current manifest (OfflineAnalytics), and files they
+        # already mapped stay readable after the directory is removed.
+        kept = [manifest] + ([replaced] if replaced else [])
+        partitions = {directory for kept_manifest in kept for directory in kept_manifest["partitions"].values()}
+        dimensions = {kept_manifest["dimensions"] for kept_manifest in kept}
+        for directory in os.listdir(os.path.join(self.root, "partitions")):
+            if directory not in partitions:
+                shutil.rmtree(os.path.join(self.root, "partitions", directory), ignore_errors=True)
+        for directory in os.listdir(self.root):
+            if directory.startswith("dimensions-") and directory not in dimensions:
+                shutil.rmtree(os.path.join(self.root, directory), ignore_errors=True)
+
+
+class Frame:
+    """A table as numpy columns; string columns hold codes into `dictionaries`."""
+
+    def __init__(self, columns: dict[str, np.ndarray], dictionaries: dict[str, list[str]] | None = None):
+        self.columns = columns
+        self.dictionaries = dictionaries or {}
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def filter(self, mask: np.ndarray) -> "Frame":
+        return Frame({name: column[mask] for name, column in self.columns.items()}, self.dictionaries)
+
+    def with_columns(self, dictionaries: dict[str, list[str]] | None = None, **columns: np.ndarray) -> "Frame":
+        return Frame({**self.columns, **columns}, {**self.dictionaries, **(dictionaries or {})})
+
+    def code(self, name: str, value: str) -> int:
+        try:
+            return self.dictionaries[name].index(value)
+        except ValueError:
+            return -2  # Matches nothing, not even NULL (-1)
+
+    def isin(self, name: str, values) -> np.ndarray:
+        if name in self.dictionaries:
+            values = [self.code(name, value) for value in values]
+        return np.isin(self.columns[name], values)
+
+    @staticmethod
+    def concat(frames: list["Frame"]) -> "Frame":
+        """Stack frames of the same table, merging their string dictionaries."""
+        if len(frames) == 1:
+            return frames[0]
+        names = list(frames[0].columns)
+        dictionaries = {}
+        recoded = [dict(frame.columns) for frame in frames]
+        for name in frames[0].dictionaries:
+            merged: dict[str, int] = {}
+            for frame, columns in zip(frames, recoded):
+                # Each partition has its own codes; map them onto the merged dictionary
+                lookup = np.array([merged.setdefault(value, len(merged)) for value in frame.dictionaries[name]] + [-1], dtype=np.int32)
+                columns[name] = lookup[columns[name]]
+            dictionaries[name] = list(merged)
+        return Frame({name: np.concatenate([columns[name] for columns in recoded]) for name in names}, dictionaries)
+
+
+def load_table(path: str, columns: list[str] | None = None) -> Frame:
+    with open(os.path.join(path, "meta.json")) as handle:
+        meta = json.load(handle)
+    names = columns or list(meta["columns"])
+    # np.load can't map an empty array
+    mmap_mode = "r" if meta["rows"] else None
+    return Frame(
+        {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in names},
+        {name: values for name, values in meta["dictionaries"].items() if name in names},
+    )
+
+
+class ColumnarStore:
+    """Read side of the store; every call works on the manifest current at that time."""
+
+    def __init__(self, root: str = COLUMNAR_DIR):
+        self.root = root
+
+    def manifest(self) -> dict:
+        manifest = read_manifest(self.root)
+        if manifest is None:
+            raise FileNotFoundError(f"No columnar export in {self.root!r}; run python export_columnar.py")
+        return manifest
+
+    def scan(
+        self, manifest: dict, table: str, columns: list[str] | None = None,
+        created_from: date | None = None, created_to: date | None = None,
+    ) -> Frame:
+        """Columns of `table` for the months overlapping the inclusive order-date range.
+
+        Only whole months are pruned here; callers mask rows at the exact bounds.
+        """
+        first = created_from.strftime("%Y-%m") if created_from else None
+        last = created_to.strftime("%Y-%m") if created_to else None
+        frames = [
+            load_table(os.path.join(self.root, "partitions", directory, table), columns)
+            for month, directory in manifest["partitions"].items()
+            if (first is None or month >= first) and (last is None or month <= last)
+        ]
+        if not frames:
+            spec = PARTITIONED[table]
+            kinds = table_columns(spec)
+            names = columns or list(kinds)
+            return Frame({name: encode(kinds[name], (), {}) for name in names}, {name: [] for name in names if kinds[name] == "str"})
+        return Frame.concat(frames)
+
+    def dimension(self, manifest: dict, name: str) -> Frame:
+        return load_table(os.path.join(self.root, manifest["dimensions"], name))
+
+
+columnar_store = ColumnarStore()
@@ -0,0 +1,298 @@
+import math
+import os
+import time
+from collections import defaultdict
+from datetime import timezone
+from typing import Callable
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.events import event_bus, order_event
+from app.models.orders import Order
+from app.models.rider import RiderProfile
+from app.order_status import StatusConflict, apply_status_change
+from database import async_session_factory
+
+# Grid cell edge in degrees; 0.01 is roughly 1.1 km north-south
+DISPATCH_CELL_DEG = float(os.getenv("DISPATCH_CELL_DEG", "0.01"))
+# Riders further than this from the restaurant are never offered an order
+DISPATCH_MAX_KM = float(os.getenv("DISPATCH_MAX_KM", "15"))
+# A rider without a location fix for this many seconds counts as offline
+RIDER_ONLINE_WINDOW = float(os.getenv("RIDER_ONLINE_WINDOW", "120"))
+# Assign a rider as soon as an order is marked ready
+DISPATCH_AUTO_ASSIGN = os.getenv("DISPATCH_AUTO_ASSIGN", "false").lower() in ("1", "true", "yes")
+
+# Order statuses during which a rider is out on a delivery
+RIDER_BUSY_STATUSES = ("assigned", "picked_up")
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class GeoGrid:
+    """Points bucketed into fixed lat/lng cells for nearest-neighbour lookups.
+
+    A query scans rings of cells outwards from the query cell and stops once
+    the k-th best distance is closer than anything an unscanned ring could hold.
+    """
+
+    def __init__(self, cell_deg: float = DISPATCH_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._cells: dict[tuple[int, int], set[int]] = defaultdict(set)
+        # point id -> (lat, lng, cell)
+        self._points: dict[int, tuple[float, float, tuple[int, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, point_id: int) -> bool:
+        return point_id in self._points
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def upsert(self, point_id: int, lat: float, lng: float):
+        cell = self._cell(lat, lng)
+        current = self._points.get(point_id)
+        if current is not None and current[2] != cell:
+            self._discard(point_id, current[2])
+        self._cells[cell].add(point_id)
+        self._points[point_id] = (lat, lng, cell)
+
+    def remove(self, point_id: int):
+        current = self._points.pop(point_id, None)
+        if current is not None:
+            self._discard(point_id, current[2])
+
+    def _discard(self, point_id: int, cell: tuple[int, int]):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(point_id)
+            if not members:
+                del self._cells[cell]
+
+    def position(self, point_id: int) -> tuple[float, float] | None:
+        current = self._points.get(point_id)
+        return None if current is None else (current[0], current[1])
+
+    def nearest(
+        self, lat: float, lng: float, k: int = 1,
+        accept: Callable[[int], bool] | None = None, max_km: float = DISPATCH_MAX_KM,
+    ) -> list[tuple[float, int]]:
+        """Up to k (distance_km, point_id) pairs within max_km, closest first."""
+        center_row, center_col = self._cell(lat, lng)
+        # Smallest cell extent in km: east-west cells shrink away from the equator
+        cell_km = self.cell_deg * KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+        max_ring = math.ceil(max_km / cell_km) + 1
+        found: list[tuple[float, int]] = []
+        for ring in range(max_ring + 1):
+            for cell in self._ring(center_row, center_col, ring):
+                for point_id in self._cells.get(cell, ()):
+                    if accept is not None and not accept(point_id):
+                        continue
+                    point_lat, point_lng, _ = self._points[point_id]
+                    distance = haversine_km(lat, lng, point_lat, point_lng)
+                    if distance <= max_km:
+                        found.append((distance, point_id))
+            if len(found) >= k:
+                found.sort()
+                del found[k:]
+                # Everything beyond this ring is at least ring * cell_km away
+                if found[-1][0] <= ring * cell_km:
+                    break
+        found.sort()
+        return found[:k]
+
+    @staticmethod
+    def _ring(row: int, col: int, ring: int):
+        if ring == 0:
+            yield row, col
+            return
+        for offset in range(-ring, ring + 1):
+            yield row - ring, col + offset
+            yield row + ring, col + offset
+        for offset in range(-ring + 1, ring):
+            yield row + offset, col - ring
+            yield row + offset, col + ring
+
+
+class Dispatcher:
+    """Online riders of this worker in a GeoGrid, and who is out on a delivery.
+
+    Positions come from location fixes; shifts (RiderProfile.is_online) and
+    the orders each rider carries come from events, so with a shared event
+    broker every worker converges on the same view.
+    """
+
+    def __init__(self, cell_deg: float = DISPATCH_CELL_DEG, online_window: float = RIDER_ONLINE_WINDOW):
+        self.grid = GeoGrid(cell_deg)
+        self.online_window = online_window
+        self._last_seen: dict[int, float] = {}
+        # Riders on shift; a recent fix alone doesn't make a rider dispatchable
+        self.on_shift: set[int] = set()
+        # rider -> orders they are out with, and back; a rider with a bundle
+        # stays busy until the last of its orders is done
+        self._orders_of: dict[int, set[int]] = {}
+        self._rider_of: dict[int, int] = {}
+        self.counters = {"assigned": 0, "no_rider": 0}
+
+    @property
+    def busy(self) -> set[int]:
+        return set(self._orders_of)
+
+    def set_on_shift(self, rider_id: int, on_shift: bool):
+        if on_shift:
+            self.on_shift.add(rider_id)
+        else:
+            self.on_shift.discard(rider_id)
+
+    def mark_busy(self, rider_id: int, order_id: int):
+        if self._rider_of.get(order_id) != rider_id:
+            self.release(order_id)
+            self._rider_of[order_id] = rider_id
+            self._orders_of.setdefault(rider_id, set()).add(order_id)
+
+    def release(self, order_id: int):
+        rider_id = self._rider_of.pop(order_id, None)
+        if rider_id is None:
+            return
+        orders = self._orders_of[rider_id]
+        orders.discard(order_id)
+        if not orders:
+            del self._orders_of[rider_id]
+
+    def track(self, rider_id: int, lat: float, lng: float, seen_at: float | None = None):
+        self.grid.upsert(rider_id, lat, lng)
+        self._last_seen[rider_id] = time.time() if seen_at is None else seen_at
+
+    def is_available(self, rider_id: int) -> bool:
+        return (
+            rider_id in self.on_shift
+            and rider_id not in self._orders_of
+            and time.time() - self._last_seen.get(rider_id, 0.0) <= self.online_window
+        )
+
+    def prune(self):
+        cutoff = time.time() - self.online_window
+        for rider_id in [rider_id for rider_id, seen in self._last_seen.items() if seen < cutoff]:
+            self.grid.remove(rider_id)
+            del self._last_seen[rider_id]
+
+    def nearest(
+        self, lat: float, lng: float, k: int = 5, exclude: set[int] | None = None, max_km: float = DISPATCH_MAX_KM,
+    ) -> list[tuple[float, int]]:
+        return self.grid.nearest(
+            lat, lng, k,
+            accept=lambda rider_id: self.is_available(rider_id) and not (exclude and rider_id in exclude),
+            max_km=max_km,
+        )
+
+    def plan(self, orders: list[Order]) -> tuple[list[tuple[Order, int, float]], list[Order]]:
+        """Greedy batch plan: oldest order first takes its nearest free rider."""
+        taken: set[int] = set()
+        assignments, unassigned = [], []
+        for order in sorted(orders, key=lambda order: (order.created_at, order.order_id)):
+            if order.restaurant_lat is None or order.restaurant_lng is None:
+                unassigned.append(order)
+                continue
+            best = self.nearest(order.restaurant_lat, order.restaurant_lng, k=1, exclude=taken)
+            if not best:
+                unassigned.append(order)
+                continue
+            distance, rider_id = best[0]
+            taken.add(rider_id)
+            assignments.append((order, rider_id, distance))
+        return assignments, unassigned
+
+    def on_event(self, event: dict):
+        if event["type"] == "rider.shift_changed":
+            self.set_on_shift(event["rider_id"], event["on_shift"])
+            return
+        rider_id = event.get("assigned_rider_id")
+        if rider_id is not None and event["status"] in RIDER_BUSY_STATUSES:
+            self.mark_busy(rider_id, event["order_id"])
+        else:
+            self.release(event["order_id"])
+
+    async def load(self, session: AsyncSession):
+        """Seed from the database: last flushed positions, shifts and riders on a delivery."""
+        cutoff = time.time() - self.online_window
+        profiles = (await session.exec(
+            select(RiderProfile.user_id, RiderProfile.current_lat, RiderProfile.current_lng, RiderProfile.location_updated_at)
+            .where(RiderProfile.location_updated_at.is_not(None))
+        )).all()
+        for rider_id, lat, lng, updated_at in profiles:
+            seen_at = updated_at.replace(tzinfo=timezone.utc).timestamp()
+            if seen_at >= cutoff:
+                self.track(rider_id, lat, lng, seen_at)
+        self.on_shift = set((await session.exec(select(RiderProfile.user_id).where(RiderProfile.is_online))).all())
+        self._orders_of, self._rider_of = {}, {}
+        for order_id, rider_id in (await session.exec(
+            select(Order.order_id, Order.assigned_rider_id)
+            .where(Order.status.in_(RIDER_BUSY_STATUSES), Order.assigned_rider_id.is_not(None))
+        )).all():
+            self.mark_busy(rider_id, order_id)
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "tracked": len(self.grid),
+            "on_shift": len(self.on_shift),
+            "available": sum(1 for rider_id in self._last_seen if self.is_available(rider_id)),
+            "busy": len(self._orders_of),
+        }
+
+
+def assignable(order: Order) -> bool:
+    return order.assigned_rider_id is None and order.status == "ready"
+
+
+async def assign_rider(session: AsyncSession, order: Order, rider_id: int):
+    """Give the order to the rider, inside the caller's transaction.
+
+    Raises StatusConflict if the order was taken or changed meanwhile.
+    """
+    old_status = await apply_status_change(session, order, "assigned", rider_id=rider_id)
+    dispatcher.mark_busy(rider_id, order.order_id)
+    return old_status
+
+
+async def auto_assign(session: AsyncSession, order: Order) -> tuple[int, float] | None:
+    """Assign and commit the nearest free rider; returns (rider_id, distance_km)."""
+    if not assignable(order) or order.restaurant_lat is None or order.restaurant_lng is None:
+        return None
+    best = dispatcher.nearest(order.restaurant_lat, order.restaurant_lng, k=1)
+    if not best:
+        dispatcher.counters["no_rider"] += 1
+        return None
+    distance, rider_id = best[0]
+    try:
+        old_status = await assign_rider(session, order, rider_id)
+    except StatusConflict:
+        # Claimed by a rider (or changed) since it was read; nothing to do
+        await session.rollback()
+        return None
+    try:
+        await session.commit()
+    except Exception:
+        dispatcher.release(order.order_id)
+        raise
+    dispatcher.counters["assigned"] += 1
+    await event_bus.publish(order_event("order.status_changed", order, old_status))
+    return rider_id, distance
+
+
+async def load_dispatcher():
+    async with async_session_factory() as session:
+        await dispatcher.load(session)
+
+
+dispatcher = Dispatcher()
+event_bus.add_listener(dispatcher.on_event)
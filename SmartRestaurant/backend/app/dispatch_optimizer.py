@@ -0,0 +1,153 @@
+import os
+from dataclasses import dataclass, field
+import numpy as np
+from app.dispatch import DISPATCH_MAX_KM, EARTH_RADIUS_KM, Dispatcher, haversine_km
+from app.models.orders import Order
+
+# Customers within this distance of a bundle's first drop-off may share a rider
+BUNDLE_RADIUS_KM = float(os.getenv("BUNDLE_RADIUS_KM", "1.5"))
+# Orders picked up at "the same" restaurant are within this distance of each other
+SAME_PICKUP_KM = 0.2
+
+
+@dataclass
+class Bundle:
+    orders: list[Order]
+    lat: float
+    lng: float
+    rider_id: int | None = None
+    distance_km: float | None = None
+
+
+@dataclass
+class Plan:
+    bundles: list[Bundle]
+    unassigned: list[Order] = field(default_factory=list)
+
+    @property
+    def assigned(self) -> list[Bundle]:
+        return [bundle for bundle in self.bundles if bundle.rider_id is not None]
+
+    @property
+    def total_km(self) -> float:
+        return sum(bundle.distance_km for bundle in self.assigned)
+
+
+def haversine_matrix(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Distances in km between every point of the first set and every point of the second."""
+    lat1, lng1 = np.radians(np.asarray(lat1))[:, None], np.radians(np.asarray(lng1))[:, None]
+    lat2, lng2 = np.radians(np.asarray(lat2))[None, :], np.radians(np.asarray(lng2))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def min_cost_assignment(cost: np.ndarray) -> list[tuple[int, int]]:
+    """Hungarian algorithm (shortest augmenting paths with potentials).
+
+    Returns (row, column) pairs covering min(rows, columns) of a rectangular
+    cost matrix with the smallest total cost. O(n^2 * m), the inner loop over
+    the m columns runs in NumPy.
+    """
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    rows, columns = cost.shape
+    if rows == 0:
+        return []
+    # 1-based like the textbook version; index 0 is the virtual start column
+    u = np.zeros(rows + 1)
+    v = np.zeros(columns + 1)
+    owner = np.zeros(columns + 1, dtype=np.int64)
+    way = np.zeros(columns + 1, dtype=np.int64)
+    for row in range(1, rows + 1):
+        owner[0] = row
+        column = 0
+        min_slack = np.full(columns + 1, np.inf)
+        used = np.zeros(columns + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current_row = owner[column]
+            slack = cost[current_row - 1] - u[current_row] - v[1:]
+            free = ~used[1:]
+            better = free & (slack < min_slack[1:])
+            min_slack[1:][better] = slack[better]
+            way[1:][better] = column
+            candidates = np.where(free, min_slack[1:], np.inf)
+            next_column = int(np.argmin(candidates)) + 1
+            delta = candidates[next_column - 1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            min_slack[1:][free] -= delta
+            column = next_column
+            if owner[column] == 0:
+                break
+        # Flip the augmenting path
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+    pairs = [(int(owner[column]) - 1, column - 1) for column in range(1, columns + 1) if owner[column]]
+    if transposed:
+        pairs = [(column, row) for row, column in pairs]
+    return sorted(pairs)
+
+
+def make_bundles(orders: list[Order], max_bundle: int = 1, radius_km: float = BUNDLE_RADIUS_KM) -> list[Bundle]:
+    """Group orders that share a pickup and have nearby drop-offs, oldest first."""
+    bundles: list[Bundle] = []
+    for order in sorted(orders, key=lambda order: (order.created_at, order.order_id)):
+        if max_bundle > 1 and order.customer_lat is not None and order.customer_lng is not None:
+            for bundle in bundles:
+                first = bundle.orders[0]
+                if (
+                    len(bundle.orders) < max_bundle
+                    and first.customer_lat is not None and first.customer_lng is not None
+                    and haversine_km(bundle.lat, bundle.lng, order.restaurant_lat, order.restaurant_lng) <= SAME_PICKUP_KM
+                    and haversine_km(first.customer_lat, first.customer_lng, order.customer_lat, order.customer_lng) <= radius_km
+                ):
+                    bundle.orders.append(order)
+                    break
+            else:
+                bundles.append(Bundle(orders=[order], lat=order.restaurant_lat, lng=order.restaurant_lng))
+        else:
+            bundles.append(Bundle(orders=[order], lat=order.restaurant_lat, lng=order.restaurant_lng))
+    return bundles
+
+
+def optimize(
+    dispatcher: Dispatcher, orders: list[Order], max_bundle: int = 1, max_km: float = DISPATCH_MAX_KM,
+) -> Plan:
+    """Assign bundles of orders to free riders with the least total pickup distance."""
+    located = [order for order in orders if order.restaurant_lat is not None and order.restaurant_lng is not None]
+    unlocated = [order for order in orders if order.restaurant_lat is None or order.restaurant_lng is None]
+    plan = Plan(bundles=make_bundles(located, max_bundle), unassigned=unlocated)
+
+    # An optimal plan only ever gives a bundle one of its n nearest free riders
+    # (n = number of bundles; one of those is always left to swap to), so the
+    # cost matrix needs just those columns rather than every rider online
+    rider_ids: dict[int, int] = {}
+    for lat, lng in {(bundle.lat, bundle.lng) for bundle in plan.bundles}:
+        for _, rider_id in dispatcher.nearest(lat, lng, k=len(plan.bundles), max_km=max_km):
+            rider_ids.setdefault(rider_id, len(rider_ids))
+    if not plan.bundles or not rider_ids:
+        plan.unassigned.extend(order for bundle in plan.bundles for order in bundle.orders)
+        return plan
+
+    positions = np.array([dispatcher.grid.position(rider_id) for rider_id in rider_ids])
+    distances = haversine_matrix(
+        [bundle.lat for bundle in plan.bundles], [bundle.lng for bundle in plan.bundles],
+        positions[:, 0], positions[:, 1],
+    )
+    # Out-of-range pairs stay in the matrix at a prohibitive cost and are
+    # dropped afterwards, so the solver always sees a complete matrix
+    out_of_range = distances > max_km
+    cost = np.where(out_of_range, max_km * (len(plan.bundles) + 1), distances)
+    riders = list(rider_ids)
+    for bundle_index, rider_index in min_cost_assignment(cost):
+        if out_of_range[bundle_index, rider_index]:
+            continue
+        bundle = plan.bundles[bundle_index]
+        bundle.rider_id = riders[rider_index]
+        bundle.distance_km = float(distances[bundle_index, rider_index])
+    plan.unassigned.extend(order for bundle in plan.bundles if bundle.rider_id is None for order in bundle.orders)
+    return plan
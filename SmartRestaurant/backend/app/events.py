@@ -0,0 +1,279 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+from app.metrics import order_transitions, orders_created
+from app.models.orders import Order
+
+logger = logging.getLogger(__name__)
+
+# Events a slow subscriber may fall behind by before its oldest ones are dropped
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+# redis://... so every worker sees events published by its siblings; in-process otherwise
+EVENT_BUS_URL = os.getenv("EVENT_BUS_URL")
+EVENT_CHANNEL = os.getenv("EVENT_CHANNEL", "smartrestaurant:orders")
+# Seconds between attempts to resubscribe after losing redis, doubling up to the max
+EVENT_BUS_RETRY_DELAY = float(os.getenv("EVENT_BUS_RETRY_DELAY", "0.5"))
+EVENT_BUS_MAX_RETRY_DELAY = float(os.getenv("EVENT_BUS_MAX_RETRY_DELAY", "30"))
+
+# Unassigned orders riders see (see orders.can_view_order): ready ones to
+# accept and pending ones coming up
+RIDER_OPEN_STATUSES = ("ready", "pending")
+
+
+def order_event(event_type: str, order: Order, old_status: str | None = None) -> dict:
+    return {
+        "type": event_type,
+        "order_id": order.order_id,
+        "status": order.status,
+        "old_status": old_status,
+        "customer_id": order.customer_id,
+        "assigned_rider_id": order.assigned_rider_id,
+        "at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def shift_event(rider_id: int, on_shift: bool) -> dict:
+    # Internal: keeps every worker's dispatcher in step, never sent to clients
+    return {
+        "type": "rider.shift_changed",
+        "rider_id": rider_id,
+        "on_shift": on_shift,
+        "at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def event_visible_to(user_id: int, role: str, event: dict) -> bool:
+    if not event["type"].startswith("order."):
+        return False
+    if role == "admin":
+        return True
+    if role == "customer":
+        return event["customer_id"] == user_id
+    if role == "rider":
+        # Includes orders leaving the open pool so the rider's list can drop them
+        return (
+            event["assigned_rider_id"] == user_id
+            or event["status"] in RIDER_OPEN_STATUSES
+            or event["old_status"] in RIDER_OPEN_STATUSES
+        )
+    return False
+
+
+class LocalBroker:
+    """Delivers straight back to this process."""
+
+    def __init__(self):
+        self._deliver: Callable[[dict], None] | None = None
+
+    async def start(self, deliver: Callable[[dict], None]):
+        self._deliver = deliver
+
+    async def stop(self):
+        self._deliver = None
+
+    async def publish(self, event: dict):
+        if self._deliver is None:
+            raise RuntimeError("LocalBroker.publish() called before start()")
+        self._deliver(event)
+
+
+class RedisBroker:
+    """Fans events out to every worker through a redis channel.
+
+    The listener outlives bad messages and redis restarts: a message that
+    can't be decoded or delivered is logged and skipped, and a lost
+    connection is resubscribed with backoff. Events published while this
+    worker was disconnected are not replayed; clients catch up on their next
+    fetch.
+    """
+
+    def __init__(self, url: str, channel: str = EVENT_CHANNEL):
+        try:
+            import redis.asyncio as redis
+            from redis.exceptions import ConnectionError, TimeoutError
+        except ImportError:
+            raise RuntimeError("EVENT_BUS_URL is set but the 'redis' package is not installed")
+        self._client = redis.from_url(url)
+        self._channel = channel
+        self._connection_errors = (ConnectionError, TimeoutError, OSError)
+        self._pubsub = None
+        self._listener: asyncio.Task | None = None
+        self.reconnects = 0
+
+    async def _subscribe(self):
+        pubsub = self._client.pubsub()
+        try:
+            await pubsub.subscribe(self._channel)
+        except BaseException:
+            await pubsub.aclose()
+            raise
+        self._pubsub = pubsub
+
+    async def _close_pubsub(self):
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is None:
+            return
+        try:
+            await pubsub.unsubscribe(self._channel)
+        except self._connection_errors:
+            pass  # The connection is gone, and the subscription with it
+        await pubsub.aclose()
+
+    async def start(self, deliver: Callable[[dict], None]):
+        await self._subscribe()
+        self._listener = asyncio.create_task(self._listen(deliver))
+
+    async def _listen(self, deliver: Callable[[dict], None]):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] == "message":
+                        self._deliver_message(deliver, message["data"])
+                logger.warning("Redis closed the %s subscription; resubscribing", self._channel)
+            except self._connection_errors:
+                logger.warning("Lost the redis %s subscription; resubscribing", self._channel, exc_info=True)
+            except Exception:
+                logger.exception("Listening on redis %s failed; resubscribing", self._channel)
+            await self._resubscribe()
+
+    def _deliver_message(self, deliver: Callable[[dict], None], data):
+        try:
+            event = json.loads(data)
+        except ValueError:
+            logger.exception("Skipping an undecodable event on %s: %r", self._channel, data[:200])
+            return
+        try:
+            deliver(event)
+        except Exception:
+            logger.exception("Delivering a %s event failed", event.get("type"))
+
+    async def _resubscribe(self):
+        delay = EVENT_BUS_RETRY_DELAY
+        while True:
+            await self._close_pubsub()
+            await asyncio.sleep(delay)
+            try:
+                await self._subscribe()
+            except self._connection_errors:
+                logger.warning("Resubscribing to redis %s failed; retrying in %.1fs", self._channel, delay, exc_info=True)
+                delay = min(delay * 2, EVENT_BUS_MAX_RETRY_DELAY)
+                continue
+            self.reconnects += 1
+            logger.info("Resubscribed to redis %s", self._channel)
+            return
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self._close_pubsub()
+        await self._client.aclose()
+
+    async def publish(self, event: dict):
+        await self._client.publish(self._channel, json.dumps(event))
+
+
+class Subscription:
+    def __init__(self, bus: "EventBus", accept: Callable[[dict], bool], maxsize: int):
+        self._bus = bus
+        self.accept = accept
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, event: dict):
+        if self.queue.full():
+            # Never block the publisher on a slow client: drop its oldest event
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+
+class EventBus:
+    """Pub/sub for order events; the broker decides which workers receive them."""
+
+    def __init__(self, broker=None, queue_size: int = EVENT_QUEUE_SIZE):
+        self.broker = broker or LocalBroker()
+        self.queue_size = queue_size
+        self._subscriptions: set[Subscription] = set()
+        # In-process consumers (e.g. dispatch state) that see every event
+        self._listeners: list[Callable[[dict], None]] = []
+        self.counters = {"published": 0, "delivered": 0, "publish_errors": 0, "listener_errors": 0}
+        self.started = False
+
+    async def start(self):
+        await self.broker.start(self._deliver)
+        self.started = True
+
+    async def stop(self):
+        self.started = False
+        await self.broker.stop()
+
+    def subscribe(self, accept: Callable[[dict], bool]) -> Subscription:
+        subscription = Subscription(self, accept, self.queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        self._listeners.append(listener)
+
+    async def publish(self, event: dict):
+        # Not a broker outage but a wiring bug (app lifespan not run): fail loudly
+        if not self.started:
+            raise RuntimeError("EventBus.publish() called before start()")
+        # Counted here, once, by the worker that made the change
+        if event["type"] == "order.created":
+            orders_created.inc()
+        elif event["type"] == "order.status_changed":
+            order_transitions.inc(str(event["old_status"]), event["status"])
+        # Called after commit; a broker outage must not fail the request that
+        # already changed the order, clients catch up on their next fetch
+        try:
+            await self.broker.publish(event)
+            self.counters["published"] += 1
+        except Exception:
+            self.counters["publish_errors"] += 1
+            logger.exception("Publishing a %s event failed", event["type"])
+
+    def _deliver(self, event: dict):
+        # A failing listener must not starve the others or the subscribers
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                self.counters["listener_errors"] += 1
+                logger.exception("Event listener %r failed on a %s event", listener, event["type"])
+        for subscription in list(self._subscriptions):
+            if subscription.accept(event):
+                subscription.put(event)
+                self.counters["delivered"] += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "subscribers": len(self._subscriptions),
+            "dropped": sum(subscription.dropped for subscription in self._subscriptions),
+            "broker": type(self.broker).__name__,
+        }
+
+
+def make_broker():
+    return RedisBroker(EVENT_BUS_URL) if EVENT_BUS_URL else LocalBroker()
+
+
+event_bus = EventBus(make_broker())
@@ -0,0 +1,142 @@
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from app.result_cache import MemoryBackend, RedisBackend
+
+# How long a key's response is kept for replay
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# redis://... so a retry landing on another worker is replayed too
+IDEMPOTENCY_URL = os.getenv("IDEMPOTENCY_URL")
+# How long a running request holds its key; a duplicate waits at most this
+# long, and a worker that dies mid-request frees the key after it
+IDEMPOTENCY_LOCK_TTL = float(os.getenv("IDEMPOTENCY_LOCK_TTL", "30"))
+# Duplicates poll the backend for the first request's outcome, backing off
+POLL_INTERVAL = 0.01
+MAX_POLL_INTERVAL = 0.25
+MAX_KEY_LENGTH = 255
+
+
+@functools.lru_cache
+def response_adapter(response_model: Any) -> TypeAdapter:
+    return TypeAdapter(response_model)
+
+
+def serialize(value: Any, response_model: Any = None) -> Any:
+    """JSON content of `value` as the route's response_model would send it."""
+    if response_model is None:
+        return jsonable_encoder(value)
+    adapter = response_adapter(response_model)
+    return adapter.dump_python(adapter.validate_python(value, from_attributes=True), mode="json")
+
+
+def fingerprint(payload: Any) -> str:
+    raw = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class IdempotencyStore:
+    """Replays the stored response of a request retried with the same Idempotency-Key.
+
+    Keys are scoped per caller and endpoint. The first request claims the key
+    in the backend (SET NX on redis) before it runs, so a duplicate on any
+    worker waits for its outcome instead of running twice. Responses below 500
+    are stored; after a 5xx or a dropped request the key is free again so the
+    client's retry actually runs.
+    """
+
+    def __init__(self, backend=None, ttl: float = IDEMPOTENCY_TTL, lock_ttl: float = IDEMPOTENCY_LOCK_TTL):
+        self.backend = backend or MemoryBackend(maxsize=IDEMPOTENCY_CACHE_SIZE)
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        # Keys this worker has claimed and is still running
+        self._running: set[str] = set()
+        self.counters = {"executed": 0, "replayed": 0, "waited": 0, "mismatched": 0, "busy": 0}
+
+    async def run(
+        self, key: str | None, scope: str, payload: Any,
+        compute: Callable[[], Awaitable[Any]], status_code: int = 200, response_model: Any = None,
+    ):
+        if key is None:
+            return await compute()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+
+        storage_key = f"idempotency:{scope}:{key}"
+        request_fingerprint = fingerprint(payload)
+        claim = {"pending": True, "fingerprint": request_fingerprint}
+        deadline = time.monotonic() + self.lock_ttl
+        delay = POLL_INTERVAL
+        waited = False
+        while not await self.backend.add(storage_key, time.time(), claim, self.lock_ttl):
+            entry = await self.backend.get(storage_key)
+            if entry is None:
+                # Released or expired since the claim failed; try again
+                continue
+            record = entry[1]
+            if not record.get("pending"):
+                return self._replay(record, request_fingerprint)
+            if record["fingerprint"] != request_fingerprint:
+                self.counters["mismatched"] += 1
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            if time.monotonic() >= deadline:
+                self.counters["busy"] += 1
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            if not waited:
+                self.counters["waited"] += 1
+                waited = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_POLL_INTERVAL)
+
+        self._running.add(storage_key)
+        stored = False
+        try:
+            try:
+                value = await compute()
+            except HTTPException as exc:
+                if exc.status_code < 500:
+                    await self._store(storage_key, request_fingerprint, exc.status_code, {"detail": exc.detail}, exc.headers)
+                    stored = True
+                raise
+            content = serialize(value, response_model)
+            await self._store(storage_key, request_fingerprint, status_code, content, None)
+            stored = True
+            self.counters["executed"] += 1
+            return JSONResponse(content, status_code=status_code)
+        finally:
+            self._running.discard(storage_key)
+            if not stored:
+                await self.backend.delete(storage_key)
+
+    async def _store(self, storage_key: str, request_fingerprint: str, status_code: int, content: Any, headers: dict | None):
+        record = {"fingerprint": request_fingerprint, "status_code": status_code, "content": content, "headers": headers or {}}
+        await self.backend.set(storage_key, time.time(), record, self.ttl)
+
+    def _replay(self, record: dict, request_fingerprint: str):
+        if record["fingerprint"] != request_fingerprint:
+            self.counters["mismatched"] += 1
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        self.counters["replayed"] += 1
+        return JSONResponse(
+            record["content"],
+            status_code=record["status_code"],
+            headers={**record["headers"], "Idempotent-Replayed": "true"},
+        )
+
+    def stats(self) -> dict:
+        return {**self.counters, "inflight": len(self._running), "backend": type(self.backend).__name__}
+
+
+def make_backend():
+    return RedisBackend(IDEMPOTENCY_URL) if IDEMPOTENCY_URL else MemoryBackend(maxsize=IDEMPOTENCY_CACHE_SIZE)
+
+
+idempotency_store = IdempotencyStore(make_backend())
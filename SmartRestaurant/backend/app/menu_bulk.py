@@ -0,0 +1,354 @@
+import codecs
+import csv
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import AsyncIterable, AsyncIterator, Callable
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.categories import Category
+from app.models.menu_items import MenuItem
+from app.streaming import MEDIA_TYPES, csv_chunk, ndjson_chunk
+from database import async_session_factory
+
+# Rows validated and written per executemany
+MENU_IMPORT_CHUNK_SIZE = int(os.getenv("MENU_IMPORT_CHUNK_SIZE", "500"))
+# The report lists at most this many failed rows; error_count has the total
+MENU_IMPORT_MAX_ERRORS = int(os.getenv("MENU_IMPORT_MAX_ERRORS", "100"))
+# Rows fetched per round trip while exporting
+MENU_EXPORT_BATCH_SIZE = int(os.getenv("MENU_EXPORT_BATCH_SIZE", "1000"))
+
+CONTENT_TYPE_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/json": "jsonl",
+}
+
+
+class CategoryRow(BaseModel):
+    category_id: int | None = Field(default=None, gt=0)
+    name: str = Field(min_length=1)
+
+
+class MenuItemRow(BaseModel):
+    item_id: int | None = Field(default=None, gt=0)
+    name: str = Field(min_length=1)
+    description: str | None = None
+    price: float = Field(ge=0)
+    image_url: str | None = None
+    category_id: int
+
+
+@dataclass(frozen=True)
+class BulkSpec:
+    model: type
+    row: type[BaseModel]
+    key: str
+    # Values a new row needs that have no server-side default
+    insert_defaults: Callable[[], dict] = dict
+
+    @property
+    def table(self):
+        return self.model.__table__
+
+    @property
+    def columns(self) -> list[str]:
+        return [column.name for column in self.table.columns]
+
+
+SPECS = {
+    "items": BulkSpec(MenuItem, MenuItemRow, "item_id", lambda: {"created_at": datetime.now(timezone.utc)}),
+    "categories": BulkSpec(Category, CategoryRow, "category_id"),
+}
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    error_count: int = 0
+    errors: list[dict] = field(default_factory=list)
+    committed: bool = False
+
+    def fail(self, line: int, error: str):
+        self.error_count += 1
+        if len(self.errors) < MENU_IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+
+def resolve_format(requested: str | None, content_type: str | None) -> str | None:
+    if requested:
+        return requested if requested in MEDIA_TYPES else None
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPE_FORMATS.get(media_type)
+
+
+async def iter_line_batches(chunks: AsyncIterable[bytes]) -> AsyncIterator[list[str]]:
+    """The complete lines of every body chunk, without their line endings."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        if lines:
+            yield [line.removesuffix("\r") for line in lines]
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield [pending.removesuffix("\r")]
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    async for lines in iter_line_batches(chunks):
+        for line in lines:
+            yield line
+
+
+class IncompleteRecord(Exception):
+    """The lines received so far end inside a quoted CSV field."""
+
+
+class CsvLineBuffer:
+    """Feeds one csv.reader the lines of a body that is still arriving.
+
+    The reader pulls lines itself, continuing quoted fields across them.
+    Running out in the middle of a record raises IncompleteRecord; the caller
+    rewinds and calls the reader again once more lines are in, and since
+    csv.reader starts every call on a fresh record it reads that record again
+    from its first line.
+    """
+
+    def __init__(self):
+        self.lines: list[str] = []
+        # Line number of lines[0], and the current record's bounds in lines
+        self.first_number = 1
+        self.start = 0
+        self.position = 0
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if self.position < len(self.lines):
+            self.position += 1
+            # The line break is part of a quoted field that spans lines
+            return self.lines[self.position - 1] + "\n"
+        if self.finished and self.position == self.start:
+            raise StopIteration
+        raise IncompleteRecord
+
+    @property
+    def record_number(self) -> int:
+        return self.first_number + self.start
+
+    def extend(self, lines: list[str]):
+        # Records before `start` are done with
+        del self.lines[:self.start]
+        self.first_number += self.start
+        self.position -= self.start
+        self.start = 0
+        self.lines.extend(lines)
+
+    def next_record(self):
+        self.start = self.position
+
+    def rewind(self):
+        self.position = self.start
+
+
+async def iter_csv_records(chunks: AsyncIterable[bytes]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    buffer = CsvLineBuffer()
+    reader = csv.reader(buffer)
+    header: list[str] | None = None
+    batches = iter_line_batches(chunks)
+    while not buffer.finished:
+        try:
+            buffer.extend(await anext(batches))
+        except StopAsyncIteration:
+            buffer.finished = True
+        while True:
+            try:
+                values = next(reader)
+            except StopIteration:
+                break
+            except IncompleteRecord:
+                if buffer.finished:
+                    yield buffer.record_number, None, "Unterminated quoted field"
+                    return
+                buffer.rewind()
+                break
+            line = buffer.record_number
+            buffer.next_record()
+            if not values or (len(values) == 1 and not values[0].strip()):
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line, None, f"Expected {len(header)} columns, got {len(values)}"
+                continue
+            # Empty cells mean "not set" so optional fields fall back to None
+            yield line, {name: value for name, value in zip(header, values) if value != ""}, None
+
+
+async def iter_records(chunks: AsyncIterable[bytes], fmt: str) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """(line number, parsed row, parse error) for every non-blank record of the body."""
+    if fmt == "csv":
+        async for record in iter_csv_records(chunks):
+            yield record
+        return
+    line_number = 0
+    async for line in iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, f"Invalid JSON: {exc}"
+            continue
+        if isinstance(data, dict):
+            yield line_number, data, None
+        else:
+            yield line_number, None, "Expected a JSON object"
+
+
+def validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()
+    )
+
+
+def _upsert(dialect_name: str, spec: BulkSpec):
+    insert_fn = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    statement = insert_fn(spec.table)
+    row_fields = [name for name in spec.row.model_fields if name != spec.key]
+    return statement.on_conflict_do_update(
+        index_elements=[spec.key],
+        set_={name: statement.excluded[name] for name in row_fields},
+    )
+
+
+class MenuImporter:
+    """Validates rows chunk by chunk and writes each chunk with one executemany.
+
+    Everything runs in the caller's transaction; the caller commits or rolls
+    back once the whole body has been read.
+    """
+
+    def __init__(self, session: AsyncSession, spec: BulkSpec, chunk_size: int = MENU_IMPORT_CHUNK_SIZE):
+        self.session = session
+        self.spec = spec
+        self.chunk_size = chunk_size
+        self.report = ImportReport()
+        # key -> line, so a key repeated anywhere in the body is reported
+        self._seen_keys: dict[int, int] = {}
+        self._known_categories: set[int] = set()
+        self._explicit_keys = False
+
+    async def run(self, records: AsyncIterator[tuple[int, dict | None, str | None]]) -> ImportReport:
+        chunk: list[tuple[int, BaseModel]] = []
+        async for line, data, error in records:
+            self.report.rows += 1
+            if error is not None:
+                self.report.fail(line, error)
+                continue
+            try:
+                row = self.spec.row.model_validate(data)
+            except ValidationError as exc:
+                self.report.fail(line, validation_message(exc))
+                continue
+            key = getattr(row, self.spec.key)
+            if key is not None:
+                if key in self._seen_keys:
+                    self.report.fail(line, f"{self.spec.key} {key} already appears on line {self._seen_keys[key]}")
+                    continue
+                self._seen_keys[key] = line
+            chunk.append((line, row))
+            if len(chunk) >= self.chunk_size:
+                await self._write(chunk)
+                chunk = []
+        if chunk:
+            await self._write(chunk)
+        if self._explicit_keys:
+            await self._sync_sequence()
+        # Reference checks run per chunk, so errors arrive slightly out of order
+        self.report.errors.sort(key=lambda error: error["line"])
+        return self.report
+
+    async def _write(self, chunk: list[tuple[int, BaseModel]]):
+        if self.spec.model is MenuItem:
+            chunk = await self._check_categories(chunk)
+        key_column = self.spec.table.c[self.spec.key]
+        keys = [getattr(row, self.spec.key) for _, row in chunk if getattr(row, self.spec.key) is not None]
+        existing = set()
+        if keys:
+            existing = set((await self.session.exec(select(key_column).where(key_column.in_(keys)))).scalars().all())
+
+        defaults = self.spec.insert_defaults()
+        keyed, new = [], []
+        for _, row in chunk:
+            values = row.model_dump()
+            if values[self.spec.key] is None:
+                del values[self.spec.key]
+                new.append({**defaults, **values})
+            else:
+                keyed.append({**defaults, **values})
+        if keyed:
+            await self.session.exec(_upsert(self.session.bind.dialect.name, self.spec), params=keyed)
+            self._explicit_keys = True
+        if new:
+            await self.session.exec(insert(self.spec.table), params=new)
+        self.report.updated += len(existing)
+        self.report.inserted += len(keyed) - len(existing) + len(new)
+
+    async def _check_categories(self, chunk: list[tuple[int, MenuItemRow]]) -> list[tuple[int, MenuItemRow]]:
+        unknown = {row.category_id for _, row in chunk} - self._known_categories
+        if unknown:
+            self._known_categories.update((await self.session.exec(
+                select(Category.category_id).where(Category.category_id.in_(unknown))
+            )).scalars().all())
+        valid = []
+        for line, row in chunk:
+            if row.category_id in self._known_categories:
+                valid.append((line, row))
+            else:
+                self.report.fail(line, f"category_id: category {row.category_id} does not exist")
+        return valid
+
+    async def _sync_sequence(self):
+        # Explicit keys don't advance a serial sequence; without this the next
+        # row created without a key would collide with an imported one
+        if self.session.bind.dialect.name != "postgresql":
+            return
+        table, key = self.spec.table.name, self.spec.key
+        await self.session.exec(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', '{key}'), "
+            f"(SELECT COALESCE(MAX({key}), 1) FROM {table}))"
+        ))
+
+
+async def export_rows(spec: BulkSpec, fmt: str, batch_size: int = MENU_EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Stream a whole table as CSV or JSON lines without loading it into memory.
+
+    Opens its own session: the response body is produced after the request's
+    dependencies may already have been closed.
+    """
+    columns = spec.columns
+    async with async_session_factory() as session:
+        result = await session.stream(
+            select(spec.table).order_by(spec.table.c[spec.key]).execution_options(yield_per=batch_size)
+        )
+        if fmt == "csv":
+            yield csv_chunk([columns])
+        async for partition in result.partitions():
+            if fmt == "csv":
+                yield csv_chunk(partition)
+            else:
+                yield ndjson_chunk(dict(zip(columns, row)) for row in partition)
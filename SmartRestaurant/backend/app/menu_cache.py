@@ -0,0 +1,81 @@
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+from fastapi import Request, Response
+
+# Snapshots are rebuilt after an admin write or, at the latest, after this many
+# seconds so that other uvicorn workers pick up changes made through a sibling.
+MENU_CACHE_TTL = float(os.getenv("MENU_CACHE_TTL", "60"))
+
+
+@dataclass(frozen=True)
+class MenuSnapshot:
+    version: int
+    body: bytes
+    etag: str
+    built_at: float
+
+
+class MenuCache:
+    """Versioned store of pre-serialized menu responses."""
+
+    def __init__(self, ttl: float = MENU_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = 0
+        self._snapshots: dict[str, MenuSnapshot] = {}
+        self.counters = {"hit": 0, "miss": 0}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    async def get(self, key: str, build: Callable[[], Awaitable[bytes]]) -> MenuSnapshot:
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and snapshot.version == self._version and not self._expired(snapshot):
+            self.counters["hit"] += 1
+            return snapshot
+        self.counters["miss"] += 1
+
+        version = self._version
+        body = await build()
+        # Content hash rather than the version counter, so every worker hands
+        # out the same ETag for the same menu.
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        snapshot = MenuSnapshot(version=version, body=body, etag=etag, built_at=time.monotonic())
+        with self._lock:
+            # Don't store a snapshot built from data that was invalidated mid-build
+            if self._version == version:
+                self._snapshots[key] = snapshot
+        return snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._snapshots.clear()
+
+    def _expired(self, snapshot: MenuSnapshot) -> bool:
+        return self.ttl > 0 and time.monotonic() - snapshot.built_at > self.ttl
+
+
+menu_cache = MenuCache()
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison function
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+def snapshot_response(request: Request, snapshot: MenuSnapshot) -> Response:
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
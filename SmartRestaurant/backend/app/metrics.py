@@ -0,0 +1,311 @@
+import asyncio
+import bisect
+import json
+import math
+import os
+import time
+from typing import Callable, Iterable
+
+# Shared directory (e.g. a tmpfs) where every uvicorn worker drops its metrics
+# so that whichever worker is scraped reports the totals of all of them
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+# When set, /metrics wants "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Updates happen on the event loop thread only, so the collectors are plain
+# dicts without locks; a scrape reads them on the same thread.
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: dict[tuple, object] = {}
+
+    def samples(self) -> list:
+        return [[list(labels), value] for labels, value in self.values.items()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        self.values[labels] = value
+
+    def inc(self, *labels, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) - amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, *labels, value: float):
+        # Per-bucket (not cumulative) counts, then sum and count
+        state = self.values.get(labels)
+        if state is None:
+            state = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+        # Called at scrape time for values that live elsewhere (pools, caches)
+        self.collectors: list[Callable[[], Iterable[Metric]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Metric]]):
+        self.collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        metrics = list(self.metrics.values())
+        for collector in self.collectors:
+            try:
+                metrics.extend(collector())
+            except Exception:
+                # A broken collector must not take the whole scrape down
+                continue
+        return {
+            "pid": os.getpid(),
+            "at": time.time(),
+            "metrics": {
+                metric.name: {
+                    "type": metric.kind,
+                    "help": metric.help,
+                    "labelnames": list(metric.labelnames),
+                    "buckets": list(getattr(metric, "buckets", ())),
+                    "samples": metric.samples(),
+                }
+                for metric in metrics
+            },
+        }
+
+    def render(self, metrics_dir: str | None = METRICS_DIR) -> str:
+        snapshots = [self.snapshot()]
+        if metrics_dir:
+            snapshots.extend(read_snapshots(metrics_dir, exclude_pid=os.getpid()))
+        return render_text(merge(snapshots, per_worker_gauges=bool(metrics_dir)))
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_snapshots(metrics_dir: str, exclude_pid: int) -> list[dict]:
+    snapshots = []
+    for filename in os.listdir(metrics_dir):
+        if not (filename.startswith("metrics-") and filename.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(metrics_dir, filename)) as handle:
+                snapshot = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        if snapshot["pid"] != exclude_pid:
+            snapshots.append(snapshot)
+    return snapshots
+
+
+def merge(snapshots: list[dict], per_worker_gauges: bool) -> dict:
+    """Sum counters and histograms over workers; gauges get a pid label instead.
+
+    Counters of workers that have exited keep counting towards the totals so
+    they never go backwards; their gauges are dropped.
+    """
+    merged: dict[str, dict] = {}
+    for snapshot in snapshots:
+        alive = snapshot["pid"] == os.getpid() or pid_alive(snapshot["pid"])
+        for name, metric in snapshot["metrics"].items():
+            target = merged.get(name)
+            if target is None:
+                labelnames = metric["labelnames"] + (["pid"] if per_worker_gauges and metric["type"] == "gauge" else [])
+                target = merged[name] = {**metric, "labelnames": labelnames, "samples": {}}
+            if metric["type"] == "gauge":
+                if not alive:
+                    continue
+                for labels, value in metric["samples"]:
+                    key = tuple(labels) + ((str(snapshot["pid"]),) if per_worker_gauges else ())
+                    target["samples"][key] = value
+                continue
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target["samples"][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target["samples"][key] = current + value
+    return merged
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: list[str], values: Iterable, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if value.is_integer():
+            return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_text(merged: dict) -> str:
+    """Prometheus text exposition format 0.0.4."""
+    lines = []
+    for name, metric in sorted(merged.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for labels, value in sorted(metric["samples"].items()):
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(metric['labelnames'], labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], math.inf], value):
+                cumulative += count
+                le = 'le="' + _number(float(bound)) + '"'
+                lines.append(f"{name}_bucket{_labels(metric['labelnames'], labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric['labelnames'], labels)} {_number(value[-2])}")
+            lines.append(f"{name}_count{_labels(metric['labelnames'], labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsWriter:
+    """Writes this worker's snapshot to METRICS_DIR every `interval` seconds."""
+
+    def __init__(self, registry: MetricsRegistry, metrics_dir: str | None = METRICS_DIR, interval: float = METRICS_FLUSH_INTERVAL):
+        self.registry = registry
+        self.metrics_dir = metrics_dir
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.metrics_dir, f"metrics-{os.getpid()}.json")
+
+    def write(self):
+        # Replace atomically so a sibling never reads half a file
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as handle:
+            json.dump(self.registry.snapshot(), handle)
+        os.replace(temporary, self.path)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.write()
+            except OSError:
+                pass
+
+    def start(self):
+        if self.metrics_dir:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self.write()
+
+
+def router_label(route) -> str:
+    # app.routers.orders -> "orders"; "other" for unmatched paths and app-level routes
+    module = getattr(getattr(route, "endpoint", None), "__module__", "")
+    return module.rsplit(".", 1)[-1] if module.startswith("app.routers.") else "other"
+
+
+class MetricsMiddleware:
+    """Request count, latency, in-flight and errors per router."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec()
+            router = router_label(scope.get("route"))
+            http_requests.inc(router, scope["method"], str(status_code))
+            http_latency.observe(router, value=elapsed)
+            if status_code >= 500:
+                http_errors.inc(router)
+
+
+registry = MetricsRegistry()
+metrics_writer = MetricsWriter(registry)
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by router, method and status code.", ("router", "method", "status"))
+http_errors = registry.counter("http_request_errors_total", "HTTP requests that ended in a 5xx or an unhandled error.", ("router",))
+http_latency = registry.histogram("http_request_duration_seconds", "HTTP request latency by router.", ("router",))
+http_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being served.")
+
+orders_created = registry.counter("orders_created_total", "Orders placed.")
+order_transitions = registry.counter("order_status_transitions_total", "Order status changes.", ("from_status", "to_status"))
+logins = registry.counter("logins_total", "Login attempts by outcome and role.", ("result", "role"))
@@ -1,5 +1,6 @@
 from sqlmodel import SQLModel, Field
 from datetime import datetime, timezone
+from app.models.types import UTCDateTime
 
 class MenuItem(SQLModel, table=True):
     __tablename__ = "menu_items"
@@ -9,4 +10,4 @@ class MenuItem(SQLModel, table=True):
     price: float
     image_url: str | None = None
     category_id: int = Field(foreign_key="categories.category_id")
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), sa_type=UTCDateTime)
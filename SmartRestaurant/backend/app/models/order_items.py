@@ -1,16 +1,22 @@
 from typing import Optional, TYPE_CHECKING
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 if TYPE_CHECKING:
     from app.models.orders import Order
 from datetime import datetime, timezone
+from app.models.types import UTCDateTime
 
 class OrderItem(SQLModel, table=True):
     __tablename__ = "order_items"
+    # Line items of given orders: order detail, batch reads and the order export
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+    )
     id: int = Field(default=None, primary_key=True)
     order_id: int = Field(foreign_key="orders.order_id")
     item_id: int = Field(foreign_key="menu_items.item_id")
     quantity: int
     price_each: float
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), sa_type=UTCDateTime)
     
     order: Optional["Order"] = Relationship(back_populates="items")
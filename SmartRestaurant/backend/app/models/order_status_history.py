@@ -1,10 +1,15 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from datetime import datetime, timezone
+from app.models.types import UTCDateTime
 
 class OrderStatusHistory(SQLModel, table=True):
     __tablename__ = "order_status_history"
+    __table_args__ = (
+        Index("ix_order_status_history_order_id_new_status", "order_id", "new_status"),
+    )
     id: int = Field(default=None, primary_key=True)
     order_id: int = Field(foreign_key="orders.order_id")
     old_status: str | None = None
     new_status: str
-    changed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    changed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), sa_type=UTCDateTime)
@@ -1,6 +1,8 @@
 from typing import List, Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime, timezone
+from app.models.types import UTCDateTime
 
 class OrderBase(SQLModel):
     customer_id: int = Field(foreign_key="users.user_id")
@@ -22,10 +24,25 @@ class OrderBase(SQLModel):
     
     rider_earning: float = 0.0
 
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), sa_type=UTCDateTime)
+
+    # First time the order reached each stage, denormalized from order_status_history
+    ready_at: datetime | None = Field(default=None, sa_type=UTCDateTime)
+    picked_up_at: datetime | None = Field(default=None, sa_type=UTCDateTime)
+    delivered_at: datetime | None = Field(default=None, sa_type=UTCDateTime)
 
 class Order(OrderBase, table=True):
     __tablename__ = "orders"
+    # Back the keyset pagination of GET /orders (newest first, by created_at then order_id)
+    __table_args__ = (
+        Index("ix_orders_created_at_order_id", "created_at", "order_id"),
+        Index("ix_orders_status_created_at_order_id", "status", "created_at", "order_id"),
+        Index("ix_orders_customer_id_created_at_order_id", "customer_id", "created_at", "order_id"),
+        # Rider-scoped lists: a rider's active orders and paged delivery history
+        Index("ix_orders_assigned_rider_id_status_created_at_order_id", "assigned_rider_id", "status", "created_at", "order_id"),
+        # Delivery-time analytics filter on the delivery date
+        Index("ix_orders_delivered_at", "delivered_at"),
+    )
     order_id: int = Field(default=None, primary_key=True)
     
     items: List["OrderItem"] = Relationship(back_populates="order")
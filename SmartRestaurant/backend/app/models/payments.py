@@ -1,11 +1,17 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from datetime import datetime, timezone
+from app.models.types import UTCDateTime
 
 class Payment(SQLModel, table=True):
     __tablename__ = "payments"
+    # Latest payment of an order (the order export) without touching the others
+    __table_args__ = (
+        Index("ix_payments_order_id_payment_id", "order_id", "payment_id"),
+    )
     payment_id: int = Field(default=None, primary_key=True)
     order_id: int = Field(foreign_key="orders.order_id")
     method: str
     amount: float
     status: str
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), sa_type=UTCDateTime)
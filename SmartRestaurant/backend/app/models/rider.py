@@ -1,5 +1,7 @@
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional
+from datetime import datetime
+from app.models.types import UTCDateTime
 from .user import User
 
 class RiderProfile(SQLModel, table=True):
@@ -11,5 +13,7 @@ class RiderProfile(SQLModel, table=True):
     vehicle_details: str
     current_lat: float = 0.0
     current_lng: float = 0.0
+    # Time of the fix behind current_lat/lng, written by the location flusher
+    location_updated_at: datetime | None = Field(default=None, sa_type=UTCDateTime)
     is_online: bool = False
     rating: float = 5.0
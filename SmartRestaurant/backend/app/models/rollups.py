@@ -0,0 +1,33 @@
+from datetime import date
+from sqlmodel import SQLModel, Field
+
+# Daily aggregates kept up to date by app.rollups as orders are created and
+# change status. `day` is the UTC date the order was created on.
+
+class DailyStatusRollup(SQLModel, table=True):
+    __tablename__ = "daily_status_rollups"
+    day: date = Field(primary_key=True)
+    status: str = Field(primary_key=True)
+    order_count: int = 0
+    revenue: float = 0.0
+
+class DailyItemRollup(SQLModel, table=True):
+    __tablename__ = "daily_item_rollups"
+    day: date = Field(primary_key=True)
+    item_id: int = Field(primary_key=True)
+    quantity: int = 0
+    revenue: float = 0.0
+
+class DailyCategoryRollup(SQLModel, table=True):
+    __tablename__ = "daily_category_rollups"
+    day: date = Field(primary_key=True)
+    category_id: int = Field(primary_key=True)
+    quantity: int = 0
+    revenue: float = 0.0
+
+class DailyRiderRollup(SQLModel, table=True):
+    __tablename__ = "daily_rider_rollups"
+    day: date = Field(primary_key=True)
+    rider_id: int = Field(primary_key=True)
+    delivered_orders: int = 0
+    earnings: float = 0.0
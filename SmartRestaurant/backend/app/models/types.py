@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+from sqlalchemy.types import DateTime, TypeDecorator
+
+
+class UTCDateTime(TypeDecorator):
+    """Naive-UTC `timestamp without time zone` column.
+
+    The models default to aware UTC datetimes, which asyncpg refuses to bind to
+    a naive timestamp column, so aware values are converted to naive UTC first.
+    """
+
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value: datetime | None, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
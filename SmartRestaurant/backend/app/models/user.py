@@ -1,12 +1,13 @@
 from sqlmodel import SQLModel, Field
 from datetime import datetime, timezone
+from app.models.types import UTCDateTime
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
     user_id: int = Field(default=None, primary_key=True)
     name: str
-    email: str
+    email: str = Field(index=True)
     password_hash: str
     role: str
     phone: str
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), sa_type=UTCDateTime)
@@ -0,0 +1,501 @@
+import re
+import time as timer
+from datetime import date, datetime, time, timedelta
+import numpy as np
+from app.columnar import DIMENSIONS, PARTITIONED, ColumnarStore, Frame, columnar_store, table_columns
+
+# Analytics over the columnar export (app.columnar) instead of the live
+# database: every metric is a handful of vectorized numpy passes over the
+# memory-mapped columns of the months in range. Results are as fresh as the
+# last `python export_columnar.py` run.
+
+# Order-date column every partitioned table is filtered on, like the rollups
+TABLE_DATES = {
+    "orders": "created_at",
+    "order_items": "order_created_at",
+    "order_status_history": "order_created_at",
+    "payments": "order_created_at",
+}
+
+TIME_PARTS = ("day", "month", "year", "hour", "weekday")
+PERCENTILE = re.compile(r"^p(\d{1,2}(?:\.\d+)?)$")
+NAT = np.iinfo(np.int64).min
+EPOCH = date(1970, 1, 1)
+
+
+def date_mask(timestamps: np.ndarray, start: date | None, end: date | None) -> np.ndarray:
+    """Inclusive start/end dates over naive UTC timestamps; NaT never matches."""
+    mask = ~np.isnat(timestamps)
+    if start is not None:
+        mask &= timestamps >= np.datetime64(datetime.combine(start, time.min), "us")
+    if end is not None:
+        mask &= timestamps < np.datetime64(datetime.combine(end + timedelta(days=1), time.min), "us")
+    return mask
+
+
+def seconds_between(first: np.ndarray, last: np.ndarray) -> np.ndarray:
+    # NaT on either side gives NaN
+    return (last - first) / np.timedelta64(1, "s")
+
+
+def from_microseconds(value) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(microseconds=int(value))
+
+
+def named(expression: str) -> tuple[str, str]:
+    """"alias=expression" or a bare expression, named after itself."""
+    name, separator, expression = expression.partition("=")
+    if not separator:
+        expression = name
+        name = expression.replace(":", "_")
+    return name.strip(), expression.strip()
+
+
+def key_codes(frame: Frame, expression: str):
+    """int64 codes for a group-by key and a function turning a code back into a value."""
+    name, _, part = expression.partition(":")
+    column = np.asarray(frame[name])
+    if column.dtype.kind == "M":
+        if part and part not in TIME_PARTS:
+            raise ValueError(f"Unknown time part {part!r}, use one of {', '.join(TIME_PARTS)}")
+        missing = np.isnat(column)
+        if part == "day":
+            codes = column.astype("datetime64[D]").astype(np.int64)
+            decode = lambda code: EPOCH + timedelta(days=int(code))
+        elif part == "month":
+            codes = column.astype("datetime64[M]").astype(np.int64)
+            decode = lambda code: date(1970 + int(code) // 12, int(code) % 12 + 1, 1)
+        elif part == "year":
+            codes = column.astype("datetime64[Y]").astype(np.int64)
+            decode = lambda code: 1970 + int(code)
+        elif part == "hour":
+            codes = column.astype("datetime64[h]").astype(np.int64) % 24
+            decode = int
+        elif part == "weekday":
+            # 1970-01-01 was a Thursday; Monday is 0
+            codes = (column.astype("datetime64[D]").astype(np.int64) + 3) % 7
+            decode = int
+        else:
+            codes = column.astype("datetime64[us]").astype(np.int64)
+            decode = from_microseconds
+        codes = np.where(missing, NAT, codes)
+        return codes, lambda code: None if code == NAT else decode(code)
+    if part:
+        raise ValueError(f"{name} is not a timestamp, so it has no {part!r}")
+    if name in frame.dictionaries:
+        values = frame.dictionaries[name]
+        return column.astype(np.int64), lambda code: None if code < 0 else values[code]
+    if column.dtype.kind == "f":
+        return column.view(np.int64), lambda code: (lambda value: None if np.isnan(value) else float(value))(np.int64(code).view(np.float64))
+    return column.astype(np.int64), lambda code: None if code < 0 else int(code)
+
+
+def factorize(codes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Distinct codes and each row's index into them, like np.unique(return_inverse=True)."""
+    if len(codes):
+        low, high = int(codes.min()), int(codes.max())
+        # Keys are mostly small ranges (dictionary codes, days, hours): count instead of sort
+        if high - low <= 4 * len(codes) + 65536:
+            offsets = codes - low
+            present = np.bincount(offsets, minlength=high - low + 1) > 0
+            return np.flatnonzero(present) + low, (np.cumsum(present) - 1)[offsets]
+    unique, inverse = np.unique(codes, return_inverse=True)
+    return unique, inverse.reshape(-1)
+
+
+class GroupedValues:
+    """A numeric or timestamp column split by group, NULLs left out as in SQL.
+
+    NULL is NaN for floats, NaT for timestamps and -1 for integers (the
+    store's nullable ids). Timestamps are aggregated as microseconds since
+    the column's earliest value, which keeps sums for the mean exact enough,
+    and decode() turns results back into datetimes.
+    """
+
+    def __init__(self, values: np.ndarray, inverse: np.ndarray, groups: int):
+        values = np.asarray(values)
+        self.integral = values.dtype.kind in "iu"
+        self.timestamps = values.dtype.kind == "M"
+        self.origin = 0
+        if self.timestamps:
+            present = ~np.isnat(values)
+            values = values[present].astype("datetime64[us]").astype(np.int64)
+            self.origin = int(values.min(initial=0))
+            values = (values - self.origin).astype(np.float64)
+        elif self.integral:
+            present = values >= 0
+            values = values[present].astype(np.float64)
+        else:
+            values = values.astype(np.float64)
+            present = ~np.isnan(values)
+            values = values[present]
+        self.inverse, self.values = inverse[present], values
+        self.groups = groups
+        self.counts = np.bincount(self.inverse, minlength=groups)
+        self._ordered = None
+
+    def decode(self, results: np.ndarray) -> np.ndarray:
+        """Aggregates of a timestamp column as datetimes (None where NaN); others as they are."""
+        if not self.timestamps:
+            return results
+        return np.array([None if np.isnan(value) else from_microseconds(round(value) + self.origin) for value in results], dtype=object)
+
+    def sum(self) -> np.ndarray:
+        sums = np.bincount(self.inverse, weights=self.values, minlength=self.groups)
+        return sums.round().astype(np.int64) if self.integral else sums
+
+    def mean(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.bincount(self.inverse, weights=self.values, minlength=self.groups) / self.counts
+
+    def extreme(self, function) -> np.ndarray:
+        result = np.full(self.groups, np.nan)
+        function.at(result, self.inverse, self.values)
+        return result
+
+    def percentile(self, quantile: float) -> np.ndarray:
+        # Linear interpolation between the closest ranks, like percentile_cont;
+        # the sort is shared by every percentile of the column
+        if self._ordered is None:
+            self._ordered = self.values[np.lexsort((self.values, self.inverse))]
+        if not len(self._ordered):
+            return np.full(self.groups, np.nan)
+        starts = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+        position = np.maximum(self.counts - 1, 0) * quantile
+        lower = np.floor(position).astype(np.int64)
+        last = len(self._ordered) - 1
+        low = self._ordered[np.minimum(starts + lower, last)]
+        high = self._ordered[np.minimum(starts + np.ceil(position).astype(np.int64), last)]
+        return np.where(self.counts > 0, low + (high - low) * (position - lower), np.nan)
+
+
+def aggregate(function: str, grouped: GroupedValues) -> np.ndarray:
+    if function == "sum":
+        if grouped.timestamps:
+            raise ValueError("Timestamps can't be summed; use min, max, mean or pNN")
+        return grouped.sum()
+    if function == "mean":
+        return grouped.mean()
+    if function in ("min", "max"):
+        return grouped.extreme(np.fmin if function == "min" else np.fmax)
+    match = PERCENTILE.match(function)
+    if match is None:
+        raise ValueError(f"Unknown aggregate {function!r}, use count, sum, mean, min, max or pNN")
+    return grouped.percentile(float(match.group(1)) / 100)
+
+
+def python_value(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    return value
+
+
+def group_by(
+    frame: Frame, by: list[str], aggregates: list[str],
+    order_by: str | None = None, descending: bool = True, limit: int | None = None,
+) -> list[dict]:
+    """GROUP BY over `frame`.
+
+    Keys are columns, optionally truncated with :day, :month, :year, :hour or
+    :weekday when they are timestamps; aggregates are "count" or
+    "function:column" with sum, mean, min, max or pNN (e.g. p95). Either may
+    be given an output name as "name=expression". Without keys the whole frame
+    is one group, as in SQL.
+    """
+    keys = [named(expression) for expression in by]
+    measures = []
+    for name, expression in (named(expression) for expression in aggregates):
+        function, _, column = expression.partition(":")
+        if function != "count" and not column:
+            raise ValueError(f"{expression!r} needs a column, as in {function}:column")
+        measures.append((name, function, column))
+
+    encoded = [key_codes(frame, expression) for _, expression in keys]
+    # Factorize every key, fold them into one mixed-radix code and factorize that
+    distinct = []
+    combined = np.zeros(len(frame), dtype=np.int64)
+    for codes, _ in encoded:
+        unique, inverse = factorize(codes)
+        distinct.append(unique)
+        combined = combined * max(len(unique), 1) + inverse
+    group_codes, inverse = factorize(combined) if keys else (np.zeros(1, np.int64), combined)
+    groups = len(group_codes)
+    key_values = []
+    for unique, (_, decode) in reversed(list(zip(distinct, encoded))):
+        group_codes, index = np.divmod(group_codes, max(len(unique), 1))
+        key_values.insert(0, [decode(code) for code in unique[index]])
+
+    columns, grouped = {}, {}
+    for name, function, column in measures:
+        if function == "count":
+            columns[name] = np.bincount(inverse, minlength=groups)
+            continue
+        if column not in grouped:
+            grouped[column] = GroupedValues(frame[column], inverse, groups)
+        columns[name] = grouped[column].decode(aggregate(function, grouped[column]))
+    rows = []
+    for group in range(groups):
+        row = {name: values[group] for (name, _), values in zip(keys, key_values)}
+        row.update({name: python_value(values[group]) for name, values in columns.items()})
+        rows.append(row)
+
+    if order_by is not None:
+        if rows and order_by not in rows[0]:
+            raise ValueError(f"Can only order by an output column, not {order_by!r}")
+        # Missing values go last either way
+        rows.sort(key=lambda row: (row[order_by] is not None, row[order_by]) if descending else (row[order_by] is None, row[order_by]), reverse=descending)
+    return rows[:limit] if limit is not None else rows
+
+
+class OfflineAnalytics:
+    """The dashboard metrics and ad-hoc group-bys over one columnar export.
+
+    An instance pins the manifest it was created with, so all of its answers
+    come from the same export even if a new one lands meanwhile. Exports keep
+    one previous generation on disk; an instance that outlives two exports
+    finds its files gone and moves on to the current manifest.
+    """
+
+    def __init__(self, store: ColumnarStore = columnar_store):
+        self.store = store
+        self.manifest = store.manifest()
+        self._dimensions: dict[str, Frame] = {}
+
+    def _read(self, read):
+        """read(manifest) on the pinned manifest, retried once on the current one if its files were removed."""
+        try:
+            return read(self.manifest)
+        except FileNotFoundError:
+            self.manifest = self.store.manifest()
+            self._dimensions.clear()
+            return read(self.manifest)
+
+    def dimension(self, name: str) -> Frame:
+        if name not in self._dimensions:
+            self._dimensions[name] = self._read(lambda manifest: self.store.dimension(manifest, name))
+        return self._dimensions[name]
+
+    def lookup(self, dimension: str, column: str, ids: np.ndarray) -> tuple[np.ndarray, list[str] | None]:
+        """`column` of the dimension rows with the given ids (-1, NaN or NULL code when missing)."""
+        frame = self.dimension(dimension)
+        keys = np.asarray(frame[DIMENSIONS[dimension].key])
+        values = np.asarray(frame[column])
+        ids = np.asarray(ids)
+        fill = np.nan if values.dtype.kind == "f" else -1
+        # Ids are small dense integers, so a direct index beats a join
+        dense = np.full(int(max(keys.max(initial=0), ids.max(initial=0))) + 1, fill, dtype=values.dtype)
+        dense[keys] = values
+        result = dense[np.maximum(ids, 0)]
+        result[ids < 0] = fill
+        return result, frame.dictionaries.get(column)
+
+    def table(self, name: str, start: date | None = None, end: date | None = None, columns: list[str] | None = None) -> Frame:
+        """Rows of a partitioned table whose order was created within the inclusive date range."""
+        date_column = TABLE_DATES[name]
+        stored = None if columns is None else sorted({*columns, date_column})
+        frame = self._read(lambda manifest: self.store.scan(manifest, name, stored, start, end))
+        if start is not None or end is not None:
+            frame = frame.filter(date_mask(frame[date_column], start, end))
+        return frame
+
+    def derived_columns(self, table: str) -> dict:
+        """Computed columns: name -> (stored columns needed, function of the frame)."""
+        def named_lookup(dimension: str, column: str, source: str):
+            return lambda frame: self.lookup(dimension, column, frame[source])
+
+        derived = {
+            "orders": {
+                "delivery_seconds": (["ready_at", "delivered_at"], lambda frame: (seconds_between(frame["ready_at"], frame["delivered_at"]), None)),
+                "fulfilment_seconds": (["created_at", "delivered_at"], lambda frame: (seconds_between(frame["created_at"], frame["delivered_at"]), None)),
+                "customer_name": (["customer_id"], named_lookup("users", "name", "customer_id")),
+                "rider_name": (["assigned_rider_id"], named_lookup("users", "name", "assigned_rider_id")),
+            },
+            "order_items": {
+                "line_total": (["quantity", "price_each"], lambda frame: (frame["quantity"] * frame["price_each"], None)),
+                "item_name": (["item_id"], named_lookup("menu_items", "name", "item_id")),
+                "category_id": (["item_id"], named_lookup("menu_items", "category_id", "item_id")),
+                "category_name": (["item_id"], lambda frame: self.lookup("categories", "name", self.lookup("menu_items", "category_id", frame["item_id"])[0])),
+                "customer_name": (["order_customer_id"], named_lookup("users", "name", "order_customer_id")),
+                "rider_name": (["order_assigned_rider_id"], named_lookup("users", "name", "order_assigned_rider_id")),
+            },
+        }
+        return derived.get(table, {})
+
+    def scan(self, table: str, columns: list[str], start: date | None = None, end: date | None = None) -> Frame:
+        """Like table(), with computed columns filled in as well."""
+        if table not in PARTITIONED:
+            raise ValueError(f"Unknown table {table!r}, use one of {', '.join(PARTITIONED)}")
+        derived = self.derived_columns(table)
+        stored_columns = table_columns(PARTITIONED[table])
+        stored = set()
+        for column in columns:
+            if column in derived:
+                stored.update(derived[column][0])
+            elif column in stored_columns:
+                stored.add(column)
+            else:
+                raise ValueError(f"Unknown column {column!r} of {table}, use one of {', '.join([*stored_columns, *derived])}")
+        frame = self.table(table, start, end, sorted(stored))
+        for column in columns:
+            if column in derived:
+                values, dictionary = derived[column][1](frame)
+                frame = frame.with_columns({column: dictionary} if dictionary is not None else None, **{column: values})
+        return frame
+
+    def custom(
+        self, table: str, by: list[str], aggregates: list[str], start: date | None = None, end: date | None = None,
+        filters: list[str] | None = None, order_by: str | None = None, descending: bool = True, limit: int | None = None,
+    ) -> list[dict]:
+        """group_by() over a table, after "column=value" filters (several values as a|b)."""
+        conditions = []
+        for condition in filters or []:
+            column, separator, values = condition.partition("=")
+            if not separator:
+                raise ValueError(f"Filters look like column=value, not {condition!r}")
+            conditions.append((column.strip(), values.split("|")))
+        columns = {named(expression)[1].partition(":")[0] for expression in by}
+        columns.update(named(expression)[1].partition(":")[2] for expression in aggregates)
+        columns.update(column for column, _ in conditions)
+        columns.discard("")
+
+        frame = self.scan(table, sorted(columns), start, end)
+        if conditions:
+            mask = np.ones(len(frame), dtype=bool)
+            for column, values in conditions:
+                if frame[column].dtype.kind == "M":
+                    raise ValueError(f"{column} is a timestamp; filter dates with start and end")
+                if column not in frame.dictionaries:
+                    try:
+                        values = [float(value) for value in values]
+                    except ValueError:
+                        raise ValueError(f"{column} is numeric, can't compare it with {values!r}")
+                mask &= frame.isin(column, values)
+            frame = frame.filter(mask)
+        return group_by(frame, by, aggregates, order_by=order_by, descending=descending, limit=limit)
+
+    def _delivered(self, start: date | None, end: date | None, columns: list[str]) -> Frame:
+        frame = self.table("orders", start, end, ["status", *columns])
+        return frame.filter(frame.isin("status", ["delivered"]))
+
+    def _deliveries(self, start: date | None, end: date | None, columns: list[str]) -> Frame:
+        # Filtered on the delivery date; an order is never delivered before it is
+        # created, so months after `end` are skipped but earlier ones are needed
+        stored = sorted({"ready_at", "delivered_at", *columns})
+        frame = self._read(lambda manifest: self.store.scan(manifest, "orders", stored, None, end))
+        frame = frame.filter(date_mask(frame["delivered_at"], start, end) & ~np.isnat(frame["ready_at"]))
+        return frame.with_columns(delivery_seconds=seconds_between(frame["ready_at"], frame["delivered_at"]))
+
+    def total_orders(self, start: date | None = None, end: date | None = None):
+        return {"total_orders": len(self.table("orders", start, end, []))}
+
+    def total_revenue(self, start: date | None = None, end: date | None = None):
+        return {"total_revenue": float(np.sum(self._delivered(start, end, ["total_amount"])["total_amount"]))}
+
+    def daily_revenue(self, start: date | None = None, end: date | None = None):
+        return group_by(self._delivered(start, end, ["total_amount"]), ["day=created_at:day"], ["revenue=sum:total_amount"], order_by="day")
+
+    def monthly_revenue(self, start: date | None = None, end: date | None = None):
+        rows = group_by(self._delivered(start, end, ["total_amount"]), ["month=created_at:month"], ["revenue=sum:total_amount"], order_by="month")
+        return [{"month": datetime.combine(row["month"], time.min), "revenue": row["revenue"]} for row in rows]
+
+    def total_customers(self, start: date | None = None, end: date | None = None):
+        # Not tied to orders, so the date range doesn't apply
+        return {"total_customers": int(np.count_nonzero(self.dimension("users").isin("role", ["customer"])))}
+
+    def orders_by_status(self, start: date | None = None, end: date | None = None):
+        return group_by(self.table("orders", start, end, ["status"]), ["status"], ["count"], order_by="count")
+
+    def top_items(self, start: date | None = None, end: date | None = None):
+        frame = self.scan("order_items", ["item_name", "quantity"], start, end)
+        return group_by(frame, ["name=item_name"], ["total_sold=sum:quantity"], order_by="total_sold", limit=5)
+
+    def top_riders(self, start: date | None = None, end: date | None = None):
+        frame = self._delivered(start, end, ["assigned_rider_id"])
+        frame = frame.filter(frame["assigned_rider_id"] >= 0)
+        names, dictionary = self.lookup("users", "name", frame["assigned_rider_id"])
+        frame = frame.with_columns({"rider": dictionary}, rider=names)
+        return group_by(frame, ["rider"], ["delivered_orders=count"], order_by="delivered_orders")
+
+    def avg_order_value(self, start: date | None = None, end: date | None = None):
+        amounts = self.table("orders", start, end, ["total_amount"])["total_amount"]
+        return {"average_order_value": float(np.mean(amounts)) if len(amounts) else 0}
+
+    def avg_delivery_time(self, start: date | None = None, end: date | None = None):
+        seconds = self._deliveries(start, end, [])["delivery_seconds"]
+        return {"average_delivery_time": timedelta(seconds=float(np.mean(seconds))) if len(seconds) else None}
+
+    def orders_per_customer(self, start: date | None = None, end: date | None = None):
+        users = self.dimension("users")
+        customers = users.filter(users.isin("role", ["customer"]))
+        placed = np.asarray(self.table("orders", start, end, ["customer_id"])["customer_id"])
+        ids = np.asarray(customers["user_id"])
+        per_customer = np.bincount(placed, minlength=int(ids.max(initial=0)) + 1)[ids] if len(ids) else np.zeros(0, np.int64)
+        # Grouped by name like the live query, customers without orders included
+        frame = customers.with_columns(orders=per_customer)
+        return group_by(frame, ["name"], ["orders=sum:orders"], order_by="orders")
+
+    def payment_success_rate(self, start: date | None = None, end: date | None = None):
+        # The live endpoint is still a placeholder; the export has the real payments
+        statuses = self.table("payments", start, end, ["status"])
+        if not len(statuses):
+            return {"success_rate": None}
+        return {"success_rate": float(np.count_nonzero(statuses.isin("status", ["success"])) / len(statuses))}
+
+    def top_category(self, start: date | None = None, end: date | None = None):
+        frame = self.scan("order_items", ["category_name", "quantity"], start, end)
+        return group_by(frame, ["name=category_name"], ["total_sold=sum:quantity"], order_by="total_sold", limit=1)
+
+    def delivery_times(self, start: date | None = None, end: date | None = None):
+        frame = self._deliveries(start, end, ["assigned_rider_id"])
+        names, dictionary = self.lookup("users", "name", frame["assigned_rider_id"])
+        frame = frame.with_columns({"rider": dictionary}, rider=names)
+        stats = [
+            "deliveries=count", "avg_seconds=mean:delivery_seconds", "p50_seconds=p50:delivery_seconds",
+            "p90_seconds=p90:delivery_seconds", "p95_seconds=p95:delivery_seconds",
+        ]
+        return {
+            "overall": group_by(frame, [], stats)[0],
+            "by_rider": group_by(frame, ["rider_id=assigned_rider_id", "rider"], stats, order_by="p50_seconds", descending=False),
+            "by_day": group_by(frame, ["day=delivered_at:day"], stats, order_by="day", descending=False),
+        }
+
+    def dashboard(self, start: date | None = None, end: date | None = None, names: list[str] | None = None) -> dict:
+        """Every metric (or `names`) at once, shaped like GET /admin/analytics/dashboard."""
+        results = {}
+        started = timer.perf_counter()
+        for name in names or OFFLINE_METRICS:
+            metric_started = timer.perf_counter()
+            try:
+                result = {"value": OFFLINE_METRICS[name](self, start, end)}
+            except Exception as exc:
+                result = {"error": f"{type(exc).__name__}: {exc}"}
+            result["elapsed_ms"] = round((timer.perf_counter() - metric_started) * 1000, 3)
+            results[name] = result
+        return {
+            "start": start,
+            "end": end,
+            "exported_at": self.manifest["exported_at"],
+            "metrics": results,
+            "elapsed_ms": round((timer.perf_counter() - started) * 1000, 3),
+        }
+
+
+# Same names as the live dashboard
+OFFLINE_METRICS = {
+    "total-orders": OfflineAnalytics.total_orders,
+    "total-revenue": OfflineAnalytics.total_revenue,
+    "daily-revenue": OfflineAnalytics.daily_revenue,
+    "monthly-revenue": OfflineAnalytics.monthly_revenue,
+    "total-customers": OfflineAnalytics.total_customers,
+    "orders-by-status": OfflineAnalytics.orders_by_status,
+    "top-items": OfflineAnalytics.top_items,
+    "top-riders": OfflineAnalytics.top_riders,
+    "avg-order-value": OfflineAnalytics.avg_order_value,
+    "avg-delivery-time": OfflineAnalytics.avg_delivery_time,
+    "orders-per-customer": OfflineAnalytics.orders_per_customer,
+    "payment-success-rate": OfflineAnalytics.payment_success_rate,
+    "top-category": OfflineAnalytics.top_category,
+    "delivery-times": OfflineAnalytics.delivery_times,
+}
@@ -0,0 +1,101 @@
+import os
+from datetime import datetime
+from typing import AsyncIterator
+from sqlalchemy import and_, select
+from sqlalchemy.orm import aliased
+from app.models.menu_items import MenuItem
+from app.models.order_items import OrderItem
+from app.models.orders import Order
+from app.models.payments import Payment
+from app.streaming import csv_chunk, ndjson_chunk
+from database import async_session_factory
+
+# Rows fetched per round trip from the server-side cursor
+ORDER_EXPORT_BATCH_SIZE = int(os.getenv("ORDER_EXPORT_BATCH_SIZE", "2000"))
+
+ORDER_COLUMNS = [
+    "order_id", "order_number", "created_at", "status", "customer_id", "customer_name", "assigned_rider_id",
+    "total_amount", "rider_earning", "ready_at", "picked_up_at", "delivered_at",
+    "payment_method", "payment_status", "payment_amount",
+]
+LINE_COLUMNS = ["line_id", "item_id", "item_name", "category_id", "quantity", "price_each", "line_total"]
+
+
+def export_statement(created_from: datetime | None, created_to: datetime | None, statuses: list[str] | None):
+    """One row per line item, order and payment columns repeated, in order_id order."""
+    # An order may have several payment attempts; join only its latest, i.e.
+    # the payment with no later one for the same order. The NOT EXISTS probe
+    # runs per joined payment on ix_payments_order_id_payment_id, so filtered
+    # exports only touch the payments of the matching orders. The previous
+    # MAX() ... GROUP BY subquery aggregated every payment whatever matched.
+    later = aliased(Payment)
+    no_later_payment = ~(
+        select(later.payment_id)
+        .where(later.order_id == Payment.order_id, later.payment_id > Payment.payment_id)
+        .exists()
+    )
+    statement = (
+        select(
+            Order.order_id, Order.order_number, Order.created_at, Order.status, Order.customer_id,
+            Order.customer_name, Order.assigned_rider_id, Order.total_amount, Order.rider_earning,
+            Order.ready_at, Order.picked_up_at, Order.delivered_at,
+            Payment.method.label("payment_method"), Payment.status.label("payment_status"),
+            Payment.amount.label("payment_amount"),
+            OrderItem.id.label("line_id"), OrderItem.item_id, MenuItem.name.label("item_name"),
+            MenuItem.category_id, OrderItem.quantity, OrderItem.price_each,
+            (OrderItem.quantity * OrderItem.price_each).label("line_total"),
+        )
+        .select_from(Order)
+        .outerjoin(Payment, and_(Payment.order_id == Order.order_id, no_later_payment))
+        .outerjoin(OrderItem, OrderItem.order_id == Order.order_id)
+        .outerjoin(MenuItem, MenuItem.item_id == OrderItem.item_id)
+        .order_by(Order.order_id, OrderItem.id)
+    )
+    if created_from is not None:
+        statement = statement.where(Order.created_at >= created_from)
+    if created_to is not None:
+        statement = statement.where(Order.created_at < created_to)
+    if statuses:
+        statement = statement.where(Order.status.in_(statuses))
+    return statement
+
+
+async def export_orders(
+    fmt: str, created_from: datetime | None = None, created_to: datetime | None = None,
+    statuses: list[str] | None = None, batch_size: int = ORDER_EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """Stream orders with their line items as CSV (one row per line) or JSON lines (one order per line).
+
+    Rows come off a server-side cursor batch by batch, so memory stays flat
+    however many orders match. Opens its own session for the same reason as
+    menu_bulk.export_rows.
+    """
+    columns = ORDER_COLUMNS + LINE_COLUMNS
+    async with async_session_factory() as session:
+        result = await session.stream(
+            export_statement(created_from, created_to, statuses).execution_options(yield_per=batch_size)
+        )
+        if fmt == "csv":
+            yield csv_chunk([columns])
+            async for partition in result.partitions():
+                yield csv_chunk(partition)
+            return
+
+        # Rows arrive grouped by order, so an order is complete when the next one starts;
+        # the last order of a batch is carried over in case its lines continue
+        current: dict | None = None
+        order_width = len(ORDER_COLUMNS)
+        async for partition in result.partitions():
+            finished = []
+            for row in partition:
+                if current is None or current["order_id"] != row[0]:
+                    if current is not None:
+                        finished.append(current)
+                    current = dict(zip(ORDER_COLUMNS, row[:order_width]))
+                    current["items"] = []
+                if row[order_width] is not None:
+                    current["items"].append(dict(zip(LINE_COLUMNS, row[order_width:])))
+            if finished:
+                yield ndjson_chunk(finished)
+        if current is not None:
+            yield ndjson_chunk([current])
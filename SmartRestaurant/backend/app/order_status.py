@@ -0,0 +1,108 @@
+from datetime import datetime, timezone
+from typing import Literal
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_, select, update
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.order_status_history import OrderStatusHistory
+from app.models.orders import Order
+from app.rollups import record_status_change
+
+OrderStatus = Literal["pending", "preparing", "ready", "assigned", "picked_up", "delivered", "cancelled"]
+
+# Allowed moves: pending -> preparing -> ready -> assigned -> picked_up ->
+# delivered, and cancelled from any state before delivery
+ORDER_TRANSITIONS: dict[str, set[str]] = {
+    "pending": {"preparing", "cancelled"},
+    "preparing": {"ready", "cancelled"},
+    "ready": {"assigned", "cancelled"},
+    "assigned": {"picked_up", "cancelled"},
+    "picked_up": {"delivered", "cancelled"},
+    "delivered": set(),
+    "cancelled": set(),
+}
+
+# All a rider may do: accept (or be given) an order, pick it up, deliver it
+RIDER_STATUSES = ("assigned", "picked_up", "delivered")
+
+# Statuses whose first arrival is stamped on the order itself
+STAGE_COLUMNS = {
+    "ready": "ready_at",
+    "picked_up": "picked_up_at",
+    "delivered": "delivered_at",
+}
+
+
+class StatusConflict(HTTPException):
+    """The order isn't in a state that allows the change (409)."""
+
+    def __init__(self, order: Order, message: str):
+        super().__init__(
+            status_code=409,
+            detail={
+                "message": message,
+                "order_id": order.order_id,
+                "status": order.status,
+                "assigned_rider_id": order.assigned_rider_id,
+            },
+        )
+
+
+async def apply_status_change(session: AsyncSession, order: Order, new_status: str, rider_id: int | None = None) -> str | None:
+    """Move `order` to `new_status` with its history row, stage timestamp and rollups.
+
+    The status is written with one conditional UPDATE on the status read into
+    `order`, so of two concurrent changes from the same state only one can
+    succeed; the loser gets a StatusConflict. `rider_id` is the acting rider:
+    they may only move orders into RIDER_STATUSES (403 otherwise), only touch
+    orders that are unassigned or already theirs, and become the rider of an
+    order they move to "assigned". That is the only way an order gets a
+    rider, so "assigned" without one is rejected (400). Asking for the status
+    the order already has is a no-op. Everything is added to the caller's
+    transaction; returns the old status.
+    """
+    old_status = order.status
+    if rider_id is not None and new_status not in RIDER_STATUSES:
+        raise HTTPException(status_code=403, detail=f"Riders cannot move orders to {new_status}")
+    if rider_id is not None and order.assigned_rider_id not in (None, rider_id):
+        raise StatusConflict(order, "Order is assigned to another rider")
+    if new_status == old_status:
+        return old_status
+    if new_status not in ORDER_TRANSITIONS.get(old_status, set()):
+        raise StatusConflict(order, f"Cannot move an order from {old_status} to {new_status}")
+    if new_status == "assigned" and rider_id is None:
+        raise HTTPException(status_code=400, detail="Orders are assigned by a rider accepting them or by dispatch")
+
+    changed_at = datetime.now(timezone.utc)
+    values = {"status": new_status}
+    stage_column = STAGE_COLUMNS.get(new_status)
+    if stage_column and getattr(order, stage_column) is None:
+        values[stage_column] = changed_at
+    statement = update(Order).where(Order.order_id == order.order_id, Order.status == old_status)
+    if rider_id is not None:
+        statement = statement.where(or_(Order.assigned_rider_id.is_(None), Order.assigned_rider_id == rider_id))
+        if new_status == "assigned":
+            values["assigned_rider_id"] = rider_id
+    # "evaluate" copies the new values onto `order` without another round trip
+    result = await session.exec(statement.values(values).execution_options(synchronize_session="evaluate"))
+    if result.rowcount != 1:
+        # Someone else got there first; report the state that won
+        await session.refresh(order)
+        raise StatusConflict(order, "Order was changed by someone else")
+
+    session.add(OrderStatusHistory(order_id=order.order_id, old_status=old_status, new_status=new_status, changed_at=changed_at))
+    await record_status_change(session, order, old_status, new_status)
+    return old_status
+
+
+def backfill_stage_timestamps(session: Session):
+    """Fill empty stage timestamps from order_status_history (first arrival wins)."""
+    for status, column_name in STAGE_COLUMNS.items():
+        column = getattr(Order, column_name)
+        first_arrival = (
+            select(func.min(OrderStatusHistory.changed_at))
+            .where(and_(OrderStatusHistory.order_id == Order.order_id, OrderStatusHistory.new_status == status))
+            .scalar_subquery()
+        )
+        session.exec(update(Order).where(column.is_(None)).values({column_name: first_arrival}))
+    session.commit()
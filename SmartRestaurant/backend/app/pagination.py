@@ -0,0 +1,72 @@
+import base64
+import json
+import os
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import func, or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+
+# Cursors are opaque to clients: base64 of "<created_at iso>|<id>" of the last row
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(statement, created_col, id_col, cursor: str | None, limit: int):
+    """Newest-first page of `statement` that starts strictly after `cursor`."""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        statement = statement.where(
+            or_(
+                created_col < created_at,
+                (created_col == created_at) & (id_col < row_id),
+            )
+        )
+    # One extra row tells us whether another page exists
+    return statement.order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def split_page(rows: list, limit: int, created_attr: str, id_attr: str) -> tuple[list, str | None]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_attr), getattr(last, id_attr))
+
+
+async def count_rows(session: AsyncSession, statement, mode: str) -> int | None:
+    """Row count of `statement` (without ORDER BY/LIMIT).
+
+    mode "exact" runs COUNT(*); "estimate" asks the Postgres planner for its
+    row estimate, which is O(1) but can drift after bulk changes until the
+    next ANALYZE. Other databases fall back to the exact count.
+    """
+    if mode == "none":
+        return None
+    dialect = session.bind.dialect
+    if mode == "estimate" and dialect.name == "postgresql":
+        compiled = statement.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+        params = compiled.params
+        if compiled.positional:
+            params = tuple(params[name] for name in compiled.positiontup)
+        connection = await session.connection()
+        plan = (await connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), params)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    count_statement = select(func.count()).select_from(statement.order_by(None).subquery())
+    return (await session.exec(count_statement)).one()
@@ -0,0 +1,342 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Requests over either budget are flagged: counted, logged and kept in the slow log
+PROFILE_MAX_QUERIES = int(os.getenv("PROFILE_MAX_QUERIES", "20"))
+PROFILE_MAX_MS = float(os.getenv("PROFILE_MAX_MS", "500"))
+PROFILE_SLOW_LOG_SIZE = int(os.getenv("PROFILE_SLOW_LOG_SIZE", "100"))
+# Adds a Server-Timing header (app and db time) that browser dev tools display
+PROFILE_SERVER_TIMING = os.getenv("PROFILE_SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+# Opt-in stack sampling of the event loop thread while requests are in flight
+PROFILE_SAMPLING = os.getenv("PROFILE_SAMPLING", "false").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+# Distinct stacks kept per endpoint; rarer ones beyond this are dropped
+PROFILE_MAX_STACKS = int(os.getenv("PROFILE_MAX_STACKS", "2000"))
+
+# Statement text is truncated to this in the per-request breakdown
+STATEMENT_KEY_LENGTH = 160
+
+
+@dataclass
+class RequestProfile:
+    method: str
+    path: str
+    started: float = field(default_factory=time.perf_counter)
+    route: str | None = None
+    # Name of the endpoint function, which is what the stack sampler keys on
+    handler: str | None = None
+    status_code: int | None = None
+    wall_ms: float = 0.0
+    db_ms: float = 0.0
+    queries: int = 0
+    rows: int = 0
+    # statement -> [executions, seconds]; repeats point at N+1 loops
+    statements: dict[str, list] = field(default_factory=dict)
+
+    def add_query(self, statement: str, seconds: float, rows: int):
+        self.queries += 1
+        self.db_ms += seconds * 1000
+        self.rows += rows
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    @property
+    def endpoint(self) -> str:
+        # Unmatched paths are lumped together so scanners can't grow the table
+        return f"{self.method} {self.route or '(unmatched)'}"
+
+    def over_budget(self) -> list[str]:
+        reasons = []
+        if self.queries > PROFILE_MAX_QUERIES:
+            reasons.append(f"{self.queries} queries > {PROFILE_MAX_QUERIES}")
+        if self.wall_ms > PROFILE_MAX_MS:
+            reasons.append(f"{self.wall_ms:.0f}ms > {PROFILE_MAX_MS:.0f}ms")
+        return reasons
+
+    def summary(self) -> dict:
+        repeated = sorted(self.statements.items(), key=lambda item: item[1][0], reverse=True)
+        return {
+            "endpoint": self.endpoint,
+            "path": self.path,
+            "status_code": self.status_code,
+            "wall_ms": round(self.wall_ms, 3),
+            "db_ms": round(self.db_ms, 3),
+            "queries": self.queries,
+            "rows": self.rows,
+            "top_statements": [
+                {"statement": statement[:STATEMENT_KEY_LENGTH], "count": count, "ms": round(seconds * 1000, 3)}
+                for statement, (count, seconds) in repeated[:5]
+            ],
+        }
+
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar("current_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is None:
+        return
+    started = conn.info["profile_started"].pop()
+    if cursor.description is None:
+        rows = max(cursor.rowcount, 0)
+    else:
+        # The async adapters buffer the result set on execute; psycopg2 reports it as rowcount
+        buffered = getattr(cursor, "_rows", None)
+        rows = len(buffered) if buffered is not None else max(cursor.rowcount, 0)
+    profile.add_query(statement, time.perf_counter() - started, rows)
+
+
+def _handle_error(exception_context):
+    # Keep the start-time stack balanced when a statement fails
+    if current_profile.get() is not None:
+        started = exception_context.connection.info.get("profile_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+def instrument_engine(engine):
+    """Attribute every statement run on the (sync) engine to the current request."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+@dataclass
+class EndpointStats:
+    count: int = 0
+    flagged: int = 0
+    errors: int = 0
+    wall_ms: float = 0.0
+    max_wall_ms: float = 0.0
+    db_ms: float = 0.0
+    queries: int = 0
+    max_queries: int = 0
+    rows: int = 0
+
+    def add(self, profile: RequestProfile, flagged: bool):
+        self.count += 1
+        self.flagged += flagged
+        self.errors += (profile.status_code or 500) >= 500
+        self.wall_ms += profile.wall_ms
+        self.max_wall_ms = max(self.max_wall_ms, profile.wall_ms)
+        self.db_ms += profile.db_ms
+        self.queries += profile.queries
+        self.max_queries = max(self.max_queries, profile.queries)
+        self.rows += profile.rows
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "flagged": self.flagged,
+            "errors": self.errors,
+            "avg_wall_ms": round(self.wall_ms / self.count, 3),
+            "max_wall_ms": round(self.max_wall_ms, 3),
+            "avg_db_ms": round(self.db_ms / self.count, 3),
+            "avg_queries": round(self.queries / self.count, 2),
+            "max_queries": self.max_queries,
+            "avg_rows": round(self.rows / self.count, 2),
+        }
+
+
+class StackSampler:
+    """Samples the event loop thread's stack and folds it per endpoint.
+
+    Output is the collapsed format ("frame;frame;frame count") read by
+    flamegraph.pl, speedscope and most flame graph viewers. A sample is
+    charged to the endpoint of the request on the stack, found through the
+    ProfilingMiddleware frame, so validation and serialization count too.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL, max_stacks: int = PROFILE_MAX_STACKS):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.stacks: dict[str, Counter] = {}
+        self.samples = 0
+        self.dropped = 0
+        self.active = 0
+        self._thread: threading.Thread | None = None
+        self._target: int | None = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self, thread_id: int):
+        if self._thread is not None:
+            return
+        self._target = thread_id
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.active:
+                continue
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                self._record(frame)
+
+    def _record(self, frame):
+        names = []
+        endpoint = None
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            if code is ProfilingMiddleware.__call__.__code__:
+                # The request being run: routing has put its route in the scope
+                route = frame.f_locals.get("scope", {}).get("route")
+                endpoint = getattr(getattr(route, "endpoint", None), "__name__", None) or "(routing)"
+            frame = frame.f_back
+        stack = ";".join(reversed(names))
+        with self._lock:
+            # Loop idle or running something other than a request
+            stacks = self.stacks.setdefault(endpoint or "(idle)", Counter())
+            if stack in stacks or len(stacks) < self.max_stacks:
+                stacks[stack] += 1
+                self.samples += 1
+            else:
+                self.dropped += 1
+
+    def folded(self, endpoint: str | None = None) -> str:
+        lines = []
+        with self._lock:
+            for name, stacks in self.stacks.items():
+                if endpoint is not None and name != endpoint:
+                    continue
+                lines.extend(f"{stack} {count}" for stack, count in stacks.most_common())
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def endpoints(self) -> dict[str, int]:
+        with self._lock:
+            return {name: sum(stacks.values()) for name, stacks in self.stacks.items()}
+
+    def reset(self):
+        with self._lock:
+            self.stacks = {}
+            self.samples = 0
+            self.dropped = 0
+
+
+class RequestProfiler:
+    """Per-endpoint request and query statistics of this worker, plus the slow log."""
+
+    def __init__(self, sampling: bool = PROFILE_SAMPLING):
+        self.endpoints: dict[str, EndpointStats] = {}
+        self.slow: deque[dict] = deque(maxlen=PROFILE_SLOW_LOG_SIZE)
+        self.slow_handlers: set[str] = set()
+        self.sampler = StackSampler() if sampling else None
+
+    def begin(self, profile: RequestProfile):
+        if self.sampler is not None:
+            self.sampler.start(threading.get_ident())
+            self.sampler.active += 1
+
+    def finish(self, profile: RequestProfile):
+        if self.sampler is not None:
+            self.sampler.active -= 1
+        reasons = profile.over_budget()
+        stats = self.endpoints.get(profile.endpoint)
+        if stats is None:
+            stats = self.endpoints[profile.endpoint] = EndpointStats()
+        stats.add(profile, bool(reasons))
+        if reasons:
+            if profile.handler is not None:
+                self.slow_handlers.add(profile.handler)
+            summary = {**profile.summary(), "reasons": reasons, "at": time.time()}
+            self.slow.append(summary)
+            logger.warning(
+                "Request over budget (%s): %s %s took %.1fms with %d queries (%.1fms in the database)",
+                ", ".join(reasons), profile.method, profile.path, profile.wall_ms, profile.queries, profile.db_ms,
+            )
+
+    def stop(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def stats(self) -> dict:
+        return {
+            "budgets": {"max_queries": PROFILE_MAX_QUERIES, "max_ms": PROFILE_MAX_MS},
+            "endpoints": {name: stats.as_dict() for name, stats in sorted(self.endpoints.items())},
+            "sampling": None if self.sampler is None else {
+                "interval": self.sampler.interval, "samples": self.sampler.samples, "dropped": self.sampler.dropped,
+                "endpoints": self.sampler.endpoints(),
+            },
+        }
+
+    def folded_stacks(self, endpoint: str | None = None) -> str:
+        """Sampled stacks of one endpoint function, or of every endpoint that went over budget."""
+        if self.sampler is None:
+            return ""
+        if endpoint is not None:
+            return self.sampler.folded(endpoint)
+        return "".join(self.sampler.folded(handler) for handler in sorted(self.slow_handlers))
+
+    def reset(self):
+        self.endpoints.clear()
+        self.slow.clear()
+        self.slow_handlers.clear()
+        if self.sampler is not None:
+            self.sampler.reset()
+
+
+class ProfilingMiddleware:
+    """Times every HTTP request and counts the SQL it runs (see instrument_engine)."""
+
+    def __init__(self, app, profiler: "RequestProfiler | None" = None):
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = current_profile.set(profile)
+        self.profiler.begin(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                if PROFILE_SERVER_TIMING:
+                    elapsed_ms = (time.perf_counter() - profile.started) * 1000
+                    timing = f'app;dur={elapsed_ms:.1f}, db;dur={profile.db_ms:.1f};desc="{profile.queries} queries"'
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get("route")
+            profile.route = getattr(route, "path", None)
+            profile.handler = getattr(getattr(route, "endpoint", None), "__name__", None)
+            profile.wall_ms = (time.perf_counter() - profile.started) * 1000
+            current_profile.reset(token)
+            self.profiler.finish(profile)
+
+
+request_profiler = RequestProfiler()
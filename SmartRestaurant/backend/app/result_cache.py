@@ -0,0 +1,145 @@
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable
+from app.ttl_cache import TTLCache
+
+# Seconds a result is served as fresh, per cache name (e.g. an analytics endpoint)
+# with RESULT_CACHE_TTL as the default; RESULT_CACHE_TTL_<NAME> overrides one name.
+# 0 disables caching for that name.
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "30"))
+# How long past its TTL a result may still be served while it is recomputed
+RESULT_CACHE_STALE = float(os.getenv("RESULT_CACHE_STALE", "300"))
+# redis://... to share results between workers; in-process memory otherwise
+RESULT_CACHE_URL = os.getenv("RESULT_CACHE_URL")
+
+
+class MemoryBackend:
+    def __init__(self, maxsize: int = 2048):
+        self._entries = TTLCache(maxsize=maxsize)
+
+    async def get(self, key: str) -> tuple[float, Any] | None:
+        return self._entries.get(key)
+
+    async def set(self, key: str, stored_at: float, value: Any, expire: float):
+        self._entries.set(key, (stored_at, value), ttl=expire)
+
+    async def add(self, key: str, stored_at: float, value: Any, expire: float) -> bool:
+        return self._entries.add(key, (stored_at, value), ttl=expire)
+
+    async def delete(self, key: str):
+        self._entries.pop(key)
+
+
+class RedisBackend:
+    """Shared backend; values must be JSON serializable."""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RESULT_CACHE_URL is set but the 'redis' package is not installed")
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> tuple[float, Any] | None:
+        raw = await self._client.get(key)
+        if raw is None:
+            return None
+        stored_at, value = json.loads(raw)
+        return stored_at, value
+
+    async def set(self, key: str, stored_at: float, value: Any, expire: float):
+        await self._client.set(key, json.dumps([stored_at, value]), ex=max(1, math.ceil(expire)))
+
+    async def add(self, key: str, stored_at: float, value: Any, expire: float) -> bool:
+        # SET NX: atomic across every worker sharing the server
+        return bool(await self._client.set(key, json.dumps([stored_at, value]), ex=max(1, math.ceil(expire)), nx=True))
+
+    async def delete(self, key: str):
+        await self._client.delete(key)
+
+
+class ResultCache:
+    """TTL cache for computed results with single-flight and stale-while-revalidate.
+
+    Concurrent misses for one key share a single computation. Once a result is
+    older than its TTL but still inside the stale window it is served as is
+    while one background task recomputes it.
+    """
+
+    def __init__(self, backend=None, default_ttl: float = RESULT_CACHE_TTL, stale: float = RESULT_CACHE_STALE, ttls: dict[str, float] | None = None):
+        self.backend = backend or MemoryBackend()
+        self.default_ttl = default_ttl
+        self.stale = stale
+        self.ttls = ttls or {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.counters = {"hit": 0, "stale": 0, "miss": 0, "coalesced": 0, "bypass": 0, "errors": 0}
+
+    def ttl_for(self, name: str) -> float:
+        override = os.getenv("RESULT_CACHE_TTL_" + name.upper().replace("-", "_"))
+        if override is not None:
+            return float(override)
+        return self.ttls.get(name, self.default_ttl)
+
+    async def fetch(self, name: str, params: Any, compute: Callable[[], Awaitable[Any]]) -> tuple[Any, str, float]:
+        """Returns (value, cache status, age in seconds)."""
+        ttl = self.ttl_for(name)
+        if ttl <= 0:
+            self.counters["bypass"] += 1
+            return await compute(), "BYPASS", 0.0
+
+        key = f"{name}:{params}"
+        entry = await self.backend.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                self.counters["hit"] += 1
+                return value, "HIT", age
+            if age < ttl + self.stale:
+                self.counters["stale"] += 1
+                if key not in self._inflight:
+                    self._start(key, compute, ttl)
+                return value, "STALE", age
+
+        self.counters["miss"] += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+        else:
+            task = self._start(key, compute, ttl)
+        # shield: a client disconnecting must not cancel work other callers share
+        return await asyncio.shield(task), "MISS", 0.0
+
+    def _start(self, key: str, compute: Callable[[], Awaitable[Any]], ttl: float) -> asyncio.Task:
+        async def run():
+            value = await compute()
+            await self.backend.set(key, time.time(), value, ttl + self.stale)
+            return value
+
+        task = asyncio.create_task(run())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return task
+
+    def _finished(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieved here so failed background refreshes aren't logged as unhandled
+            self.counters["errors"] += 1
+
+    def stats(self) -> dict:
+        lookups = self.counters["hit"] + self.counters["stale"] + self.counters["miss"]
+        served = self.counters["hit"] + self.counters["stale"]
+        return {
+            **self.counters,
+            "hit_ratio": round(served / lookups, 4) if lookups else None,
+            "inflight": len(self._inflight),
+            "backend": type(self.backend).__name__,
+        }
+
+
+def make_backend():
+    return RedisBackend(RESULT_CACHE_URL) if RESULT_CACHE_URL else MemoryBackend()
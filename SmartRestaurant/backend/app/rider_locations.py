@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from sqlalchemy import bindparam, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.rider import RiderProfile
+from database import async_session_factory
+
+logger = logging.getLogger(__name__)
+
+# Seconds between bulk writes of the latest positions to rider_profiles
+LOCATION_FLUSH_INTERVAL = float(os.getenv("LOCATION_FLUSH_INTERVAL", "5"))
+
+
+class RiderLocationStore:
+    """Latest known position per rider, kept in memory.
+
+    Phones report every few seconds but only the newest fix matters, so fixes
+    overwrite each other here and only riders that moved since the last flush
+    are written back, in one statement.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # rider user_id -> (lat, lng, recorded_at as epoch seconds)
+        self._positions: dict[int, tuple[float, float, float]] = {}
+        self._dirty: set[int] = set()
+        self.counters = {"fixes": 0, "stale_fixes": 0, "future_fixes": 0, "flushes": 0, "rows_flushed": 0, "flush_errors": 0}
+
+    def update(self, rider_id: int, lat: float, lng: float, recorded_at: float | None = None) -> bool:
+        now = time.time()
+        # A phone clock running ahead must not pin the rider to this fix:
+        # later, correctly dated fixes would all look stale next to it
+        future = recorded_at is not None and recorded_at > now
+        recorded_at = now if recorded_at is None or future else recorded_at
+        with self._lock:
+            self.counters["fixes"] += 1
+            self.counters["future_fixes"] += future
+            current = self._positions.get(rider_id)
+            # Fixes can arrive out of order from a batch or a retry
+            if current is not None and current[2] >= recorded_at:
+                self.counters["stale_fixes"] += 1
+                return False
+            self._positions[rider_id] = (lat, lng, recorded_at)
+            self._dirty.add(rider_id)
+            return True
+
+    def get(self, rider_id: int) -> tuple[float, float, float] | None:
+        return self._positions.get(rider_id)
+
+    def positions(self) -> dict[int, tuple[float, float, float]]:
+        with self._lock:
+            return dict(self._positions)
+
+    def take_dirty(self) -> list[dict]:
+        with self._lock:
+            rows = [
+                {
+                    "rider_id": rider_id,
+                    "lat": self._positions[rider_id][0],
+                    "lng": self._positions[rider_id][1],
+                    "recorded_at": datetime.fromtimestamp(self._positions[rider_id][2], timezone.utc).replace(tzinfo=None),
+                }
+                for rider_id in self._dirty
+            ]
+            self._dirty.clear()
+            return rows
+
+    def restore_dirty(self, rows: list[dict]):
+        with self._lock:
+            self._dirty.update(row["rider_id"] for row in rows)
+
+    async def flush(self, session: AsyncSession) -> int:
+        rows = self.take_dirty()
+        if not rows:
+            return 0
+        table = RiderProfile.__table__
+        # One executemany; the timestamp guard keeps a worker holding an older
+        # fix from overwriting a newer one written by a sibling worker
+        statement = (
+            table.update()
+            .where(table.c.user_id == bindparam("rider_id"))
+            .where(or_(table.c.location_updated_at.is_(None), table.c.location_updated_at < bindparam("recorded_at")))
+            .values(current_lat=bindparam("lat"), current_lng=bindparam("lng"), location_updated_at=bindparam("recorded_at"))
+        )
+        try:
+            await session.exec(statement, params=rows)
+            await session.commit()
+        except Exception:
+            self.restore_dirty(rows)
+            self.counters["flush_errors"] += 1
+            raise
+        self.counters["flushes"] += 1
+        self.counters["rows_flushed"] += len(rows)
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {**self.counters, "riders": len(self._positions), "pending": len(self._dirty)}
+
+
+class LocationFlusher:
+    """Background task that flushes the store every `interval` seconds."""
+
+    def __init__(self, store: RiderLocationStore, session_factory, interval: float = LOCATION_FLUSH_INTERVAL):
+        self.store = store
+        self.session_factory = session_factory
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def flush(self) -> int:
+        async with self.session_factory() as session:
+            return await self.store.flush(session)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                # Positions stay pending and go out with the next flush
+                logger.exception("Flushing rider locations failed; %d riders still pending", self.store.stats()["pending"])
+
+    def start(self):
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        # Last positions of this worker shouldn't die with it, nor should a
+        # failure here stop the rest of the shutdown
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final flush of rider locations failed; %d riders not saved", self.store.stats()["pending"])
+
+
+rider_locations = RiderLocationStore()
+location_flusher = LocationFlusher(rider_locations, async_session_factory)
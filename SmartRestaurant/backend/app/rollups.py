@@ -0,0 +1,119 @@
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.menu_items import MenuItem
+from app.models.order_items import OrderItem
+from app.models.orders import Order
+from app.models.rollups import DailyCategoryRollup, DailyItemRollup, DailyRiderRollup, DailyStatusRollup
+
+ROLLUP_MODELS = [DailyStatusRollup, DailyItemRollup, DailyCategoryRollup, DailyRiderRollup]
+
+
+def order_day(order: Order) -> date:
+    created_at: datetime = order.created_at
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+
+def _upsert_increments(dialect_name: str, model, rows: list[dict], keys: list[str]):
+    # INSERT ... ON CONFLICT DO UPDATE SET col = col + excluded.col keeps concurrent
+    # increments from different requests atomic without reading the row first
+    insert_fn = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    table = model.__table__
+    statement = insert_fn(table).values(rows)
+    counters = [column for column in rows[0] if column not in keys]
+    return statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={column: table.c[column] + statement.excluded[column] for column in counters},
+    )
+
+
+async def _apply(session: AsyncSession, model, keys: list[str], increments: dict[tuple, dict]):
+    if not increments:
+        return
+    rows = [dict(zip(keys, key), **values) for key, values in increments.items()]
+    await session.exec(_upsert_increments(session.bind.dialect.name, model, rows, keys))
+
+
+async def record_order_created(session: AsyncSession, order: Order, menu_items: dict[int, MenuItem]):
+    """Count a new order in the rollups, inside the caller's transaction."""
+    day = order_day(order)
+    await _apply(
+        session, DailyStatusRollup, ["day", "status"],
+        {(day, order.status): {"order_count": 1, "revenue": order.total_amount}},
+    )
+
+    # Aggregate per key first: a row may only be touched once per upsert statement
+    items = defaultdict(lambda: {"quantity": 0, "revenue": 0.0})
+    categories = defaultdict(lambda: {"quantity": 0, "revenue": 0.0})
+    for order_item in order.items:
+        revenue = order_item.quantity * order_item.price_each
+        for bucket in (items[(day, order_item.item_id)], categories[(day, menu_items[order_item.item_id].category_id)]):
+            bucket["quantity"] += order_item.quantity
+            bucket["revenue"] += revenue
+    await _apply(session, DailyItemRollup, ["day", "item_id"], dict(items))
+    await _apply(session, DailyCategoryRollup, ["day", "category_id"], dict(categories))
+
+
+async def record_status_change(session: AsyncSession, order: Order, old_status: str | None, new_status: str):
+    """Move an order between status buckets, inside the caller's transaction."""
+    if old_status == new_status:
+        return
+    day = order_day(order)
+    status_changes = {(day, new_status): {"order_count": 1, "revenue": order.total_amount}}
+    if old_status is not None:
+        status_changes[(day, old_status)] = {"order_count": -1, "revenue": -order.total_amount}
+    await _apply(session, DailyStatusRollup, ["day", "status"], status_changes)
+
+    if order.assigned_rider_id is None or "delivered" not in (old_status, new_status):
+        return
+    sign = 1 if new_status == "delivered" else -1
+    await _apply(
+        session, DailyRiderRollup, ["day", "rider_id"],
+        {(day, order.assigned_rider_id): {"delivered_orders": sign, "earnings": sign * order.rider_earning}},
+    )
+
+
+def rebuild_rollups(session: Session):
+    """Recompute every rollup table from the orders history in one transaction."""
+    if session.get_bind().dialect.name == "postgresql":
+        # Hold off order writes so no increment lands between the delete and the backfill
+        session.exec(text("LOCK TABLE orders, order_items IN SHARE MODE"))
+
+    for model in ROLLUP_MODELS:
+        session.exec(delete(model))
+
+    day = func.date(Order.created_at).label("day")
+    session.exec(insert(DailyStatusRollup).from_select(
+        ["day", "status", "order_count", "revenue"],
+        select(day, Order.status, func.count(), func.coalesce(func.sum(Order.total_amount), 0.0))
+        .group_by(day, Order.status),
+    ))
+
+    item_revenue = func.sum(OrderItem.quantity * OrderItem.price_each)
+    session.exec(insert(DailyItemRollup).from_select(
+        ["day", "item_id", "quantity", "revenue"],
+        select(day, OrderItem.item_id, func.sum(OrderItem.quantity), item_revenue)
+        .join(Order, OrderItem.order_id == Order.order_id)
+        .group_by(day, OrderItem.item_id),
+    ))
+    session.exec(insert(DailyCategoryRollup).from_select(
+        ["day", "category_id", "quantity", "revenue"],
+        select(day, MenuItem.category_id, func.sum(OrderItem.quantity), item_revenue)
+        .join(Order, OrderItem.order_id == Order.order_id)
+        .join(MenuItem, OrderItem.item_id == MenuItem.item_id)
+        .group_by(day, MenuItem.category_id),
+    ))
+
+    session.exec(insert(DailyRiderRollup).from_select(
+        ["day", "rider_id", "delivered_orders", "earnings"],
+        select(day, Order.assigned_rider_id, func.count(), func.coalesce(func.sum(Order.rider_earning), 0.0))
+        .where(Order.status == "delivered", Order.assigned_rider_id.is_not(None))
+        .group_by(day, Order.assigned_rider_id),
+    ))
+    session.commit()
@@ -1,7 +1,17 @@
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select, text
-from database import engine
-from datetime import datetime
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import time as timer
+from typing import List, Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlmodel import select, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import async_session_factory, get_session
+from datetime import date, datetime, time, timedelta
 
 # ... imports ... (Match lines 6-12 calling view_file again if I need to be precise, but I have the content)
 from app.models.orders import Order
@@ -10,34 +20,132 @@ from app.models.user import User
 from app.models.order_items import OrderItem
 from app.models.menu_items import MenuItem
 from app.models.order_status_history import OrderStatusHistory
+from app.models.rollups import DailyStatusRollup
+from app.offline_analytics import OFFLINE_METRICS, OfflineAnalytics
+from app.result_cache import ResultCache, make_backend
 
 
 router = APIRouter(prefix="/admin/analytics", tags=["Analytics"])
 
+logger = logging.getLogger(__name__)
 
-def get_session():
-    with Session(engine) as session:
-        yield session
+# Order, revenue, item, category and rider metrics are answered from the daily
+# rollup tables maintained by app.rollups (rebuild with `python rebuild_rollups.py`),
+# so their cost depends on the number of days, not the number of orders.
+#
+# Every metric takes an optional inclusive start/end date range over the order
+# (or status change) date, and GET /dashboard runs any set of them at once.
+
+# Max metrics the dashboard runs in parallel, each on its own pooled connection
+DASHBOARD_CONCURRENCY = int(os.getenv("DASHBOARD_CONCURRENCY", "4"))
+
+
+def day_range(column: str, start: date | None, end: date | None) -> tuple[list[str], dict]:
+    conditions, params = [], {}
+    if start is not None:
+        conditions.append(f"{column} >= :start")
+        params["start"] = start
+    if end is not None:
+        conditions.append(f"{column} <= :end")
+        params["end"] = end
+    return conditions, params
+
+
+def timestamp_range(column: str, start: date | None, end: date | None) -> tuple[list[str], dict]:
+    conditions, params = [], {}
+    if start is not None:
+        conditions.append(f"{column} >= :start_at")
+        params["start_at"] = datetime.combine(start, time.min)
+    if end is not None:
+        conditions.append(f"{column} < :end_before")
+        params["end_before"] = datetime.combine(end + timedelta(days=1), time.min)
+    return conditions, params
+
+
+def seconds_between(earlier: str, later: str, dialect: str) -> str:
+    """SQL for the seconds from `earlier` to `later`."""
+    if dialect == "postgresql":
+        return f"EXTRACT(EPOCH FROM {later} - {earlier})"
+    # SQLite keeps timestamps as text and has no interval type
+    return f"(julianday({later}) - julianday({earlier})) * 86400"
+
+
+def where(conditions: list[str]) -> str:
+    return "WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+class UnsupportedMetric(HTTPException):
+    """The metric can't be computed on this database (501)."""
+
+    def __init__(self, detail: str):
+        super().__init__(status_code=501, detail=detail)
+
+
+# Results barely move second to second, so metrics are cached (RESULT_CACHE_TTL
+# seconds by default) and served stale while they refresh in the background.
+# The heavier, non-rollup queries keep their results longer.
+analytics_cache = ResultCache(
+    make_backend(),
+    ttls={
+        "daily-revenue": 60,
+        "monthly-revenue": 300,
+        "avg-delivery-time": 120,
+        "orders-per-customer": 120,
+        "delivery-times": 120,
+    },
+)
+
+
+async def fetch_metric(name: str, metric, start: date | None, end: date | None):
+    # Computed on a session of its own: a background refresh outlives the request
+    async def compute():
+        async with async_session_factory() as session:
+            return jsonable_encoder(await metric(start=start, end=end, session=session))
+
+    return await analytics_cache.fetch(name, (start, end), compute)
+
+
+def cached_metric(name: str):
+    def decorator(metric):
+        @functools.wraps(metric)
+        async def endpoint(start: date | None = None, end: date | None = None):
+            value, cache_status, age = await fetch_metric(name, metric, start, end)
+            return JSONResponse(value, headers={"X-Cache": cache_status, "Age": str(int(age))})
+
+        # wraps() would hand FastAPI the metric's signature, session dependency
+        # included, and every request would check out a connection it never uses
+        signature = inspect.signature(metric)
+        endpoint.__signature__ = signature.replace(
+            parameters=[parameter for parameter in signature.parameters.values() if parameter.name != "session"]
+        )
+        endpoint.metric = metric
+        return endpoint
+
+    return decorator
 
 
 # 1. Total number of orders
 @router.get("/total-orders")
-def total_orders(session: Session = Depends(get_session)):
-    query = text("SELECT COUNT(*) FROM orders;")
-    result = session.exec(query).first()
-    count = result[0] if result else 0
+@cached_metric("total-orders")
+async def total_orders(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    conditions, params = day_range("day", start, end)
+    query = text(f"SELECT SUM(order_count) FROM daily_status_rollups {where(conditions)};")
+    result = (await session.exec(query, params=params)).first()
+    count = result[0] if result and result[0] else 0
     return {"total_orders": count}
 
 
 # 2. Total revenue (only successful payments)
 @router.get("/total-revenue")
-def total_revenue(session: Session = Depends(get_session)):
-    query = text("""
-        SELECT SUM(total_amount)
-        FROM orders
-        WHERE status = 'delivered';
+@cached_metric("total-revenue")
+async def total_revenue(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    conditions, params = day_range("day", start, end)
+    query = text(f"""
+        SELECT SUM(revenue)
+        FROM daily_status_rollups
+        {where(["status = 'delivered'", *conditions])};
     """)
-    result = session.exec(query).first()
+    result = (await session.exec(query, params=params)).first()
     # result is a tuple (sum,) or None.
     total = result[0] if result and result[0] else 0
     return {"total_revenue": total}
@@ -45,144 +153,322 @@ def total_revenue(session: Session = Depends(get_session)):
 
 # 3. Daily revenue
 @router.get("/daily-revenue")
-def daily_revenue(session: Session = Depends(get_session)):
-    query = text("""
-        SELECT DATE(created_at) AS day, SUM(total_amount) AS revenue
-        FROM orders
-        WHERE status = 'delivered'
+@cached_metric("daily-revenue")
+async def daily_revenue(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    conditions, params = day_range("day", start, end)
+    query = text(f"""
+        SELECT day, SUM(revenue) AS revenue
+        FROM daily_status_rollups
+        {where(["status = 'delivered'", *conditions])}
         GROUP BY day
         ORDER BY day DESC;
     """)
-    return session.exec(query).mappings().all()
+    return (await session.exec(query, params=params)).mappings().all()
 
 
 # 4. Monthly revenue
 @router.get("/monthly-revenue")
-def monthly_revenue(session: Session = Depends(get_session)):
-    query = text("""
-        SELECT DATE_TRUNC('month', created_at) AS month, SUM(total_amount) AS revenue
-        FROM orders
-        WHERE status = 'delivered'
-        GROUP BY month
-        ORDER BY month DESC;
-    """)
-    return session.exec(query).mappings().all()
+@cached_metric("monthly-revenue")
+async def monthly_revenue(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    statement = select(DailyStatusRollup.day, DailyStatusRollup.revenue).where(DailyStatusRollup.status == "delivered")
+    if start is not None:
+        statement = statement.where(DailyStatusRollup.day >= start)
+    if end is not None:
+        statement = statement.where(DailyStatusRollup.day <= end)
+    # At most one row per day and status, so folding days into months here is cheap
+    months = {}
+    for day, revenue in (await session.exec(statement)).all():
+        month = datetime(day.year, day.month, 1)
+        months[month] = months.get(month, 0) + revenue
+    return [{"month": month, "revenue": revenue} for month, revenue in sorted(months.items(), reverse=True)]
 
 
 # 5. Total customers
 @router.get("/total-customers")
-def total_customers(session: Session = Depends(get_session)):
+@cached_metric("total-customers")
+async def total_customers(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    # Not tied to orders, so the date range doesn't apply
     query = text("""
         SELECT COUNT(*)
         FROM users
         WHERE role = 'customer';
     """)
-    result = session.exec(query).first()
+    result = (await session.exec(query)).first()
     total = result[0] if result else 0
     return {"total_customers": total}
 
 
 # 6. Orders by status
 @router.get("/orders-by-status")
-def orders_by_status(session: Session = Depends(get_session)):
-    query = text("""
-        SELECT status, COUNT(*) as count
-        FROM orders
-        GROUP BY status;
+@cached_metric("orders-by-status")
+async def orders_by_status(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    conditions, params = day_range("day", start, end)
+    query = text(f"""
+        SELECT status, SUM(order_count) as count
+        FROM daily_status_rollups
+        {where(conditions)}
+        GROUP BY status
+        HAVING SUM(order_count) > 0;
     """)
-    return session.exec(query).mappings().all()
+    return (await session.exec(query, params=params)).mappings().all()
 
 
 # 7. Top-selling items
 @router.get("/top-items")
-def top_items(session: Session = Depends(get_session)):
-    query = text("""
-        SELECT mi.name, SUM(oi.quantity) AS total_sold
-        FROM order_items oi
-        JOIN menu_items mi ON oi.item_id = mi.item_id
+@cached_metric("top-items")
+async def top_items(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    conditions, params = day_range("r.day", start, end)
+    query = text(f"""
+        SELECT mi.name, SUM(r.quantity) AS total_sold
+        FROM daily_item_rollups r
+        JOIN menu_items mi ON r.item_id = mi.item_id
+        {where(conditions)}
         GROUP BY mi.name
         ORDER BY total_sold DESC
         LIMIT 5;
     """)
-    return session.exec(query).mappings().all()
+    return (await session.exec(query, params=params)).mappings().all()
 
 
 # 8. Most active riders
 @router.get("/top-riders")
-def top_riders(session: Session = Depends(get_session)):
-    query = text("""
-        SELECT u.name AS rider, COUNT(*) AS delivered_orders
-        FROM orders o
-        JOIN users u ON o.assigned_rider_id = u.user_id
-        WHERE o.status = 'delivered'
+@cached_metric("top-riders")
+async def top_riders(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    conditions, params = day_range("r.day", start, end)
+    query = text(f"""
+        SELECT u.name AS rider, SUM(r.delivered_orders) AS delivered_orders
+        FROM daily_rider_rollups r
+        JOIN users u ON r.rider_id = u.user_id
+        {where(conditions)}
         GROUP BY rider
+        HAVING SUM(r.delivered_orders) > 0
         ORDER BY delivered_orders DESC;
     """)
-    return session.exec(query).mappings().all()
+    return (await session.exec(query, params=params)).mappings().all()
 
 
 # 9. Average order value
 @router.get("/avg-order-value")
-def avg_order_value(session: Session = Depends(get_session)):
-    query = text("""
-        SELECT AVG(total_amount)
-        FROM orders;
+@cached_metric("avg-order-value")
+async def avg_order_value(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    conditions, params = day_range("day", start, end)
+    query = text(f"""
+        SELECT SUM(revenue) / NULLIF(SUM(order_count), 0)
+        FROM daily_status_rollups
+        {where(conditions)};
     """)
-    result = session.exec(query).first()
+    result = (await session.exec(query, params=params)).first()
     avg = result[0] if result and result[0] else 0
     return {"average_order_value": avg}
 
 
 # 10. Average delivery time
 @router.get("/avg-delivery-time")
-def avg_delivery_time(session: Session = Depends(get_session)):
-    query = text("""
-        SELECT AVG(delivered.changed_at - ready.changed_at) AS avg_time
-        FROM order_status_history ready
-        JOIN order_status_history delivered
-        ON ready.order_id = delivered.order_id
-        WHERE ready.new_status = 'ready'
-        AND delivered.new_status = 'delivered';
+@cached_metric("avg-delivery-time")
+async def avg_delivery_time(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    # Stage timestamps live on the order itself, so this is a range scan on
+    # ix_orders_delivered_at instead of a self-join of the status history
+    conditions, params = timestamp_range("delivered_at", start, end)
+    seconds = seconds_between("ready_at", "delivered_at", session.bind.dialect.name)
+    query = text(f"""
+        SELECT AVG({seconds}) AS avg_seconds
+        FROM orders
+        {where(["ready_at IS NOT NULL", "delivered_at IS NOT NULL", *conditions])};
     """)
-    result = session.exec(query).first()
-    avg = result[0] if result and result[0] else None 
-    # Return as seconds or string? The frontend likely expects pretty format or raw duration. 
-    # Postgres returns timedelta. FastAPI handles it? 
-    # Let's return as dict.
-    return {"average_delivery_time": avg}
+    avg_seconds = (await session.exec(query, params=params)).scalar()
+    if avg_seconds is None:
+        return {"average_delivery_time": None}
+    # To the millisecond, all julianday() resolves
+    return {"average_delivery_time": timedelta(seconds=round(float(avg_seconds), 3))}
 
 
 # 11. Orders per customer (activity)
 @router.get("/orders-per-customer")
-def orders_per_customer(session: Session = Depends(get_session)):
-    query = text("""
+@cached_metric("orders-per-customer")
+async def orders_per_customer(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    conditions, params = timestamp_range("o.created_at", start, end)
+    # Range goes in the join so customers without orders in it still show up with 0
+    query = text(f"""
         SELECT u.name, COUNT(o.order_id) AS orders
         FROM users u
-        LEFT JOIN orders o ON u.user_id = o.customer_id
+        LEFT JOIN orders o ON {" AND ".join(["u.user_id = o.customer_id", *conditions])}
         WHERE u.role = 'customer'
         GROUP BY u.name
         ORDER BY orders DESC;
     """)
-    return session.exec(query).mappings().all()
+    return (await session.exec(query, params=params)).mappings().all()
 
 
 # 12. Payment success rate
 @router.get("/payment-success-rate")
-def payment_success_rate(session: Session = Depends(get_session)):
+async def payment_success_rate(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
     # Mocking this as we don't handle payments yet
     return {"success_rate": 1.0}
 
 
 # 13. Most popular category
 @router.get("/top-category")
-def top_category(session: Session = Depends(get_session)):
-    query = text("""
-        SELECT c.name, SUM(oi.quantity) AS total_sold
-        FROM order_items oi
-        JOIN menu_items mi ON oi.item_id = mi.item_id
-        JOIN categories c ON mi.category_id = c.category_id
+@cached_metric("top-category")
+async def top_category(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    conditions, params = day_range("r.day", start, end)
+    query = text(f"""
+        SELECT c.name, SUM(r.quantity) AS total_sold
+        FROM daily_category_rollups r
+        JOIN categories c ON r.category_id = c.category_id
+        {where(conditions)}
         GROUP BY c.name
         ORDER BY total_sold DESC
         LIMIT 1;
     """)
-    return session.exec(query).mappings().all()
+    return (await session.exec(query, params=params)).mappings().all()
+
+
+# 14. Delivery time distribution (ready -> delivered, in seconds), overall, per rider and per day
+@router.get("/delivery-times")
+@cached_metric("delivery-times")
+async def delivery_times(start: date | None = None, end: date | None = None, session: AsyncSession = Depends(get_session)):
+    # percentile_cont ... WITHIN GROUP and EXTRACT(EPOCH ...) are Postgres only
+    if session.bind.dialect.name != "postgresql":
+        raise UnsupportedMetric("delivery-times needs PostgreSQL")
+    conditions, params = timestamp_range("delivered_at", start, end)
+    deliveries = f"""
+        WITH deliveries AS (
+            SELECT assigned_rider_id, CAST(delivered_at AS DATE) AS day,
+                   EXTRACT(EPOCH FROM delivered_at - ready_at) AS seconds
+            FROM orders
+            {where(["ready_at IS NOT NULL", "delivered_at IS NOT NULL", *conditions])}
+        )
+    """
+    stats = """
+        COUNT(*) AS deliveries,
+        AVG(seconds) AS avg_seconds,
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY seconds) AS p50_seconds,
+        percentile_cont(0.9) WITHIN GROUP (ORDER BY seconds) AS p90_seconds,
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY seconds) AS p95_seconds
+    """
+    overall = (await session.exec(text(f"{deliveries} SELECT {stats} FROM deliveries;"), params=params)).mappings().first()
+    by_rider = (await session.exec(text(f"""
+        {deliveries}
+        SELECT d.assigned_rider_id AS rider_id, u.name AS rider, {stats}
+        FROM deliveries d
+        LEFT JOIN users u ON d.assigned_rider_id = u.user_id
+        GROUP BY d.assigned_rider_id, u.name
+        ORDER BY p50_seconds;
+    """), params=params)).mappings().all()
+    by_day = (await session.exec(text(f"{deliveries} SELECT day, {stats} FROM deliveries GROUP BY day ORDER BY day;"), params=params)).mappings().all()
+    return {"overall": overall, "by_rider": by_rider, "by_day": by_day}
+
+
+# Everything above in one call, keyed by the endpoint path
+DASHBOARD_METRICS = {
+    "total-orders": total_orders,
+    "total-revenue": total_revenue,
+    "daily-revenue": daily_revenue,
+    "monthly-revenue": monthly_revenue,
+    "total-customers": total_customers,
+    "orders-by-status": orders_by_status,
+    "top-items": top_items,
+    "top-riders": top_riders,
+    "avg-order-value": avg_order_value,
+    "avg-delivery-time": avg_delivery_time,
+    "orders-per-customer": orders_per_customer,
+    "payment-success-rate": payment_success_rate,
+    "top-category": top_category,
+    "delivery-times": delivery_times,
+}
+
+
+@router.get("/dashboard")
+async def dashboard(
+    start: date | None = None,
+    end: date | None = None,
+    metrics: str | None = Query(None, description="Comma-separated metric names, all when omitted"),
+):
+    names = list(DASHBOARD_METRICS) if not metrics else [name.strip() for name in metrics.split(",") if name.strip()]
+    unknown = [name for name in names if name not in DASHBOARD_METRICS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(unknown)}")
+
+    # Metrics run concurrently, each on its own session and through the same
+    # cache as the single endpoints; a failing metric is reported in place so
+    # the others still come back
+    semaphore = asyncio.Semaphore(DASHBOARD_CONCURRENCY)
+
+    async def run(name: str):
+        endpoint = DASHBOARD_METRICS[name]
+        async with semaphore:
+            started = timer.perf_counter()
+            try:
+                if hasattr(endpoint, "metric"):
+                    value, cache_status, _ = await fetch_metric(name, endpoint.metric, start, end)
+                    result = {"value": value, "cache": cache_status}
+                else:
+                    async with async_session_factory() as session:
+                        result = {"value": await endpoint(start=start, end=end, session=session)}
+            except UnsupportedMetric as exc:
+                result = {"unsupported": exc.detail}
+            except Exception:
+                # Database errors carry SQL and parameters; keep those in the log
+                logger.exception("Dashboard metric %s failed", name)
+                result = {"error": "failed"}
+            result["elapsed_ms"] = round((timer.perf_counter() - started) * 1000, 3)
+            return name, result
+
+    started = timer.perf_counter()
+    results = dict(await asyncio.gather(*(run(name) for name in names)))
+    return {
+        "start": start,
+        "end": end,
+        "metrics": results,
+        "elapsed_ms": round((timer.perf_counter() - started) * 1000, 3),
+    }
+
+
+# Offline variants over the columnar export (python export_columnar.py): the
+# same metrics plus ad-hoc group-bys, computed with numpy on a worker thread
+# so heavy reporting neither touches the database nor blocks the event loop.
+
+def offline_analytics() -> OfflineAnalytics:
+    try:
+        return OfflineAnalytics()
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+
+
+@router.get("/offline/dashboard")
+async def offline_dashboard(
+    start: date | None = None,
+    end: date | None = None,
+    metrics: str | None = Query(None, description="Comma-separated metric names, all when omitted"),
+):
+    names = list(OFFLINE_METRICS) if not metrics else [name.strip() for name in metrics.split(",") if name.strip()]
+    unknown = [name for name in names if name not in OFFLINE_METRICS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(unknown)}")
+    analytics = offline_analytics()
+    return await asyncio.get_running_loop().run_in_executor(None, analytics.dashboard, start, end, names)
+
+
+@router.get("/offline/group-by")
+async def offline_group_by(
+    table: Literal["orders", "order_items", "order_status_history", "payments"],
+    by: List[str] = Query([], description="Keys, e.g. status, created_at:month or day=created_at:day"),
+    aggregate: List[str] = Query(["count"], description="count or function:column with sum, mean, min, max, pNN"),
+    where: List[str] = Query([], description="column=value filters, several values as a|b"),
+    start: date | None = None,
+    end: date | None = None,
+    order_by: str | None = None,
+    descending: bool = True,
+    limit: int = Query(1000, ge=1, le=100000),
+):
+    analytics = offline_analytics()
+    try:
+        rows = await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(
+                analytics.custom, table, by, aggregate, start=start, end=end,
+                filters=where, order_by=order_by, descending=descending, limit=limit,
+            ),
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"exported_at": analytics.manifest["exported_at"], "rows": rows}
@@ -2,8 +2,11 @@ from datetime import timedelta, datetime, timezone
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select, SQLModel
-from app.auth import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, get_password_hash, get_session, verify_password, get_current_user
+from sqlmodel import select, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.auth import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, get_password_hash_async, verify_password_async, get_current_user, password_needs_rehash, token_claims
+from app.metrics import logins
+from database import get_session
 from app.models.user import User
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -16,11 +19,9 @@ class UserCreate(SQLModel):
     role: str = "customer"
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, session: Session = Depends(get_session)):
-    # Debug logging
-    print(f"Registering user: {user_data}")
+async def register(user_data: UserCreate, session: AsyncSession = Depends(get_session)):
     # Check if user exists
-    existing_user = session.exec(select(User).where(User.email == user_data.email)).first()
+    existing_user = (await session.exec(select(User).where(User.email == user_data.email))).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -31,33 +32,40 @@ async def register(user_data: UserCreate, session: Session = Depends(get_session
     new_user = User(
         name=user_data.name,
         email=user_data.email,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=await get_password_hash_async(user_data.password),
         phone=user_data.phone,
         role=user_data.role,
         created_at=datetime.now(timezone.utc)
     )
     
     session.add(new_user)
-    session.commit()
-    session.refresh(new_user)
+    await session.commit()
     return {"message": "User created successfully"}
 
 @router.post("/login")
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    user = session.exec(select(User).where(User.email == form_data.username)).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+    user = (await session.exec(select(User).where(User.email == form_data.username))).first()
+    if not user or not await verify_password_async(form_data.password, user.password_hash):
+        logins.inc("failure", user.role if user else "unknown")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
+    # Upgrade the stored hash when the configured bcrypt cost has changed
+    if password_needs_rehash(user.password_hash):
+        user.password_hash = await get_password_hash_async(form_data.password)
+        session.add(user)
+        await session.commit()
+
+    logins.inc("success", user.role)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email, "role": user.role}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer", "role": user.role, "name": user.name}
 
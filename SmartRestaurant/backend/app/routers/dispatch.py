@@ -0,0 +1,138 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.auth import get_token_admin
+from app.dispatch import assign_rider, assignable, auto_assign, dispatcher
+from app.order_status import StatusConflict
+from app.dispatch_optimizer import optimize
+from app.events import event_bus, order_event
+from app.models.orders import Order
+from database import get_session
+
+router = APIRouter(prefix="/admin/dispatch", tags=["Dispatch"])
+
+# Riders are matched from the in-memory spatial index of app.dispatch, fed by
+# POST /rider/location(s); only riders with a recent fix and no active delivery count.
+
+
+@router.get("/nearest")
+async def nearest_riders(
+    lat: float = Query(ge=-90, le=90),
+    lng: float = Query(ge=-180, le=180),
+    k: int = Query(5, ge=1, le=100),
+    current_user = Depends(get_token_admin),
+):
+    riders = []
+    for distance, rider_id in dispatcher.nearest(lat, lng, k):
+        rider_lat, rider_lng = dispatcher.grid.position(rider_id)
+        riders.append({"rider_id": rider_id, "lat": rider_lat, "lng": rider_lng, "distance_km": round(distance, 3)})
+    return riders
+
+
+@router.post("/orders/{order_id}/assign")
+async def assign_order(order_id: int, session: AsyncSession = Depends(get_session), current_user = Depends(get_token_admin)):
+    order = await session.get(Order, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if not assignable(order):
+        raise HTTPException(status_code=409, detail=f"Order is {order.status} and cannot be assigned")
+    assigned = await auto_assign(session, order)
+    if assigned is None:
+        raise HTTPException(status_code=409, detail="No rider available near the restaurant")
+    rider_id, distance = assigned
+    return {"order_id": order.order_id, "rider_id": rider_id, "distance_km": round(distance, 3)}
+
+
+async def waiting_orders(session: AsyncSession, limit: int) -> list[Order]:
+    dispatcher.prune()
+    return (await session.exec(
+        select(Order)
+        .where(Order.status == "ready", Order.assigned_rider_id.is_(None))
+        .order_by(Order.created_at, Order.order_id)
+        .limit(limit)
+    )).all()
+
+
+async def commit_assignments(session: AsyncSession, assignments: list[tuple[Order, int]], unassigned: int) -> list[int]:
+    # One transaction for the whole plan, events only once it is committed.
+    # Orders claimed by a rider while the plan was made are skipped and returned.
+    events, conflicts = [], []
+    for order, rider_id in assignments:
+        try:
+            old_status = await assign_rider(session, order, rider_id)
+        except StatusConflict:
+            conflicts.append(order.order_id)
+            continue
+        events.append(order_event("order.status_changed", order, old_status))
+    try:
+        await session.commit()
+    except Exception:
+        for event in events:
+            dispatcher.release(event["order_id"])
+        raise
+    dispatcher.counters["assigned"] += len(events)
+    dispatcher.counters["no_rider"] += unassigned
+    for event in events:
+        await event_bus.publish(event)
+    return conflicts
+
+
+@router.post("/assign-ready")
+async def assign_ready_orders(
+    limit: int = Query(100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_session),
+    current_user = Depends(get_token_admin),
+):
+    # Greedy: oldest waiting order first takes its nearest free rider
+    orders = await waiting_orders(session, limit)
+    assignments, unassigned = dispatcher.plan(orders)
+    conflicts = await commit_assignments(session, [(order, rider_id) for order, rider_id, _ in assignments], len(unassigned))
+    return {
+        "assigned": [
+            {"order_id": order.order_id, "rider_id": rider_id, "distance_km": round(distance, 3)}
+            for order, rider_id, distance in assignments
+            if order.order_id not in conflicts
+        ],
+        "unassigned": [order.order_id for order in unassigned],
+        "conflicts": conflicts,
+    }
+
+
+@router.post("/optimize")
+async def optimize_ready_orders(
+    limit: int = Query(500, ge=1, le=2000),
+    max_bundle: int = Query(1, ge=1, le=5),
+    dry_run: bool = False,
+    session: AsyncSession = Depends(get_session),
+    current_user = Depends(get_token_admin),
+):
+    # Minimum total pickup distance over all waiting orders at once; with
+    # max_bundle > 1 orders sharing a pickup and nearby drop-offs go to one rider
+    orders = await waiting_orders(session, limit)
+    plan = optimize(dispatcher, orders, max_bundle=max_bundle)
+    greedy, _ = dispatcher.plan(orders)
+    conflicts = []
+    if not dry_run:
+        assignments = [(order, bundle.rider_id) for bundle in plan.assigned for order in bundle.orders]
+        conflicts = await commit_assignments(session, assignments, len(plan.unassigned))
+    return {
+        "dry_run": dry_run,
+        "assigned": [
+            {
+                "order_ids": [order.order_id for order in bundle.orders if order.order_id not in conflicts],
+                "rider_id": bundle.rider_id,
+                "distance_km": round(bundle.distance_km, 3),
+            }
+            for bundle in plan.assigned
+        ],
+        "conflicts": conflicts,
+        "unassigned": [order.order_id for order in plan.unassigned],
+        "total_km": round(plan.total_km, 3),
+        # One-by-one nearest assignment of the same orders, for comparison
+        "greedy_total_km": round(sum(distance for _, _, distance in greedy), 3),
+    }
+
+
+@router.get("/stats")
+async def dispatch_stats(current_user = Depends(get_token_admin)):
+    return dispatcher.stats()
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import os
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.auth import TokenUser, token_user
+from app.events import event_bus, event_visible_to
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+# Seconds between keep-alives on an idle stream, so proxies don't cut it
+EVENT_KEEPALIVE = float(os.getenv("EVENT_KEEPALIVE", "15"))
+
+# Push replacement for polling GET /orders: every order creation and status
+# change is sent to the connected clients allowed to see that order. Browsers
+# can't set headers on EventSource/WebSocket, so the token may also come as ?token=.
+
+
+def stream_user(authorization: str | None, token: str | None) -> TokenUser:
+    if not token and authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return token_user(token)
+
+
+def subscribe_for(user: TokenUser):
+    return event_bus.subscribe(lambda event: event_visible_to(user.user_id, user.role, event))
+
+
+@router.get("/orders")
+async def order_events(request: Request, token: str | None = None):
+    user = stream_user(request.headers.get("authorization"), token)
+    subscription = subscribe_for(user)
+
+    async def stream():
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.get(), EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/orders/ws")
+async def order_events_ws(websocket: WebSocket, token: str | None = None):
+    try:
+        user = stream_user(websocket.headers.get("authorization"), token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    subscription = subscribe_for(user)
+
+    async def drain():
+        # Only used to notice the client going away; incoming messages are ignored
+        while True:
+            await websocket.receive_text()
+
+    receiver = asyncio.create_task(drain())
+    try:
+        while not receiver.done():
+            getter = asyncio.create_task(subscription.get())
+            done, _ = await asyncio.wait({getter, receiver}, timeout=EVENT_KEEPALIVE, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                continue
+            await websocket.send_json(getter.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        await asyncio.gather(receiver, return_exceptions=True)
+        subscription.close()
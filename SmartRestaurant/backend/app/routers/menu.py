@@ -1,61 +1,194 @@
+from dataclasses import asdict
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from app.auth import get_current_admin, get_session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.auth import get_token_admin
+from app.menu_bulk import SPECS, MenuImporter, export_rows, iter_records, resolve_format
+from app.menu_cache import menu_cache, snapshot_response
 from app.models.menu_items import MenuItem
 from app.schemas.menu import MenuItemWithCategory
 from app.models.categories import Category
+from app.streaming import MEDIA_TYPES, attachment_headers
+from database import async_session_factory, get_session
 
 router = APIRouter(prefix="/menu", tags=["Menu"])
 
-@router.get("/", response_model=List[MenuItemWithCategory])
-async def read_menu_items(session: Session = Depends(get_session)):
-    results = session.exec(select(MenuItem, Category).join(Category)).all()
+# Largest list accepted by PATCH /menu/batch
+MAX_BATCH_UPDATE = 1000
+
+menu_items_adapter = TypeAdapter(List[MenuItemWithCategory])
+categories_adapter = TypeAdapter(List[Category])
+
+# Builders open their own session so a cache hit never touches the pool
+async def build_menu_items() -> bytes:
+    async with async_session_factory() as session:
+        results = (await session.exec(select(MenuItem, Category).join(Category))).all()
     # Map results to schema
     items = []
     for item, category in results:
         item_dict = item.model_dump()
         item_dict["category_name"] = category.name
         items.append(MenuItemWithCategory(**item_dict))
-    return items
+    return menu_items_adapter.dump_json(items)
+
+async def build_categories() -> bytes:
+    async with async_session_factory() as session:
+        categories = (await session.exec(select(Category))).all()
+    return categories_adapter.dump_json(list(categories))
+
+# Both reads are served from the menu cache as pre-serialized JSON with an ETag,
+# so pollers get a 304 until an admin changes the menu.
+@router.get("/", response_model=List[MenuItemWithCategory])
+async def read_menu_items(request: Request):
+    snapshot = await menu_cache.get("items", build_menu_items)
+    return snapshot_response(request, snapshot)
 
 @router.get("/categories", response_model=List[Category])
-async def read_categories(session: Session = Depends(get_session)):
-    categories = session.exec(select(Category)).all()
-    return categories
+async def read_categories(request: Request):
+    snapshot = await menu_cache.get("categories", build_categories)
+    return snapshot_response(request, snapshot)
+
+async def import_table(request: Request, session: AsyncSession, kind: str, format: str | None, dry_run: bool, skip_invalid: bool):
+    fmt = resolve_format(format, request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass format=csv|jsonl")
+    report = await MenuImporter(session, SPECS[kind]).run(iter_records(request.stream(), fmt))
+    # All or nothing unless asked to skip bad rows
+    if dry_run or (report.error_count and not skip_invalid):
+        await session.rollback()
+        if not dry_run:
+            raise HTTPException(status_code=422, detail=asdict(report))
+        return asdict(report)
+    await session.commit()
+    report.committed = True
+    menu_cache.invalidate()
+    return asdict(report)
+
+def export_table(kind: str, format: str) -> StreamingResponse:
+    filename = "menu_items" if kind == "items" else "categories"
+    extension = "csv" if format == "csv" else "jsonl"
+    return StreamingResponse(
+        export_rows(SPECS[kind], format),
+        media_type=MEDIA_TYPES[format],
+        headers=attachment_headers(f"{filename}.{extension}"),
+    )
+
+# Bulk endpoints stream the body as CSV (header row first) or JSON lines.
+# Rows carrying their key are upserted, rows without one are created.
+@router.post("/import")
+async def import_menu_items(
+    request: Request,
+    format: str | None = Query(None, pattern="^(csv|jsonl)$"),
+    dry_run: bool = False,
+    skip_invalid: bool = False,
+    session: AsyncSession = Depends(get_session),
+    current_user = Depends(get_token_admin)
+):
+    return await import_table(request, session, "items", format, dry_run, skip_invalid)
+
+@router.post("/categories/import")
+async def import_categories(
+    request: Request,
+    format: str | None = Query(None, pattern="^(csv|jsonl)$"),
+    dry_run: bool = False,
+    skip_invalid: bool = False,
+    session: AsyncSession = Depends(get_session),
+    current_user = Depends(get_token_admin)
+):
+    return await import_table(request, session, "categories", format, dry_run, skip_invalid)
+
+@router.get("/export")
+async def export_menu_items(
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    current_user = Depends(get_token_admin)
+):
+    return export_table("items", format)
+
+@router.get("/categories/export")
+async def export_categories(
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    current_user = Depends(get_token_admin)
+):
+    return export_table("categories", format)
+
+class MenuItemPatch(BaseModel):
+    item_id: int
+    # Unset fields are left alone; only nullable columns accept an explicit null
+    name: str = Field(default=None, min_length=1)
+    description: str | None = None
+    price: float = Field(default=None, ge=0)
+    image_url: str | None = None
+    category_id: int = None
+
+@router.patch("/batch")
+async def batch_update_menu_items(
+    updates: List[MenuItemPatch],
+    session: AsyncSession = Depends(get_session),
+    current_user = Depends(get_token_admin)
+):
+    if len(updates) > MAX_BATCH_UPDATE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_UPDATE} items per batch")
+    rows = [update_.model_dump(exclude_unset=True) for update_ in updates]
+    item_ids = [row["item_id"] for row in rows]
+    if len(set(item_ids)) != len(item_ids):
+        raise HTTPException(status_code=400, detail="Each item may appear only once per batch")
+
+    found = set((await session.exec(select(MenuItem.item_id).where(MenuItem.item_id.in_(item_ids)))).all())
+    missing = [item_id for item_id in item_ids if item_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Items not found", "item_ids": missing})
+    category_ids = {row["category_id"] for row in rows if row.get("category_id") is not None}
+    if category_ids:
+        known = set((await session.exec(select(Category.category_id).where(Category.category_id.in_(category_ids)))).all())
+        if category_ids - known:
+            raise HTTPException(status_code=400, detail={"message": "Unknown categories", "category_ids": sorted(category_ids - known)})
+
+    # Bulk UPDATE by primary key: one executemany per distinct set of changed columns
+    changed = [row for row in rows if len(row) > 1]
+    if changed:
+        await session.exec(update(MenuItem), params=changed)
+    await session.commit()
+    menu_cache.invalidate()
+    return {"updated": len(changed)}
 
 @router.post("/", response_model=MenuItem, status_code=status.HTTP_201_CREATED)
 async def create_menu_item(
     item: MenuItem, 
-    session: Session = Depends(get_session),
-    current_user = Depends(get_current_admin)
+    session: AsyncSession = Depends(get_session),
+    current_user = Depends(get_token_admin)
 ):
     session.add(item)
-    session.commit()
-    session.refresh(item)
+    await session.commit()
+    menu_cache.invalidate()
+    await session.refresh(item)
     return item
 
 @router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_menu_item(
     item_id: int,
-    session: Session = Depends(get_session),
-    current_user = Depends(get_current_admin)
+    session: AsyncSession = Depends(get_session),
+    current_user = Depends(get_token_admin)
 ):
-    item = session.get(MenuItem, item_id)
+    item = await session.get(MenuItem, item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    session.delete(item)
-    session.commit()
+    await session.delete(item)
+    await session.commit()
+    menu_cache.invalidate()
     return None
 
 @router.put("/{item_id}", response_model=MenuItem)
 async def update_menu_item(
     item_id: int,
     item_update: MenuItem,
-    session: Session = Depends(get_session),
-    current_user = Depends(get_current_admin)
+    session: AsyncSession = Depends(get_session),
+    current_user = Depends(get_token_admin)
 ):
-    db_item = session.get(MenuItem, item_id)
+    db_item = await session.get(MenuItem, item_id)
     if not db_item:
         raise HTTPException(status_code=404, detail="Item not found")
     
@@ -65,6 +198,7 @@ async def update_menu_item(
              setattr(db_item, key, value)
              
     session.add(db_item)
-    session.commit()
-    session.refresh(db_item)
+    await session.commit()
+    menu_cache.invalidate()
+    await session.refresh(db_item)
     return db_item
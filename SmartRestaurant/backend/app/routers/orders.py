@@ -1,16 +1,31 @@
-from typing import List
+import logging
+from typing import List, Literal
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlmodel import Session, select, SQLModel
-from app.auth import get_current_user, get_session
+from sqlmodel import select, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.auth import get_current_user, get_token_admin
+from app.dispatch import DISPATCH_AUTO_ASSIGN, auto_assign
+from app.events import event_bus, order_event
+from app.idempotency import idempotency_store
+from app.order_export import export_orders
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, count_rows, keyset_page, split_page
 from app.models.orders import Order, OrderBase
 from app.models.order_items import OrderItem
 from app.models.menu_items import MenuItem
 from app.models.user import User
+from app.models.order_status_history import OrderStatusHistory
+from app.order_status import OrderStatus, apply_status_change
+from app.rollups import record_order_created
+from app.streaming import MEDIA_TYPES, attachment_headers
+from database import get_session
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
+logger = logging.getLogger(__name__)
+
 class OrderItemRequest(BaseModel):
     item_id: int
     quantity: int
@@ -34,133 +49,249 @@ class OrderWithItems(OrderBase):
 @router.post("/", response_model=Order, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order_req: CreateOrderRequest,
-    session: Session = Depends(get_session),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    # Calculate total and verify items
-    total_amount = 0.0
-    db_items = []
-    
-    for item_req in order_req.items:
-        menu_item = session.get(MenuItem, item_req.item_id)
-        if not menu_item:
-            raise HTTPException(status_code=404, detail=f"Item {item_req.item_id} not found")
-        
-        total_amount += menu_item.price * item_req.quantity
-        db_items.append((menu_item, item_req.quantity))
-
-    # Create Order
-    new_order = Order(
-        customer_id=current_user.user_id,
-        total_amount=total_amount,
-        status="pending",
-        created_at=datetime.now(timezone.utc),
-        # Default Restaurant Info (For Single Restaurant App)
-        restaurant_name="Smart Restaurant HQ",
-        restaurant_address="123 Food Street, Downtown",
-        restaurant_lat=31.5204,
-        restaurant_lng=74.3587,
-        # Default Customer Info (Should ideally come from checkout workflow)
-        customer_name=current_user.name,
-        customer_address="Customer Location 123", # Placeholder
-        customer_lat=31.53,
-        customer_lng=74.36
-    )
-    session.add(new_order)
-    session.commit()
-    session.refresh(new_order)
-
-    # Create Order Items
-    for menu_item, qty in db_items:
-        order_item = OrderItem(
-            order_id=new_order.order_id,
-            item_id=menu_item.item_id,
-            quantity=qty,
-            price_each=menu_item.price
+    # A retried request with the same Idempotency-Key gets the first response
+    # back instead of placing the order twice
+    async def create():
+        # Resolve every requested item with a single IN query
+        item_ids = {item_req.item_id for item_req in order_req.items}
+        menu_items = {
+            menu_item.item_id: menu_item
+            for menu_item in (await session.exec(select(MenuItem).where(MenuItem.item_id.in_(item_ids)))).all()
+        }
+
+        # Calculate total and verify items
+        total_amount = 0.0
+        order_items = []
+
+        for item_req in order_req.items:
+            menu_item = menu_items.get(item_req.item_id)
+            if not menu_item:
+                raise HTTPException(status_code=404, detail=f"Item {item_req.item_id} not found")
+
+            total_amount += menu_item.price * item_req.quantity
+            order_items.append(
+                OrderItem(
+                    item_id=menu_item.item_id,
+                    quantity=item_req.quantity,
+                    price_each=menu_item.price
+                )
+            )
+
+        # Create Order
+        new_order = Order(
+            customer_id=current_user.user_id,
+            total_amount=total_amount,
+            status="pending",
+            created_at=datetime.now(timezone.utc),
+            # Default Restaurant Info (For Single Restaurant App)
+            restaurant_name="Smart Restaurant HQ",
+            restaurant_address="123 Food Street, Downtown",
+            restaurant_lat=31.5204,
+            restaurant_lng=74.3587,
+            # Default Customer Info (Should ideally come from checkout workflow)
+            customer_name=current_user.name,
+            customer_address="Customer Location 123", # Placeholder
+            customer_lat=31.53,
+            customer_lng=74.36
         )
-        session.add(order_item)
-    
-    session.commit()
-    return new_order
+        # Items hang off the relationship so the order and its items go out in one flush
+        new_order.items = order_items
+        session.add(new_order)
+        # Flush for the order id so the first history row joins the same transaction
+        await session.flush()
+        session.add(OrderStatusHistory(order_id=new_order.order_id, old_status=None, new_status=new_order.status, changed_at=new_order.created_at))
+        await record_order_created(session, new_order, menu_items)
+        # Sessions don't expire on commit, so the order can be returned without a refresh
+        await session.commit()
+        await event_bus.publish(order_event("order.created", new_order))
+        return new_order
+
+    return await idempotency_store.run(
+        idempotency_key, f"{current_user.user_id}:POST /orders", order_req, create,
+        status_code=status.HTTP_201_CREATED, response_model=Order,
+    )
 
 @router.get("/", response_model=List[Order])
 async def read_orders(
-    session: Session = Depends(get_session),
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    statuses: List[str] | None = Query(None, alias="status"),
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    customer_id: int | None = None,
+    count: Literal["none", "exact", "estimate"] = "none",
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
+    # Newest first, paged by (created_at, order_id). The next page cursor and the
+    # optional total are returned in headers so the body stays a plain list.
+    statement = select(Order)
     if current_user.role == "admin":
-        return session.exec(select(Order)).all()
+        if customer_id is not None:
+            statement = statement.where(Order.customer_id == customer_id)
     elif current_user.role == "rider":
         # Returns orders available for pickup (ready/pending) or assigned to this rider
-        statement = select(Order).where(
+        statement = statement.where(
             (Order.status == "ready") | 
             (Order.status == "pending") |
             (Order.assigned_rider_id == current_user.user_id)
         )
-        return session.exec(statement).all()
     else:
         # Customer: return own orders
-        return session.exec(select(Order).where(Order.customer_id == current_user.user_id)).all()
+        statement = statement.where(Order.customer_id == current_user.user_id)
+
+    if statuses:
+        statement = statement.where(Order.status.in_(statuses))
+    if created_from is not None:
+        statement = statement.where(Order.created_at >= created_from)
+    if created_to is not None:
+        statement = statement.where(Order.created_at < created_to)
+
+    total = await count_rows(session, statement, count)
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+
+    page = (await session.exec(keyset_page(statement, Order.created_at, Order.order_id, cursor, limit))).all()
+    orders, next_cursor = split_page(page, limit, "created_at", "order_id")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return orders
+
+MAX_BATCH_ORDERS = 100
+
+def can_view_order(current_user: User, order: Order) -> bool:
+    if current_user.role == "rider":
+        # Rider can see if assigned OR if it's available for pickup (ready/pending)
+        return order.assigned_rider_id == current_user.user_id or order.status in ["ready", "pending"]
+    if current_user.role == "customer":
+        return order.customer_id == current_user.user_id
+    return True # Admin can see all
+
+async def build_orders_with_items(session: AsyncSession, orders: List[Order]) -> List[OrderWithItems]:
+    # One query for every line item of every order, with the menu name joined in
+    items_by_order = {order.order_id: [] for order in orders}
+    if items_by_order:
+        statement = (
+            select(OrderItem, MenuItem.name)
+            .outerjoin(MenuItem, OrderItem.item_id == MenuItem.item_id)
+            .where(OrderItem.order_id.in_(items_by_order))
+            .order_by(OrderItem.id)
+        )
+        for item, name in (await session.exec(statement)).all():
+            items_by_order[item.order_id].append(
+                OrderItemRead(
+                    item_id=item.item_id,
+                    quantity=item.quantity,
+                    price_each=item.price_each,
+                    name=name if name is not None else "Unknown Item"
+                )
+            )
+
+    # Convert to response model explicitly to avoid modifying DB object
+    return [
+        OrderWithItems(**order.model_dump(), items=items_by_order[order.order_id])
+        for order in orders
+    ]
+
+@router.get("/batch", response_model=List[OrderWithItems])
+async def read_orders_batch(
+    ids: str = Query(..., description="Comma-separated order ids"),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        order_ids = list(dict.fromkeys(int(order_id) for order_id in ids.split(",") if order_id.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if len(order_ids) > MAX_BATCH_ORDERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ORDERS} orders per batch")
+    if not order_ids:
+        return []
+
+    found = {
+        order.order_id: order
+        for order in (await session.exec(select(Order).where(Order.order_id.in_(order_ids)))).all()
+    }
+    # Missing orders and orders the caller may not see are left out
+    orders = [found[order_id] for order_id in order_ids if order_id in found and can_view_order(current_user, found[order_id])]
+    return await build_orders_with_items(session, orders)
+
+# Accounting export of every matching order with its line items and payment,
+# streamed from a server-side cursor: CSV has a row per line item, JSON lines
+# an object per order with its items nested
+@router.get("/export")
+async def read_orders_export(
+    format: Literal["csv", "jsonl"] = "csv",
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    statuses: List[OrderStatus] | None = Query(None, alias="status"),
+    current_user = Depends(get_token_admin)
+):
+    return StreamingResponse(
+        export_orders(format, created_from, created_to, statuses),
+        media_type=MEDIA_TYPES[format],
+        headers=attachment_headers(f"orders.{format}"),
+    )
 
 @router.get("/{order_id}", response_model=OrderWithItems)
 async def read_order(
     order_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    order = session.get(Order, order_id)
+    order = await session.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    
+
     # Access control
-    if current_user.role == "admin":
-        pass # Admin can see all
-    elif current_user.role == "rider":
-        # Rider can see if assigned OR if it's available for pickup (ready/pending)
-        if not (order.assigned_rider_id == current_user.user_id or order.status in ["ready", "pending"]):
-             raise HTTPException(status_code=403, detail="Not authorized")
-    elif current_user.role == "customer":
-        if order.customer_id != current_user.user_id:
-            raise HTTPException(status_code=403, detail="Not authorized")
-    
-    # Convert to response model explicitly to avoid modifying DB object
-    order_items_response = []
-    for item in order.items:
-        menu_item = session.get(MenuItem, item.item_id)
-        order_items_response.append(
-            OrderItemRead(
-                item_id=item.item_id,
-                quantity=item.quantity,
-                price_each=item.price_each,
-                name=menu_item.name if menu_item else "Unknown Item"
-            )
-        )
+    if not can_view_order(current_user, order):
+        raise HTTPException(status_code=403, detail="Not authorized")
 
-    return OrderWithItems(
-        **order.model_dump(),
-        items=order_items_response
-    )
+    return (await build_orders_with_items(session, [order]))[0]
 
 @router.put("/{order_id}/status")
 async def update_order_status(
     order_id: int,
-    status: str,
-    session: Session = Depends(get_session),
+    status: OrderStatus,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     # Allow admin and rider (and maybe restaurant spec)
     if current_user.role not in ["admin", "rider"]:
         raise HTTPException(status_code=403, detail="Not authorized")
-        
-    order = session.get(Order, order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-        
-    order.status = status
-    if status == "assigned" and current_user.role == "rider":
-        order.assigned_rider_id = current_user.user_id
-        
-    session.add(order)
-    session.commit()
-    session.refresh(order)
-    return order
+
+    async def change():
+        order = await session.get(Order, order_id)
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+
+        # A rider accepting or picking up an open order becomes its rider; a
+        # concurrent claim or an illegal move comes back as 409
+        rider_id = current_user.user_id if current_user.role == "rider" else None
+        old_status = await apply_status_change(session, order, status, rider_id=rider_id)
+        if old_status == status:
+            # Repeated request, nothing changed
+            return order
+        await session.commit()
+        await event_bus.publish(order_event("order.status_changed", order, old_status))
+        if status == "ready" and DISPATCH_AUTO_ASSIGN:
+            committed = order.model_dump()
+            try:
+                await auto_assign(session, order)
+            except Exception:
+                # The status change is committed and published either way; the
+                # order just waits for the next dispatch run
+                logger.exception("Auto-assigning order %s failed", order_id)
+                await session.rollback()
+                return committed
+        return order
+
+    return await idempotency_store.run(
+        idempotency_key, f"{current_user.user_id}:PUT /orders/{order_id}/status", {"status": status}, change,
+    )
@@ -1,48 +1,174 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+import os
+from datetime import date, datetime, timezone
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Annotated
-from app.routers.analytics import get_session
 from app.models.orders import Order
+from app.models.rollups import DailyRiderRollup
 from app.models.rider import RiderProfile
 from app.models.user import User
-from pydantic import BaseModel
+from app.auth import get_current_user
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, split_page
+from app.dispatch import dispatcher
+from app.events import event_bus, order_event, shift_event
+from app.idempotency import idempotency_store
+from app.order_status import OrderStatus, apply_status_change
+from app.rider_locations import rider_locations
+from pydantic import BaseModel, Field
+from database import get_session
 
 router = APIRouter(prefix="/rider", tags=["Rider"])
 
+# Most fixes a phone may send in one batch
+MAX_LOCATION_BATCH = int(os.getenv("MAX_LOCATION_BATCH", "100"))
+
 # Schemas
 class LocationUpdate(BaseModel):
-    lat: float
-    lng: float
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+    # Epoch seconds the fix was taken on the device; arrival time if omitted
+    recorded_at: float | None = None
+
+class LocationBatch(BaseModel):
+    fixes: List[LocationUpdate] = Field(min_length=1, max_length=MAX_LOCATION_BATCH)
+
+class ShiftUpdate(BaseModel):
+    on_shift: bool
+
+# Orders a rider is still carrying out
+ACTIVE_STATUSES = ("assigned", "picked_up")
+
+async def get_current_rider(current_user: Annotated[User, Depends(get_current_user)]):
+    if current_user.role != "rider":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return current_user
 
 @router.get("/profile/{user_id}")
-def get_rider_profile(user_id: int, session: Session = Depends(get_session)):
-    profile = session.exec(select(RiderProfile).where(RiderProfile.user_id == user_id)).first()
+async def get_rider_profile(user_id: int, session: AsyncSession = Depends(get_session)):
+    profile = (await session.exec(select(RiderProfile).where(RiderProfile.user_id == user_id))).first()
     if not profile:
         raise HTTPException(status_code=404, detail="Rider profile not found")
     return profile
 
+# Only riders on shift are offered orders by app.dispatch
+@router.put("/shift")
+async def update_shift(shift: ShiftUpdate, session: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_rider)):
+    profile = (await session.exec(select(RiderProfile).where(RiderProfile.user_id == current_user.user_id))).first()
+    if not profile:
+        raise HTTPException(status_code=404, detail="Rider profile not found")
+    if profile.is_online != shift.on_shift:
+        profile.is_online = shift.on_shift
+        await session.commit()
+        await event_bus.publish(shift_event(current_user.user_id, shift.on_shift))
+    return {"on_shift": shift.on_shift}
+
+def track_rider(rider_id: int):
+    # Newest accepted fix also places the rider in the dispatch index; online
+    # means heard from recently, whatever the device clock says
+    lat, lng, _ = rider_locations.get(rider_id)
+    dispatcher.track(rider_id, lat, lng)
+
+# Fixes only touch the in-memory store; app.rider_locations writes the latest
+# position per rider to rider_profiles in periodic bulk updates
 @router.post("/location")
-def update_location(location: LocationUpdate, session: Session = Depends(get_session)):
-    # In real app, identify user from token. For now just mock.
+async def update_location(location: LocationUpdate, current_user: User = Depends(get_current_rider)):
+    rider_locations.update(current_user.user_id, location.lat, location.lng, location.recorded_at)
+    track_rider(current_user.user_id)
     return {"status": "Location updated", "lat": location.lat, "lng": location.lng}
 
-@router.get("/orders/assigned")
-def get_assigned_orders(session: Session = Depends(get_session)):
-    # In real app, filter by current rider.
-    # For demo, return all assigned orders.
-    return session.exec(select(Order).where(Order.status == "assigned")).all()
+@router.post("/locations")
+async def update_locations(batch: LocationBatch, current_user: User = Depends(get_current_rider)):
+    accepted = sum(
+        rider_locations.update(current_user.user_id, fix.lat, fix.lng, fix.recorded_at)
+        for fix in batch.fixes
+    )
+    track_rider(current_user.user_id)
+    return {"received": len(batch.fixes), "accepted": accepted}
+
+# The rider lists below are answered from ix_orders_assigned_rider_id_status_created_at_order_id
+@router.get("/orders/assigned", response_model=List[Order])
+async def get_assigned_orders(
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_rider)
+):
+    # Orders assigned to this rider and not yet delivered; a short list by nature
+    statement = (
+        select(Order)
+        .where(Order.assigned_rider_id == current_user.user_id, Order.status.in_(ACTIVE_STATUSES))
+        .order_by(Order.created_at, Order.order_id)
+    )
+    return (await session.exec(statement)).all()
 
-@router.get("/orders/history")
-def get_order_history(session: Session = Depends(get_session)):
-    return session.exec(select(Order).where(Order.status == "delivered")).all()
+@router.get("/orders/history", response_model=List[Order])
+async def get_order_history(
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_rider)
+):
+    # Newest first, paged like GET /orders: next page cursor in X-Next-Cursor
+    statement = select(Order).where(Order.assigned_rider_id == current_user.user_id, Order.status == "delivered")
+    page = (await session.exec(keyset_page(statement, Order.created_at, Order.order_id, cursor, limit))).all()
+    orders, next_cursor = split_page(page, limit, "created_at", "order_id")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return orders
+
+@router.get("/earnings")
+async def get_earnings(
+    start: date | None = None,
+    end: date | None = None,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_rider)
+):
+    # From the per-rider daily rollups (app.rollups), so the cost follows the
+    # number of days worked rather than the number of deliveries. Days are
+    # order dates, as in the admin analytics.
+    statement = select(DailyRiderRollup).where(DailyRiderRollup.rider_id == current_user.user_id)
+    if start is not None:
+        statement = statement.where(DailyRiderRollup.day >= start)
+    if end is not None:
+        statement = statement.where(DailyRiderRollup.day <= end)
+    days = [
+        day for day in (await session.exec(statement.order_by(DailyRiderRollup.day.desc()))).all()
+        if day.delivered_orders
+    ]
+    # Today is reported whatever the requested range
+    today = datetime.now(timezone.utc).date()
+    today_row = (await session.exec(
+        select(DailyRiderRollup).where(DailyRiderRollup.rider_id == current_user.user_id, DailyRiderRollup.day == today)
+    )).first()
+    return {
+        "delivered_orders": sum(day.delivered_orders for day in days),
+        "earnings": sum(day.earnings for day in days),
+        "today": {
+            "delivered_orders": today_row.delivered_orders if today_row else 0,
+            "earnings": today_row.earnings if today_row else 0.0,
+        },
+        "days": [{"day": day.day, "delivered_orders": day.delivered_orders, "earnings": day.earnings} for day in days],
+    }
 
 @router.post("/orders/{order_id}/status")
-def update_order_status(order_id: int, status: str, session: Session = Depends(get_session)):
-    order = session.get(Order, order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    order.status = status
-    session.add(order)
-    session.commit()
-    return {"success": True, "new_status": status}
+async def update_order_status(
+    order_id: int,
+    status: OrderStatus,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_rider)
+):
+    async def change():
+        order = await session.get(Order, order_id)
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+
+        old_status = await apply_status_change(session, order, status, rider_id=current_user.user_id)
+        if old_status != status:
+            await session.commit()
+            await event_bus.publish(order_event("order.status_changed", order, old_status))
+        return {"success": True, "new_status": status}
+
+    return await idempotency_store.run(
+        idempotency_key, f"{current_user.user_id}:POST /rider/orders/{order_id}/status", {"status": status}, change,
+    )
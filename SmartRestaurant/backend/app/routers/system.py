@@ -0,0 +1,117 @@
+import os
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import PlainTextResponse
+from app.auth import get_token_admin
+from app.events import event_bus
+from app.idempotency import idempotency_store
+from app.rider_locations import rider_locations
+from app.menu_cache import menu_cache
+from app.metrics import Counter, Gauge, registry
+from app.profiling import request_profiler
+from app.routers.analytics import analytics_cache
+import database
+
+router = APIRouter(prefix="/admin/system", tags=["System"])
+
+
+def system_metrics():
+    """Pool and cache figures for /metrics, read from the stats the endpoints below serve."""
+    checked_out = Gauge("db_pool_connections_checked_out", "Connections in use.", ("engine",))
+    size = Gauge("db_pool_size", "Configured pool size.", ("engine",))
+    overflow = Gauge("db_pool_overflow", "Connections open beyond the pool size.", ("engine",))
+    waits = Counter("db_pool_waits_total", "Checkouts that had to wait for a free connection.", ("engine",))
+    timeouts = Counter("db_pool_timeouts_total", "Checkouts that gave up waiting.", ("engine",))
+    for name, target in (("async", database.async_engine), ("sync", database.engine)):
+        stats = database.pool_stats(target)
+        if "checked_out" not in stats:
+            # SQLite's pools don't keep these figures
+            continue
+        checked_out.set(name, value=stats["checked_out"])
+        size.set(name, value=stats["size"])
+        overflow.set(name, value=stats["overflow"])
+        waits.inc(name, amount=stats["waits"])
+        timeouts.inc(name, amount=stats["timeouts"])
+
+    analytics = analytics_cache.stats()
+    idempotency = idempotency_store.stats()
+    lookups = {
+        "analytics": (analytics["hit"] + analytics["stale"], analytics["miss"]),
+        "menu": (menu_cache.counters["hit"], menu_cache.counters["miss"]),
+        "idempotency": (idempotency["replayed"], idempotency["executed"]),
+    }
+    hits = Counter("cache_hits_total", "Cache lookups served from the cache.", ("cache",))
+    misses = Counter("cache_misses_total", "Cache lookups that had to compute.", ("cache",))
+    # Per worker; across workers compute it from the counters
+    ratio = Gauge("cache_hit_ratio", "Share of lookups served from the cache by this worker.", ("cache",))
+    for cache, (hit, miss) in lookups.items():
+        hits.inc(cache, amount=hit)
+        misses.inc(cache, amount=miss)
+        if hit + miss:
+            ratio.set(cache, value=round(hit / (hit + miss), 4))
+
+    subscribers = Gauge("event_subscribers", "Clients connected to the order event stream.")
+    subscribers.set(value=event_bus.stats()["subscribers"])
+    return [checked_out, size, overflow, waits, timeouts, hits, misses, ratio, subscribers]
+
+
+registry.add_collector(system_metrics)
+
+
+# Connection pool health for this worker; each uvicorn worker has its own pools
+@router.get("/db-pool")
+async def db_pool(current_user = Depends(get_token_admin)):
+    return {
+        "pid": os.getpid(),
+        "config": {
+            "pool_size": database.DB_POOL_SIZE,
+            "max_overflow": database.DB_MAX_OVERFLOW,
+            "pool_timeout": database.DB_POOL_TIMEOUT,
+            "pool_recycle": database.DB_POOL_RECYCLE,
+            "pool_pre_ping": database.DB_POOL_PRE_PING,
+            "statement_timeout_ms": database.DB_STATEMENT_TIMEOUT_MS,
+            "echo": database.DB_ECHO,
+        },
+        "async_pool": database.pool_stats(database.async_engine),
+        "sync_pool": database.pool_stats(database.engine),
+    }
+
+
+# Hit ratios of this worker's caches
+@router.get("/caches")
+async def caches(current_user = Depends(get_token_admin)):
+    return {
+        "pid": os.getpid(),
+        "menu": {"version": menu_cache.version, **menu_cache.counters},
+        "analytics": analytics_cache.stats(),
+        "idempotency": idempotency_store.stats(),
+    }
+
+
+# Order event bus of this worker: subscribers connected here and what was sent
+@router.get("/events")
+async def events(current_user = Depends(get_token_admin)):
+    return {"pid": os.getpid(), **event_bus.stats()}
+
+
+# Rider location ingestion of this worker: fixes taken in and bulk flushes
+@router.get("/locations")
+async def locations(current_user = Depends(get_token_admin)):
+    return {"pid": os.getpid(), **rider_locations.stats()}
+
+
+# Per-endpoint wall/db time and query counts of this worker, and the latest over-budget requests
+@router.get("/requests")
+async def requests(current_user = Depends(get_token_admin)):
+    return {"pid": os.getpid(), **request_profiler.stats(), "slow": list(request_profiler.slow)}
+
+
+@router.delete("/requests", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_requests(current_user = Depends(get_token_admin)):
+    request_profiler.reset()
+
+
+# Folded stacks (flamegraph.pl / speedscope) from the sampling profiler, PROFILE_SAMPLING=true.
+# Without ?endpoint= (an endpoint function name) it covers every endpoint that went over budget.
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(endpoint: str | None = None, current_user = Depends(get_token_admin)):
+    return request_profiler.folded_stacks(endpoint)
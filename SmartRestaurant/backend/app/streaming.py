@@ -0,0 +1,28 @@
+import csv
+import io
+import json
+from datetime import date
+from typing import Iterable
+
+# Formats of the streaming import/export endpoints
+MEDIA_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def csv_chunk(rows: Iterable[Iterable]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if value is None else export_value(value) for value in row])
+    return buffer.getvalue().encode("utf-8")
+
+
+def ndjson_chunk(objects: Iterable[dict]) -> bytes:
+    return "".join(json.dumps(data, default=export_value) + "\n" for data in objects).encode("utf-8")
+
+
+def attachment_headers(filename: str) -> dict:
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
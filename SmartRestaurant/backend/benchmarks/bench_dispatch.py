@@ -0,0 +1,86 @@
+"""Nearest-rider lookups and batch assignment against the spatial index.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_dispatch --riders 10000 --queries 10000 --orders 500
+
+Riders are scattered over a city-sized box; no database is involved. The grid
+answers are checked against a brute-force scan of every rider.
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import summarize, use_bench_database
+
+use_bench_database()
+
+from app.dispatch import Dispatcher, haversine_km
+
+# Roughly Lahore: 0.4 x 0.4 degrees, about 44 x 38 km
+CENTER_LAT, CENTER_LNG, SPAN = 31.52, 74.35, 0.4
+
+
+def random_point(rng: random.Random) -> tuple[float, float]:
+    return CENTER_LAT + rng.uniform(-SPAN / 2, SPAN / 2), CENTER_LNG + rng.uniform(-SPAN / 2, SPAN / 2)
+
+
+def brute_force(riders: dict[int, tuple[float, float]], lat: float, lng: float, k: int) -> list[int]:
+    return [rider_id for _, rider_id in sorted((haversine_km(lat, lng, *position), rider_id) for rider_id, position in riders.items())[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--riders", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=500, help="ready orders in the batch assignment")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--check", type=int, default=200, help="queries verified against brute force")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    dispatcher = Dispatcher()
+    riders = {rider_id: random_point(rng) for rider_id in range(1, args.riders + 1)}
+    started = time.perf_counter()
+    for rider_id, (lat, lng) in riders.items():
+        dispatcher.track(rider_id, lat, lng)
+        dispatcher.set_on_shift(rider_id, True)
+    print(f"indexed {args.riders} riders in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    points = [random_point(rng) for _ in range(args.queries)]
+    latencies = []
+    for lat, lng in points:
+        started = time.perf_counter()
+        dispatcher.nearest(lat, lng, args.k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    summarize(f"nearest k={args.k}", latencies)
+
+    mismatches = 0
+    brute_latencies = []
+    for lat, lng in points[:args.check]:
+        started = time.perf_counter()
+        expected = brute_force(riders, lat, lng, args.k)
+        brute_latencies.append((time.perf_counter() - started) * 1000)
+        if [rider_id for _, rider_id in dispatcher.nearest(lat, lng, args.k)] != expected:
+            mismatches += 1
+    summarize(f"brute force k={args.k}", brute_latencies)
+    print(f"grid vs brute force mismatches: {mismatches}/{min(args.check, len(points))}")
+
+    orders = []
+    for order_id in range(1, args.orders + 1):
+        lat, lng = random_point(rng)
+        orders.append(SimpleNamespace(order_id=order_id, created_at=order_id, restaurant_lat=lat, restaurant_lng=lng))
+    started = time.perf_counter()
+    assignments, unassigned = dispatcher.plan(orders)
+    elapsed = (time.perf_counter() - started) * 1000
+    total_km = sum(distance for _, _, distance in assignments)
+    print(
+        f"batch plan: {len(assignments)} assigned, {len(unassigned)} unassigned in {elapsed:.1f}ms "
+        f"({elapsed / max(1, args.orders):.3f}ms/order), mean pickup distance {total_km / max(1, len(assignments)):.2f}km"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Batch min-cost matching of ready orders to riders versus greedy nearest.
+
+Run from the backend directory (needs numpy):
+
+    python -m benchmarks.bench_dispatch_optimizer --orders 300 --riders 500
+
+Orders and riders are scattered over a city-sized box; no database is
+involved. Reports solve time and total pickup distance of both strategies.
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import use_bench_database
+
+use_bench_database()
+
+from app.dispatch import Dispatcher
+from app.dispatch_optimizer import optimize
+
+CENTER_LAT, CENTER_LNG, SPAN = 31.52, 74.35, 0.4
+
+
+def random_point(rng: random.Random, span: float = SPAN) -> tuple[float, float]:
+    return CENTER_LAT + rng.uniform(-span / 2, span / 2), CENTER_LNG + rng.uniform(-span / 2, span / 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--riders", type=int, default=500)
+    parser.add_argument("--restaurants", type=int, default=8, help="distinct pickup points; few give bundling something to share")
+    parser.add_argument("--max-bundle", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    dispatcher = Dispatcher()
+    for rider_id in range(1, args.riders + 1):
+        dispatcher.track(rider_id, *random_point(rng))
+        dispatcher.set_on_shift(rider_id, True)
+    restaurants = [random_point(rng) for _ in range(args.restaurants)]
+    orders = []
+    for order_id in range(1, args.orders + 1):
+        restaurant_lat, restaurant_lng = rng.choice(restaurants)
+        customer_lat, customer_lng = random_point(rng, SPAN / 4)
+        orders.append(SimpleNamespace(
+            order_id=order_id, created_at=order_id,
+            restaurant_lat=restaurant_lat, restaurant_lng=restaurant_lng,
+            customer_lat=customer_lat, customer_lng=customer_lng,
+        ))
+    print(f"orders={args.orders} riders={args.riders} restaurants={args.restaurants}")
+
+    started = time.perf_counter()
+    greedy, unassigned = dispatcher.plan(orders)
+    elapsed = (time.perf_counter() - started) * 1000
+    greedy_km = sum(distance for _, _, distance in greedy)
+    print(f"{'greedy nearest':<24} {elapsed:9.1f}ms  assigned={len(greedy):<5} unassigned={len(unassigned):<5} total={greedy_km:9.2f}km")
+
+    for max_bundle in sorted({1, args.max_bundle}):
+        started = time.perf_counter()
+        plan = optimize(dispatcher, orders, max_bundle=max_bundle)
+        elapsed = (time.perf_counter() - started) * 1000
+        orders_assigned = sum(len(bundle.orders) for bundle in plan.assigned)
+        print(
+            f"{f'min-cost (bundle<={max_bundle})':<24} {elapsed:9.1f}ms  assigned={orders_assigned:<5} "
+            f"unassigned={len(plan.unassigned):<5} total={plan.total_km:9.2f}km  riders used={len(plan.assigned)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
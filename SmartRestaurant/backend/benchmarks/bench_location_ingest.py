@@ -0,0 +1,108 @@
+"""Sustained rider location ingestion and the cost of the bulk flush.
+
+Run from the backend directory (needs httpx):
+
+    python -m benchmarks.bench_location_ingest --riders 500 --batch 10 --seconds 10
+
+Every simulated rider posts batches of fixes to POST /rider/locations; the
+store is then flushed to rider_profiles in one bulk update.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import summarize, use_bench_database
+
+use_bench_database()
+
+import httpx
+from sqlalchemy import func, insert
+from sqlmodel import Session, select
+
+import app.auth as auth
+from app.models.rider import RiderProfile
+from app.models.user import User
+from app.rider_locations import location_flusher, rider_locations
+from database import async_engine, create_db_and_tables, engine
+from main import app
+
+EMAIL_DOMAIN = "bench-rider.example.com"
+
+
+def ensure_riders(count: int) -> list[str]:
+    create_db_and_tables()
+    with Session(engine) as session:
+        existing = session.exec(select(func.count()).select_from(User).where(User.email.like(f"%@{EMAIL_DOMAIN}"))).one()
+        if existing < count:
+            # Password hashes are never checked here, tokens are minted directly
+            session.exec(insert(User), params=[
+                {"name": f"Rider {index}", "email": f"rider{index}@{EMAIL_DOMAIN}", "password_hash": "-", "role": "rider", "phone": "0"}
+                for index in range(existing, count)
+            ])
+            session.commit()
+        riders = session.exec(select(User).where(User.email.like(f"%@{EMAIL_DOMAIN}")).order_by(User.user_id).limit(count)).all()
+        with_profile = set(session.exec(select(RiderProfile.user_id)).all())
+        missing = [rider for rider in riders if rider.user_id not in with_profile]
+        if missing:
+            session.exec(insert(RiderProfile), params=[
+                {"user_id": rider.user_id, "full_name": rider.name, "phone_number": "0", "vehicle_details": "bike"}
+                for rider in missing
+            ])
+            session.commit()
+        return [auth.create_access_token(auth.token_claims(rider)) for rider in riders]
+
+
+async def rider_worker(client: httpx.AsyncClient, token: str, batch: int, deadline: float, latencies: list[float], sent: list[int]):
+    headers = {"Authorization": f"Bearer {token}"}
+    lat, lng = 31.52 + random.uniform(-0.05, 0.05), 74.35 + random.uniform(-0.05, 0.05)
+    while time.perf_counter() < deadline:
+        now = time.time()
+        fixes = []
+        for offset in range(batch):
+            lat += random.uniform(-0.0005, 0.0005)
+            lng += random.uniform(-0.0005, 0.0005)
+            fixes.append({"lat": lat, "lng": lng, "recorded_at": now - (batch - offset) * 1e-6})
+        started = time.perf_counter()
+        response = await client.post("/rider/locations", json={"fixes": fixes}, headers=headers)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+        sent[0] += batch
+        # The endpoint never waits on IO, so yield to let the other riders in
+        await asyncio.sleep(0)
+
+
+async def run(tokens: list[str], batch: int, seconds: float):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies: list[float] = []
+        sent = [0]
+        started = time.perf_counter()
+        deadline = started + seconds
+        await asyncio.gather(*(rider_worker(client, token, batch, deadline, latencies, sent) for token in tokens))
+        elapsed = time.perf_counter() - started
+
+    summarize("POST /rider/locations", latencies)
+    print(f"ingested {sent[0]} fixes in {elapsed:.1f}s = {sent[0] / elapsed:,.0f} fixes/s ({len(latencies) / elapsed:,.0f} requests/s)")
+
+    started = time.perf_counter()
+    rows = await location_flusher.flush()
+    print(f"flushed {rows} rider positions in {(time.perf_counter() - started) * 1000:.1f}ms")
+    print(rider_locations.stats())
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--riders", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=10, help="fixes per request")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    tokens = ensure_riders(args.riders)
+    print(f"riders={len(tokens)} batch={args.batch} seconds={args.seconds}")
+    asyncio.run(run(tokens, args.batch, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Latency of an unrelated endpoint while logins are running.
+
+Run from the backend directory (needs httpx):
+
+    python -m benchmarks.bench_login_latency --logins 40 --concurrency 8
+
+Pass --inline to hash on the event loop as before, for comparison.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import summarize, use_bench_database
+
+use_bench_database()
+
+import httpx
+from sqlmodel import Session, select
+
+import app.auth as auth
+import app.routers.auth as auth_router
+from app.models.user import User
+from database import create_db_and_tables, engine
+from main import app
+
+EMAIL = "bench-login@example.com"
+PASSWORD = "bench-password"
+
+
+def ensure_user():
+    create_db_and_tables()
+    with Session(engine) as session:
+        if not session.exec(select(User).where(User.email == EMAIL)).first():
+            session.add(User(name="Bench", email=EMAIL, password_hash=auth.get_password_hash(PASSWORD), role="customer", phone="0"))
+            session.commit()
+
+
+def use_inline_hashing():
+    async def verify_inline(plain, hashed):
+        return auth.verify_password(plain, hashed)
+
+    auth_router.verify_password_async = verify_inline
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/")
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.005)
+
+
+async def login_worker(client: httpx.AsyncClient, count: int, latencies: list[float]):
+    for _ in range(count):
+        started = time.perf_counter()
+        response = await client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run(logins: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle: list[float] = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, stop, idle))
+        await asyncio.sleep(1)
+        stop.set()
+        await task
+
+        busy: list[float] = []
+        login_latencies: list[float] = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, stop, busy))
+        per_worker = max(1, logins // concurrency)
+        await asyncio.gather(*(login_worker(client, per_worker, login_latencies) for _ in range(concurrency)))
+        stop.set()
+        await task
+
+    summarize("GET / (idle)", idle)
+    summarize("GET / (during logins)", busy)
+    summarize("POST /auth/login", login_latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--inline", action="store_true", help="verify passwords on the event loop")
+    args = parser.parse_args()
+
+    ensure_user()
+    if args.inline:
+        use_inline_hashing()
+    print(f"bcrypt rounds={auth.BCRYPT_ROUNDS} workers={auth.PASSWORD_HASH_WORKERS} inline={args.inline}")
+    asyncio.run(run(args.logins, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Columnar export and offline analytics against the live dashboard metrics.
+
+Run from the backend directory after filling the bench database with
+generate_data.py:
+
+    python -m benchmarks.bench_offline_analytics --start 2026-08-01 --end 2026-08-31
+
+Times a full and an incremental export into a scratch directory, then every
+dashboard metric live (rollups and SQL) and offline (numpy over the export),
+and flags metrics whose answers differ (rows compared in any order, since
+ties may rank differently). The live payment-success-rate is a placeholder,
+and on SQLite the live delivery-time metrics don't work at all.
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from datetime import date
+
+from benchmarks.common import use_bench_database
+
+use_bench_database()
+
+from fastapi.encoders import jsonable_encoder
+from sqlmodel import Session
+
+from app.columnar import ColumnarExporter, ColumnarStore
+from app.offline_analytics import OfflineAnalytics
+from app.routers.analytics import DASHBOARD_METRICS
+from database import async_engine, async_session_factory, engine
+
+
+def export(root: str):
+    for label, full in (("full export", True), ("incremental export", False)):
+        started = time.perf_counter()
+        with Session(engine) as session:
+            summary = ColumnarExporter(session, root).run(full=full)
+        print(f"{label:<22} {time.perf_counter() - started:8.2f}s  {len(summary['exported'])} month(s) written")
+
+
+async def live_metrics(start: date | None, end: date | None) -> dict:
+    results = {}
+    for name, endpoint in DASHBOARD_METRICS.items():
+        metric = getattr(endpoint, "metric", endpoint)
+        started = time.perf_counter()
+        async with async_session_factory() as session:
+            try:
+                value = jsonable_encoder(await metric(start=start, end=end, session=session))
+            except Exception as exc:
+                value = f"{type(exc).__name__}"
+        results[name] = (value, (time.perf_counter() - started) * 1000)
+    await async_engine.dispose()
+    return results
+
+
+def canonical(value) -> str:
+    if isinstance(value, list):
+        return json.dumps(sorted(json.dumps(row, sort_keys=True) for row in value))
+    return json.dumps(value, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start", type=date.fromisoformat)
+    parser.add_argument("--end", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        export(root)
+        offline = OfflineAnalytics(ColumnarStore(root))
+        dashboard = offline.dashboard(args.start, args.end)
+        live = asyncio.run(live_metrics(args.start, args.end))
+
+    print(f"\n{'metric':<22} {'live':>10} {'offline':>10}  same answer")
+    for name, result in dashboard["metrics"].items():
+        value, live_ms = live[name]
+        offline_value = jsonable_encoder(result.get("value", result.get("error")))
+        same = canonical(offline_value) == canonical(value)
+        print(f"{name:<22} {live_ms:8.2f}ms {result['elapsed_ms']:8.2f}ms  {'yes' if same else 'no'}")
+    print(f"whole offline dashboard {dashboard['elapsed_ms']:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
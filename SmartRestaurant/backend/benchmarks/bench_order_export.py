@@ -0,0 +1,57 @@
+"""Throughput and peak memory of the streaming order export.
+
+Run from the backend directory after filling the bench database with
+generate_data.py, e.g.
+
+    python -m benchmarks.bench_order_export --format csv --batch 2000
+    python -m benchmarks.bench_order_export --memory
+
+Drives app.order_export.export_orders directly (an ASGI test transport would
+buffer the whole body). With --memory the peak traced memory is reported as
+well, which should not grow with the number of exported orders; tracing
+slows the run down several times, so throughput is only meaningful without it.
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from benchmarks.common import use_bench_database
+
+use_bench_database()
+
+from app.order_export import ORDER_EXPORT_BATCH_SIZE, export_orders
+from database import async_engine
+
+
+async def run(fmt: str, batch_size: int, memory: bool):
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    size = lines = 0
+    async for chunk in export_orders(fmt, batch_size=batch_size):
+        size += len(chunk)
+        lines += chunk.count(b"\n")
+    elapsed = time.perf_counter() - started
+    print(
+        f"{fmt} batch={batch_size}: {lines:,} lines, {size / 1e6:,.1f} MB in {elapsed:.1f}s "
+        f"= {lines / elapsed:,.0f} lines/s"
+    )
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"peak traced memory {peak / 1e6:.1f} MB")
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--batch", type=int, default=ORDER_EXPORT_BATCH_SIZE, help="rows per cursor fetch")
+    parser.add_argument("--memory", action="store_true", help="trace allocations and report the peak")
+    args = parser.parse_args()
+    asyncio.run(run(args.format, args.batch, args.memory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import os
+import sys
+
+# Benchmarks run from the backend directory: python -m benchmarks.<name>
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def use_bench_database(default: str = "sqlite:///bench.db"):
+    """Point database.py at a throwaway database before it is imported."""
+    os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", default)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(label: str, latencies_ms: list[float]):
+    print(
+        f"{label:<32} n={len(latencies_ms):<6} "
+        f"p50={percentile(latencies_ms, 50):8.2f}ms "
+        f"p95={percentile(latencies_ms, 95):8.2f}ms "
+        f"p99={percentile(latencies_ms, 99):8.2f}ms"
+    )
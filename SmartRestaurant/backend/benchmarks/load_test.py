@@ -0,0 +1,169 @@
+"""Scripted load test of the main user journeys, reported per endpoint.
+
+Run from the backend directory (needs httpx):
+
+    python -m benchmarks.load_test --customers 50 --admins 2 --seconds 30
+
+Virtual customers log in, browse the menu, place an order and poll its
+status; virtual admins load the analytics dashboard and the order list.
+Everything runs in-process against BENCH_DATABASE_URL (sqlite:///bench.db by
+default), which is filled by generate_data.py first if it has too few
+synthetic users. Pass --base-url to drive a running server instead.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections import defaultdict
+from contextlib import AsyncExitStack
+
+from benchmarks.common import percentile, use_bench_database
+
+use_bench_database()
+
+import httpx
+from sqlalchemy import func, select
+from sqlmodel import Session
+
+import generate_data
+from app.models.user import User
+from database import async_engine, create_db_and_tables, engine
+from main import app
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[label] += 1
+            raise
+        self.latencies[label].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.errors[label] += 1
+        return response
+
+    def report(self, elapsed: float):
+        print(f"{'endpoint':<34} {'n':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'errors':>7}")
+        for label, latencies in sorted(self.latencies.items()):
+            print(
+                f"{label:<34} {len(latencies):>7} {len(latencies) / elapsed:>8.1f} "
+                f"{percentile(latencies, 50):>7.2f}ms {percentile(latencies, 95):>7.2f}ms "
+                f"{percentile(latencies, 99):>7.2f}ms {max(latencies):>7.2f}ms {self.errors[label]:>7}"
+            )
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        print(f"total {total} requests in {elapsed:.1f}s = {total / elapsed:,.1f} req/s, {sum(self.errors.values())} errors")
+
+
+def ensure_data(customers: int, admins: int, orders: int):
+    create_db_and_tables()
+    with Session(engine) as session:
+        existing = session.exec(
+            select(func.count()).select_from(User).where(User.email.like(f"customer%@{generate_data.EMAIL_DOMAIN}"))
+        ).one()[0]
+    if existing < customers:
+        generate_data.generate(orders, customers=max(customers, 200), riders=20, days=30, quiet=True)
+    # seed_data's admin is the only one; the virtual admins share its login
+    return [f"customer{index}@{generate_data.EMAIL_DOMAIN}" for index in range(customers)], ["admin@example.com"] * admins
+
+
+async def login(client: httpx.AsyncClient, recorder: Recorder, email: str, password: str) -> dict:
+    response = await recorder.request(client, "POST /auth/login", "POST", "/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def customer(client: httpx.AsyncClient, recorder: Recorder, headers: dict, deadline: float, polls: int, think: float):
+    etag = None
+    menu: list[dict] = []
+    while time.perf_counter() < deadline:
+        # Browsers revalidate the cached menu, so most of these are 304s
+        response = await recorder.request(
+            client, "GET /menu/", "GET", "/menu/", headers={"If-None-Match": etag} if etag else None,
+        )
+        if response.status_code == 200:
+            menu = response.json()
+            etag = response.headers.get("etag")
+        await asyncio.sleep(think)
+
+        items = [{"item_id": item["item_id"], "quantity": random.randint(1, 3)} for item in random.sample(menu, k=min(len(menu), random.randint(1, 3)))]
+        response = await recorder.request(
+            client, "POST /orders/", "POST", "/orders/", json={"items": items},
+            headers={**headers, "Idempotency-Key": uuid.uuid4().hex},
+        )
+        if response.status_code != 201:
+            continue
+        order_id = response.json()["order_id"]
+        for _ in range(polls):
+            await asyncio.sleep(think)
+            await recorder.request(client, "GET /orders/{order_id}", "GET", f"/orders/{order_id}", headers=headers)
+        await recorder.request(client, "GET /orders/ (own)", "GET", "/orders/", params={"limit": 10}, headers=headers)
+        await asyncio.sleep(think)
+
+
+async def admin(client: httpx.AsyncClient, recorder: Recorder, headers: dict, deadline: float, think: float):
+    while time.perf_counter() < deadline:
+        await recorder.request(client, "GET /admin/analytics/dashboard", "GET", "/admin/analytics/dashboard", headers=headers)
+        await asyncio.sleep(think)
+        await recorder.request(client, "GET /orders/ (admin)", "GET", "/orders/", params={"limit": 50}, headers=headers)
+        await asyncio.sleep(think)
+
+
+async def run(args, customer_emails: list[str], admin_emails: list[str]):
+    async with AsyncExitStack() as stack:
+        if args.base_url:
+            client = await stack.enter_async_context(httpx.AsyncClient(base_url=args.base_url, timeout=60))
+        else:
+            # In-process, with the app's startup and shutdown like under uvicorn
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            client = await stack.enter_async_context(
+                httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test", timeout=60)
+            )
+        # Everyone logs in up front: bcrypt dominates this phase and would
+        # otherwise eat into the measured window
+        logins = Recorder()
+        started = time.perf_counter()
+        customer_headers = await asyncio.gather(*(login(client, logins, email, generate_data.PASSWORD) for email in customer_emails))
+        admin_headers = await asyncio.gather(*(login(client, logins, email, args.admin_password) for email in admin_emails))
+        logins.report(time.perf_counter() - started)
+        print()
+
+        recorder = Recorder()
+        started = time.perf_counter()
+        deadline = started + args.seconds
+        await asyncio.gather(
+            *(customer(client, recorder, headers, deadline, args.polls, args.think) for headers in customer_headers),
+            *(admin(client, recorder, headers, deadline, args.think * 10) for headers in admin_headers),
+        )
+        elapsed = time.perf_counter() - started
+    recorder.report(elapsed)
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=50, help="concurrent virtual customers")
+    parser.add_argument("--admins", type=int, default=2, help="concurrent virtual admins")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--polls", type=int, default=3, help="status polls per placed order")
+    parser.add_argument("--think", type=float, default=0.1, help="seconds between a customer's requests")
+    parser.add_argument("--orders", type=int, default=20000, help="orders to generate when the database is empty")
+    parser.add_argument("--admin-password", default="admin123")
+    parser.add_argument("--base-url", help="drive a running server instead of the app in-process")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    customer_emails, admin_emails = ensure_data(args.customers, args.admins, args.orders)
+    print(f"customers={len(customer_emails)} admins={len(admin_emails)} seconds={args.seconds} think={args.think}s")
+    asyncio.run(run(args, customer_emails, admin_emails))
+
+
+if __name__ == "__main__":
+    main()
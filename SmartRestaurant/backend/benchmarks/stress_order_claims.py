@@ -0,0 +1,106 @@
+"""Many riders claiming the same ready orders at once: exactly one may win.
+
+Run from the backend directory (needs httpx); point BENCH_DATABASE_URL at
+Postgres to exercise real row-level contention:
+
+    python -m benchmarks.stress_order_claims --orders 50 --riders 20
+
+Every rider sends PUT /orders/{id}/status?status=assigned for every order
+concurrently. Exits non-zero if any order ends up with other than one winner,
+a rider other than the winner, or more than one "assigned" history row.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from collections import Counter
+
+from benchmarks.bench_location_ingest import ensure_riders
+from benchmarks.common import summarize
+
+import httpx
+from jose import jwt
+from sqlalchemy import func, insert
+from sqlmodel import Session, select
+
+import app.auth as auth
+from app.events import event_bus
+from app.models.order_status_history import OrderStatusHistory
+from app.models.orders import Order
+from database import async_engine, engine
+from main import app
+
+
+def create_ready_orders(count: int, customer_id: int) -> list[int]:
+    with Session(engine) as session:
+        first = session.exec(select(func.coalesce(func.max(Order.order_id), 0))).one() + 1
+        session.exec(insert(Order), params=[
+            {"order_id": first + index, "customer_id": customer_id, "total_amount": 10.0, "status": "ready"}
+            for index in range(count)
+        ])
+        session.commit()
+        return list(range(first, first + count))
+
+
+async def claim(client: httpx.AsyncClient, token: str, order_id: int, results: list, latencies: list[float]):
+    started = time.perf_counter()
+    response = await client.put(f"/orders/{order_id}/status", params={"status": "assigned"}, headers={"Authorization": f"Bearer {token}"})
+    latencies.append((time.perf_counter() - started) * 1000)
+    results.append((order_id, token, response.status_code))
+
+
+async def run(tokens: list[str], order_ids: list[int]):
+    results, latencies = [], []
+    transport = httpx.ASGITransport(app=app)
+    # The ASGI transport skips the app lifespan; claims publish order events
+    await event_bus.start()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(*(claim(client, token, order_id, results, latencies) for order_id in order_ids for token in tokens))
+    await event_bus.stop()
+    await async_engine.dispose()
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=50)
+    parser.add_argument("--riders", type=int, default=20)
+    args = parser.parse_args()
+
+    tokens = ensure_riders(args.riders)
+    rider_of = {token: jwt.get_unverified_claims(token)["uid"] for token in tokens}
+    order_ids = create_ready_orders(args.orders, customer_id=rider_of[tokens[0]])
+    results, latencies = asyncio.run(run(tokens, order_ids))
+
+    codes = Counter(code for _, _, code in results)
+    winners = {}
+    for order_id, token, code in results:
+        if code == 200:
+            winners.setdefault(order_id, []).append(rider_of[token])
+    with Session(engine) as session:
+        orders = {order.order_id: order for order in session.exec(select(Order).where(Order.order_id.in_(order_ids))).all()}
+        history = Counter(session.exec(
+            select(OrderStatusHistory.order_id)
+            .where(OrderStatusHistory.order_id.in_(order_ids), OrderStatusHistory.new_status == "assigned")
+        ).all())
+
+    failures = []
+    for order_id in order_ids:
+        won = winners.get(order_id, [])
+        if len(won) != 1:
+            failures.append(f"order {order_id}: {len(won)} winners")
+        elif orders[order_id].assigned_rider_id != won[0]:
+            failures.append(f"order {order_id}: stored rider {orders[order_id].assigned_rider_id}, winner {won[0]}")
+        if history[order_id] != 1:
+            failures.append(f"order {order_id}: {history[order_id]} assigned history rows")
+
+    summarize("PUT /orders/{id}/status", latencies)
+    print(f"{len(results)} claims on {len(order_ids)} orders by {len(tokens)} riders: {dict(codes)}")
+    if failures:
+        print("FAILED:", *failures[:20], sep="\n  ")
+        sys.exit(1)
+    print("OK: exactly one winner per order")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,10 @@
+import time
+from sqlalchemy import exc as sqlalchemy_exc, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 import os
 from dotenv import load_dotenv
 
@@ -6,7 +12,143 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL, echo=True)
+# Async driver for each sync URL scheme we support
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {parsed.get_backend_name()}")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+# ASYNC_DATABASE_URL overrides the derived URL, e.g. to pick another async driver
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# Engine tuning, all from the environment. Size the pool per uvicorn worker:
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) must stay below the server's max_connections.
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Milliseconds, 0 disables it. Only applied on Postgres.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+
+class PoolStatsMixin:
+    """Counts how often and how long checkouts had to wait for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+    def _do_get(self):
+        # Saturated: nothing idle and no overflow headroom left
+        saturated = self.checkedin() == 0 and self._max_overflow > -1 and self._overflow >= self._max_overflow
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sqlalchemy_exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            if saturated:
+                self.waits += 1
+                self.wait_seconds += time.perf_counter() - started
+        self.checkouts += 1
+        return connection
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 6),
+            "timeouts": self.timeouts,
+        }
+
+
+class StatsQueuePool(PoolStatsMixin, QueuePool):
+    pass
+
+
+class StatsAsyncQueuePool(PoolStatsMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, async_driver: bool) -> dict:
+    parsed = make_url(url)
+    options = {"echo": DB_ECHO}
+    if parsed.get_backend_name() == "sqlite":
+        # SQLite picks its own pool class; pool sizing and timeouts don't apply
+        return options
+    options.update(
+        poolclass=StatsAsyncQueuePool if async_driver else StatsQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    if DB_STATEMENT_TIMEOUT_MS and parsed.get_backend_name() == "postgresql":
+        if async_driver:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+def pool_stats(target) -> dict:
+    pool = target.pool
+    if isinstance(pool, PoolStatsMixin):
+        return pool.stats()
+    return {"status": pool.status()}
+
+
+# The sync engine is used for schema setup and the maintenance scripts,
+# request handlers go through the async engine
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, async_driver=False))
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, async_driver=True))
+
+# expire_on_commit=False: attribute access after commit must not trigger IO
+async_session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+async def get_session():
+    async with async_session_factory() as session:
+        yield session
+
+def missing_columns() -> list[str]:
+    """Model columns absent from tables that already exist (create_all won't add them)."""
+    inspector = inspect(engine)
+    missing = []
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(f"{table.name}.{column.name}" for column in table.columns if column.name not in existing)
+    return missing
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    # Schema changes to existing tables are one-off scripts, not something every
+    # worker should race to apply at startup
+    missing = missing_columns()
+    if missing:
+        raise RuntimeError(f"Database schema is out of date, missing {', '.join(missing)}; run add_timestamp_columns.py")
+    # create_all skips tables that already exist, so add any indexes declared
+    # on the models since those tables were first created
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
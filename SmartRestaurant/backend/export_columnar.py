@@ -0,0 +1,32 @@
+"""Copy the order tables into the columnar store read by app.offline_analytics.
+
+    python export_columnar.py            # what changed since the last run
+    python export_columnar.py --full     # everything, e.g. after deleting orders
+
+Run it from cron as often as the offline reports should be fresh; the
+directory is COLUMNAR_DIR (./columnar by default).
+"""
+import argparse
+import time
+from sqlmodel import Session
+from database import engine
+from app.columnar import COLUMNAR_DIR, ColumnarExporter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--full", action="store_true", help="re-export every month instead of the changed ones")
+    parser.add_argument("--dir", default=COLUMNAR_DIR, help="store directory (COLUMNAR_DIR)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with Session(engine) as session:
+        summary = ColumnarExporter(session, args.dir).run(full=args.full)
+    for month, counts in summary["exported"].items():
+        print(f"-> {month}: " + ", ".join(f"{count} {table}" for table, count in counts.items()))
+    kind = "Full" if summary["full"] else "Incremental"
+    print(f"-> {kind} export of {len(summary['exported'])} month(s) into {args.dir} in {time.perf_counter() - started:.1f}s; {summary['months']} month(s) in the store.")
+
+
+if __name__ == "__main__":
+    main()
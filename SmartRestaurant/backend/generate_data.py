@@ -0,0 +1,364 @@
+"""Production-scale synthetic data on top of seed_data.py.
+
+    python generate_data.py --orders 1000000 --customers 50000 --riders 300 --days 180
+
+Orders follow lunch and dinner peaks, busier weekends and a long-tail menu
+popularity. Every order gets its items, a payment and a status history that
+follows the order state machine, with the stage timestamps filled in. Rows go
+in with COPY on Postgres (psycopg2) and executemany anywhere else, one
+transaction per batch, and the analytics rollups are rebuilt at the end.
+Generated users share the password "synthetic123".
+"""
+import argparse
+import csv
+import io
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import func, insert, select, text
+from sqlmodel import Session
+from database import create_db_and_tables, engine
+from app.models.categories import Category
+from app.models.menu_items import MenuItem
+from app.models.order_items import OrderItem
+from app.models.order_status_history import OrderStatusHistory
+from app.models.orders import Order
+from app.models.payments import Payment
+from app.models.rider import RiderProfile
+from app.models.user import User
+from app.rollups import rebuild_rollups
+from seed_data import hash_password, seed_data
+
+EMAIL_DOMAIN = "synthetic.example.com"
+PASSWORD = "synthetic123"
+
+RESTAURANTS = [
+    ("Smart Restaurant HQ", "123 Food Street, Downtown", 31.5204, 74.3587),
+    ("Smart Restaurant Gulberg", "45 Main Boulevard, Gulberg", 31.5102, 74.3441),
+    ("Smart Restaurant DHA", "12 Y Block, DHA", 31.4707, 74.4081),
+    ("Smart Restaurant Johar Town", "88 Canal Road, Johar Town", 31.4697, 74.2728),
+]
+# Category -> (median price, item names)
+MENU = {
+    "Burgers": (600, ["Double Smash", "Crispy Fillet", "Mushroom Swiss", "BBQ Bacon", "Veggie Patty"]),
+    "Pizza": (1300, ["Fajita Pizza", "Pepperoni Pizza", "Tikka Pizza", "Margherita", "Four Cheese"]),
+    "Drinks": (150, ["Lemonade", "Mint Margarita", "Iced Tea", "Mineral Water", "Cold Coffee"]),
+    "Sides": (300, ["Fries", "Loaded Fries", "Nuggets", "Onion Rings", "Coleslaw"]),
+    "Desserts": (450, ["Brownie", "Molten Lava Cake", "Sundae", "Cheesecake", "Kulfi"]),
+}
+
+# Stage an order reaches, in order; index = number of stages completed
+STAGES = ["pending", "ready", "assigned", "picked_up", "delivered"]
+CANCEL_RATE = 0.04
+
+
+class BulkWriter:
+    """Appends rows to tables with COPY on Postgres/psycopg2, executemany elsewhere."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.use_copy = connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2"
+        self.rows: dict[str, int] = defaultdict(int)
+
+    def write(self, model, columns: list[str], rows: list[tuple]):
+        if not rows:
+            return
+        table = model.__table__
+        if self.use_copy:
+            # Unquoted empty fields are NULL in COPY's csv format
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor = self.connection.connection.cursor()
+            cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            self.connection.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+        self.rows[table.name] += len(rows)
+
+
+def next_id(session: Session, column) -> int:
+    return session.exec(select(func.coalesce(func.max(column), 0))).one()[0] + 1
+
+
+def ensure_users(session: Session, role: str, count: int, rng: np.random.Generator, now: datetime) -> list[int]:
+    pattern = f"{role}%@{EMAIL_DOMAIN}"
+    existing = session.exec(select(func.count()).select_from(User).where(User.email.like(pattern))).one()[0]
+    if existing < count:
+        password_hash = hash_password(PASSWORD)
+        signed_up = [now - timedelta(days=365 * float(fraction)) for fraction in rng.random(count - existing)]
+        session.exec(insert(User), params=[
+            {
+                "name": f"{role.title()} {index}", "email": f"{role}{index}@{EMAIL_DOMAIN}",
+                "password_hash": password_hash, "role": role, "phone": f"03{index:09d}",
+                "created_at": created_at,
+            }
+            for index, created_at in zip(range(existing, count), signed_up)
+        ])
+        session.commit()
+    return list(session.exec(
+        select(User.user_id).where(User.email.like(pattern)).order_by(User.user_id).limit(count)
+    ).scalars().all())
+
+
+def ensure_rider_profiles(session: Session, rider_ids: list[int], rng: np.random.Generator):
+    with_profile = set(session.exec(select(RiderProfile.user_id)).scalars().all())
+    missing = [rider_id for rider_id in rider_ids if rider_id not in with_profile]
+    if not missing:
+        return
+    homes = rng.integers(len(RESTAURANTS), size=len(missing))
+    session.exec(insert(RiderProfile), params=[
+        {
+            "user_id": rider_id, "full_name": f"Rider {rider_id}", "phone_number": f"03{rider_id:09d}",
+            "vehicle_details": "bike",
+            "current_lat": RESTAURANTS[home][2] + rng.normal(0, 0.02),
+            "current_lng": RESTAURANTS[home][3] + rng.normal(0, 0.02),
+        }
+        for rider_id, home in zip(missing, homes)
+    ])
+    session.commit()
+
+
+def ensure_menu(session: Session, now: datetime) -> tuple[np.ndarray, np.ndarray]:
+    """(item ids, prices) of the whole menu after adding the synthetic items."""
+    categories = {category.name: category.category_id for category in session.exec(select(Category)).scalars().all()}
+    for name in MENU:
+        if name not in categories:
+            category = Category(name=name)
+            session.add(category)
+            session.flush()
+            categories[name] = category.category_id
+    existing = set(session.exec(select(MenuItem.name)).scalars().all())
+    new_items = [
+        {
+            "name": item_name, "description": f"{item_name} ({category_name.lower()})",
+            "price": float(round(median_price * (0.7 + 0.6 * index / len(item_names)), -1)),
+            "category_id": categories[category_name], "created_at": now,
+        }
+        for category_name, (median_price, item_names) in MENU.items()
+        for index, item_name in enumerate(item_names)
+        if item_name not in existing
+    ]
+    if new_items:
+        session.exec(insert(MenuItem), params=new_items)
+    session.commit()
+    rows = session.exec(select(MenuItem.item_id, MenuItem.price).order_by(MenuItem.item_id)).all()
+    return np.array([row[0] for row in rows]), np.array([row[1] for row in rows], dtype=float)
+
+
+def popularity(rng: np.random.Generator, count: int, exponent: float) -> np.ndarray:
+    """Zipf-like weights over a random ranking of count things."""
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def order_timestamps(rng: np.random.Generator, count: int, days: int, now: datetime) -> np.ndarray:
+    """Epoch seconds: steady growth towards today, busier weekends, lunch and dinner peaks."""
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    day_starts = np.array([(today - timedelta(days=offset)).timestamp() for offset in range(days)])
+    weekend = np.array([(today - timedelta(days=offset)).weekday() >= 4 for offset in range(days)])
+    day_weights = 0.995 ** np.arange(days) * np.where(weekend, 1.35, 1.0)
+    day = rng.choice(days, size=count, p=day_weights / day_weights.sum())
+
+    peak = rng.random(count)
+    hours = np.where(
+        peak < 0.4, rng.normal(13.0, 1.0, count),
+        np.where(peak < 0.85, rng.normal(20.0, 1.5, count), rng.uniform(10.0, 23.5, count)),
+    )
+    timestamps = day_starts[day] + np.clip(hours, 0.0, 23.99) * 3600
+    # Today's orders can't be in the future
+    now_ts = now.timestamp()
+    future = timestamps > now_ts
+    timestamps[future] = rng.uniform(today.timestamp(), now_ts, future.sum())
+    return timestamps
+
+
+def to_datetime(timestamp: float) -> datetime:
+    # Naive UTC, the way the UTCDateTime columns store it
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+ORDER_COLUMNS = [
+    "order_id", "customer_id", "order_number", "total_amount", "status", "assigned_rider_id",
+    "restaurant_name", "restaurant_address", "restaurant_lat", "restaurant_lng",
+    "customer_name", "customer_address", "customer_lat", "customer_lng",
+    "rider_earning", "created_at", "ready_at", "picked_up_at", "delivered_at",
+]
+ITEM_COLUMNS = ["id", "order_id", "item_id", "quantity", "price_each", "created_at"]
+HISTORY_COLUMNS = ["id", "order_id", "old_status", "new_status", "changed_at"]
+PAYMENT_COLUMNS = ["payment_id", "order_id", "method", "amount", "status", "created_at"]
+
+
+class OrderGenerator:
+    def __init__(self, rng, customers, riders, item_ids, item_prices, days, now, first_ids):
+        self.rng = rng
+        self.customers = np.asarray(customers)
+        self.customer_weights = popularity(rng, len(customers), 0.8)
+        self.riders = np.asarray(riders)
+        self.item_ids = item_ids
+        self.item_prices = item_prices
+        self.item_weights = popularity(rng, len(item_ids), 1.1)
+        self.days = days
+        self.now = now
+        self.order_id, self.item_row_id, self.history_id, self.payment_id = first_ids
+
+    def batch(self, count: int, writer: BulkWriter):
+        rng = self.rng
+        now_ts = self.now.timestamp()
+        created = order_timestamps(rng, count, self.days, self.now)
+        order_ids = np.arange(self.order_id, self.order_id + count)
+        self.order_id += count
+
+        # Items: mostly one or two lines, popular items far more often
+        lines = 1 + np.minimum(rng.poisson(0.9, count), 5)
+        offsets = np.concatenate(([0], np.cumsum(lines)[:-1]))
+        picks = rng.choice(len(self.item_ids), size=lines.sum(), p=self.item_weights)
+        quantities = rng.geometric(0.7, lines.sum())
+        line_totals = self.item_prices[picks] * quantities
+        totals = np.add.reduceat(line_totals, offsets)
+
+        # Stage times: prep, rider wait, ride to the restaurant, delivery ride
+        ready = created + rng.lognormal(np.log(15 * 60), 0.35, count)
+        assigned = ready + rng.uniform(60, 8 * 60, count)
+        picked_up = assigned + rng.uniform(3 * 60, 12 * 60, count)
+        delivered = picked_up + rng.lognormal(np.log(20 * 60), 0.4, count)
+        reached = (ready <= now_ts).astype(int) + (assigned <= now_ts) + (picked_up <= now_ts) + (delivered <= now_ts)
+        cancelled = rng.random(count) < CANCEL_RATE
+        cancelled_at = np.minimum(created + rng.uniform(60, 10 * 60, count), now_ts)
+
+        customers = rng.choice(self.customers, size=count, p=self.customer_weights)
+        riders = rng.choice(self.riders, size=count) if len(self.riders) else np.zeros(count, dtype=int)
+        restaurants = rng.integers(len(RESTAURANTS), size=count)
+        drop_offsets = rng.normal(0, 0.03, (count, 2))
+        methods = np.where(rng.random(count) < 0.6, "card", "cash")
+
+        orders, items, history, payments = [], [], [], []
+        for index in range(count):
+            order_id = int(order_ids[index])
+            created_at = to_datetime(created[index])
+            stage = 0 if cancelled[index] else int(reached[index])
+            status = "cancelled" if cancelled[index] else STAGES[stage]
+            rider_id = int(riders[index]) if stage >= 2 and len(self.riders) else None
+            total = float(totals[index])
+            name, address, lat, lng = RESTAURANTS[restaurants[index]]
+            orders.append((
+                order_id, int(customers[index]), f"ORD-{order_id:06d}", round(total, 2), status, rider_id,
+                name, address, lat, lng,
+                f"Customer {customers[index]}", f"House {order_id % 500 + 1}, Street {order_id % 37 + 1}",
+                lat + float(drop_offsets[index, 0]), lng + float(drop_offsets[index, 1]),
+                round(60 + 0.05 * total, 2) if rider_id else 0.0,
+                created_at,
+                to_datetime(ready[index]) if stage >= 1 else None,
+                to_datetime(picked_up[index]) if stage >= 3 else None,
+                to_datetime(delivered[index]) if stage >= 4 else None,
+            ))
+
+            for line in range(offsets[index], offsets[index] + lines[index]):
+                items.append((
+                    self.item_row_id, order_id, int(self.item_ids[picks[line]]), int(quantities[line]),
+                    float(self.item_prices[picks[line]]), created_at,
+                ))
+                self.item_row_id += 1
+
+            changes = [(None, "pending", created_at)]
+            if cancelled[index]:
+                changes.append(("pending", "cancelled", to_datetime(cancelled_at[index])))
+            else:
+                stage_times = (ready, assigned, picked_up, delivered)
+                for reached_stage in range(1, stage + 1):
+                    changes.append((STAGES[reached_stage - 1], STAGES[reached_stage], to_datetime(stage_times[reached_stage - 1][index])))
+            for old_status, new_status, changed_at in changes:
+                history.append((self.history_id, order_id, old_status, new_status, changed_at))
+                self.history_id += 1
+
+            method = str(methods[index])
+            if status == "delivered":
+                payment_status = "success"
+            elif status == "cancelled":
+                payment_status = "refunded" if method == "card" else "failed"
+            else:
+                payment_status = "success" if method == "card" else "pending"
+            payments.append((self.payment_id, order_id, method, round(total, 2), payment_status, created_at))
+            self.payment_id += 1
+
+        writer.write(Order, ORDER_COLUMNS, orders)
+        writer.write(OrderItem, ITEM_COLUMNS, items)
+        writer.write(OrderStatusHistory, HISTORY_COLUMNS, history)
+        writer.write(Payment, PAYMENT_COLUMNS, payments)
+
+
+def sync_sequences(session: Session):
+    # Rows were written with explicit ids, which don't advance serial sequences
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    for model, key in ((Order, "order_id"), (OrderItem, "id"), (OrderStatusHistory, "id"), (Payment, "payment_id")):
+        table = model.__tablename__
+        session.exec(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', '{key}'), (SELECT COALESCE(MAX({key}), 1) FROM {table}))"
+        ))
+    session.commit()
+
+
+def generate(
+    orders: int, customers: int = 1000, riders: int = 50, days: int = 90,
+    batch_size: int = 20000, seed: int = 42, quiet: bool = False,
+) -> dict[str, int]:
+    """Add the requested number of synthetic orders (and any missing users) to DATABASE_URL."""
+    log = (lambda message: None) if quiet else print
+    create_db_and_tables()
+    seed_data()
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+
+    with Session(engine) as session:
+        customer_ids = ensure_users(session, "customer", customers, rng, now)
+        rider_ids = ensure_users(session, "rider", riders, rng, now)
+        ensure_rider_profiles(session, rider_ids, rng)
+        item_ids, item_prices = ensure_menu(session, now)
+        first_ids = (
+            next_id(session, Order.order_id), next_id(session, OrderItem.id),
+            next_id(session, OrderStatusHistory.id), next_id(session, Payment.payment_id),
+        )
+    log(f"-> {len(customer_ids)} customers, {len(rider_ids)} riders, {len(item_ids)} menu items")
+
+    generator = OrderGenerator(rng, customer_ids, rider_ids, item_ids, item_prices, days, now, first_ids)
+    totals: dict[str, int] = defaultdict(int)
+    started = time.perf_counter()
+    written = 0
+    while written < orders:
+        count = min(batch_size, orders - written)
+        with engine.begin() as connection:
+            if connection.dialect.name == "postgresql":
+                # Losing the tail of a generated batch on a crash is fine
+                connection.execute(text("SET LOCAL synchronous_commit TO OFF"))
+            writer = BulkWriter(connection)
+            generator.batch(count, writer)
+        for table, rows in writer.rows.items():
+            totals[table] += rows
+        written += count
+        elapsed = time.perf_counter() - started
+        log(f"-> {written:,}/{orders:,} orders ({written / elapsed:,.0f} orders/s)")
+
+    with Session(engine) as session:
+        sync_sequences(session)
+        log("-> Rebuilding analytics rollups...")
+        rebuild_rollups(session)
+    log(f"-> Generated {dict(totals)} in {time.perf_counter() - started:.1f}s")
+    return dict(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--riders", type=int, default=100)
+    parser.add_argument("--days", type=int, default=90, help="spread orders over this many days up to now")
+    parser.add_argument("--batch", type=int, default=20000, help="orders per transaction")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    generate(args.orders, args.customers, args.riders, args.days, args.batch, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,28 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from database import create_db_and_tables
-from app.routers import analytics, auth, menu, orders, rider
+from database import async_engine, create_db_and_tables, engine
+from app.dispatch import load_dispatcher
+from app.events import event_bus
+from app.metrics import METRICS_TOKEN, MetricsMiddleware, metrics_writer, registry
+from app.profiling import ProfilingMiddleware, instrument_engine, request_profiler
+from app.rider_locations import location_flusher
+from app.routers import analytics, auth, dispatch, events, menu, orders, rider, system
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
+    await event_bus.start()
+    location_flusher.start()
+    await load_dispatcher()
+    metrics_writer.start()
     yield
+    await metrics_writer.stop()
+    await location_flusher.stop()
+    await event_bus.stop()
+    request_profiler.stop()
+    await async_engine.dispose()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -24,14 +39,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Idempotent-Replayed"],
 )
 
+# Wall time, SQL time, query and row counts per request, with budgets (see app/profiling.py)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth.router)
 app.include_router(menu.router)
 app.include_router(orders.router)
 app.include_router(analytics.router)
 app.include_router(rider.router)
+app.include_router(system.router)
+app.include_router(events.router)
+app.include_router(dispatch.router)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Smart Restaurant API"}
+
+# Prometheus scrape target; with METRICS_DIR set it reports the totals of every worker
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(authorization: str | None = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
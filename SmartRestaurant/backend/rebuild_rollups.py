@@ -0,0 +1,24 @@
+from sqlmodel import Session
+from database import create_db_and_tables, engine
+from app.models.user import User
+from app.models.categories import Category
+from app.models.menu_items import MenuItem
+from app.models.orders import Order
+from app.models.order_items import OrderItem
+from app.models.order_status_history import OrderStatusHistory
+from app.models.rollups import DailyStatusRollup, DailyItemRollup, DailyCategoryRollup, DailyRiderRollup
+from app.order_status import backfill_stage_timestamps
+from app.rollups import rebuild_rollups
+
+def main():
+    print("-> Rebuilding analytics rollups from order history...")
+    # Creates the rollup tables on databases that predate them
+    create_db_and_tables()
+    with Session(engine) as session:
+        rebuild_rollups(session)
+        print("-> Backfilling order stage timestamps from status history...")
+        backfill_stage_timestamps(session)
+    print("-> Analytics rollups rebuilt.")
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ from app.models.order_items import OrderItem
 from app.models.payments import Payment
 from app.models.order_status_history import OrderStatusHistory
 from app.models.rider import RiderProfile
+from app.models.rollups import DailyStatusRollup, DailyItemRollup, DailyCategoryRollup, DailyRiderRollup
 
 def reset_db():
     print("-> Dropping all tables...")
@@ -210,6 +210,13 @@ def seed_data():
             session.commit()
             print(f"-> Added {len(orders_list)} dummy orders with items and payments.")
 
+        # Orders above bypass the API, so backfill the analytics rollups from them
+        from app.order_status import backfill_stage_timestamps
+        from app.rollups import rebuild_rollups
+        rebuild_rollups(session)
+        backfill_stage_timestamps(session)
+        print("-> Analytics rollups and stage timestamps rebuilt.")
+
     print("-> Database seeding completed successfully!")
 
 
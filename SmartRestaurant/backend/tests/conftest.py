@@ -0,0 +1,68 @@
+import functools
+import os
+import sys
+import tempfile
+
+import bcrypt
+import pytest
+
+# The app reads its database URL at import time, so point it at a scratch
+# SQLite file before anything imports database.py
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="smartrestaurant-tests-"), "test.db")
+# Cheapest bcrypt cost, so seeding and logins don't dominate the run
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+import seed_data as seed  # noqa: E402
+from app.menu_cache import menu_cache  # noqa: E402
+from reset_db import reset_db  # noqa: E402
+
+USERS = {
+    "admin": ("admin@example.com", "admin123"),
+    "rider": ("rider@example.com", "rider123"),
+    "customer": ("customer@example.com", "customer123"),
+}
+
+
+@functools.lru_cache
+def fast_hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=4)).decode("utf-8")
+
+
+seed.hash_password = fast_hash_password
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def client(app_client):
+    """Test client over a freshly reset and seeded database."""
+    reset_db()
+    seed.seed_data()
+    # Snapshots of the previous test's menu would outlive the reset
+    menu_cache.invalidate()
+    return app_client
+
+
+@pytest.fixture
+def auth(client):
+    """Authorization headers per seeded role: auth("customer")."""
+    tokens = {}
+
+    def headers(role: str) -> dict:
+        if role not in tokens:
+            email, password = USERS[role]
+            response = client.post("/auth/login", data={"username": email, "password": password})
+            assert response.status_code == 200, response.text
+            tokens[role] = response.json()["access_token"]
+        return {"Authorization": f"Bearer {tokens[role]}"}
+
+    return headers
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from fastapi.dependencies.utils import get_dependant
+from pydantic import TypeAdapter
+
+from app.routers import analytics
+
+
+def dashboard(client, auth, metrics: str) -> dict:
+    # A range of its own keeps other tests' cached results out of the way
+    params = {"metrics": metrics, "start": "2000-01-01"}
+    response = client.get("/admin/analytics/dashboard", params=params, headers=auth("admin"))
+    assert response.status_code == 200
+    return response.json()["metrics"]
+
+
+def test_dashboard_hides_failing_metric_details(client, auth, monkeypatch):
+    async def broken(start=None, end=None, session=None):
+        raise RuntimeError("SELECT secret FROM somewhere")
+
+    monkeypatch.setitem(analytics.DASHBOARD_METRICS, "payment-success-rate", broken)
+    metrics = dashboard(client, auth, "total-orders,payment-success-rate")
+    assert metrics["total-orders"]["value"] == {"total_orders": 3}
+    assert metrics["payment-success-rate"]["error"] == "failed"
+
+
+def test_cached_metric_endpoints_do_not_depend_on_a_session():
+    dependant = get_dependant(path="/admin/analytics/total-orders", call=analytics.total_orders)
+    assert [param.name for param in dependant.query_params] == ["start", "end"]
+    assert dependant.dependencies == []
+
+
+def test_cached_metric_endpoint(client, auth):
+    response = client.get("/admin/analytics/total-orders", params={"start": "2001-01-01"}, headers=auth("admin"))
+    assert response.status_code == 200
+    assert response.json() == {"total_orders": 3}
+    assert response.headers["X-Cache"] == "MISS"
+
+
+def test_postgres_only_metric_is_reported_as_unsupported(client, auth):
+    metrics = dashboard(client, auth, "total-orders,delivery-times")
+    assert metrics["delivery-times"]["unsupported"] == "delivery-times needs PostgreSQL"
+    assert "error" not in metrics["delivery-times"]
+    response = client.get("/admin/analytics/delivery-times", headers=auth("admin"))
+    assert response.status_code == 501
+
+
+def test_average_delivery_time_is_computed_on_sqlite(client, auth):
+    # Seeded deliveries took 20 and 30 minutes from ready to delivered
+    response = client.get("/admin/analytics/avg-delivery-time", params={"start": "2002-01-01"}, headers=auth("admin"))
+    assert response.status_code == 200
+    assert TypeAdapter(timedelta).validate_python(response.json()["average_delivery_time"]) == timedelta(minutes=25)
@@ -0,0 +1,92 @@
+import random
+
+import app.routers.orders as orders_router
+from app.dispatch import Dispatcher, GeoGrid, dispatcher, haversine_km
+from app.events import shift_event
+from app.models.rider import RiderProfile
+from database import engine
+from sqlmodel import Session
+
+LAHORE = (31.52, 74.35)
+
+
+def status_event(order_id: int, status: str, rider_id: int | None) -> dict:
+    return {"type": "order.status_changed", "order_id": order_id, "status": status, "assigned_rider_id": rider_id}
+
+
+def on_shift_dispatcher(*riders: tuple[int, float, float]) -> Dispatcher:
+    fresh = Dispatcher()
+    for rider_id, lat, lng in riders:
+        fresh.track(rider_id, lat, lng)
+        fresh.set_on_shift(rider_id, True)
+    return fresh
+
+
+def test_grid_nearest_matches_brute_force():
+    rng = random.Random(7)
+    grid = GeoGrid(cell_deg=0.01)
+    points = {point_id: (LAHORE[0] + rng.uniform(-0.2, 0.2), LAHORE[1] + rng.uniform(-0.2, 0.2)) for point_id in range(500)}
+    for point_id, (lat, lng) in points.items():
+        grid.upsert(point_id, lat, lng)
+    for _ in range(50):
+        lat, lng = LAHORE[0] + rng.uniform(-0.2, 0.2), LAHORE[1] + rng.uniform(-0.2, 0.2)
+        expected = sorted((haversine_km(lat, lng, *point), point_id) for point_id, point in points.items())[:5]
+        assert [point_id for _, point_id in grid.nearest(lat, lng, k=5, max_km=100)] == [point_id for _, point_id in expected]
+
+
+def test_riders_off_shift_are_not_candidates():
+    dispatcher = on_shift_dispatcher((1, *LAHORE), (2, LAHORE[0] + 0.01, LAHORE[1]))
+    dispatcher.on_event(shift_event(1, False))
+    assert [rider_id for _, rider_id in dispatcher.nearest(*LAHORE, k=2)] == [2]
+    dispatcher.on_event(shift_event(1, True))
+    assert [rider_id for _, rider_id in dispatcher.nearest(*LAHORE, k=2)] == [1, 2]
+
+
+def test_rider_with_a_bundle_stays_busy_until_every_order_is_done():
+    dispatcher = on_shift_dispatcher((1, *LAHORE))
+    dispatcher.on_event(status_event(10, "assigned", 1))
+    dispatcher.on_event(status_event(11, "assigned", 1))
+    dispatcher.on_event(status_event(10, "picked_up", 1))
+    dispatcher.on_event(status_event(10, "delivered", 1))
+    assert not dispatcher.is_available(1)
+    dispatcher.on_event(status_event(11, "cancelled", 1))
+    assert dispatcher.is_available(1)
+    assert dispatcher.busy == set()
+
+
+def test_reassigned_order_frees_its_previous_rider():
+    dispatcher = on_shift_dispatcher((1, *LAHORE), (2, *LAHORE))
+    dispatcher.mark_busy(1, 10)
+    dispatcher.on_event(status_event(10, "assigned", 2))
+    assert dispatcher.busy == {2}
+
+
+def test_shift_toggle_needs_a_profile(client, auth):
+    response = client.put("/rider/shift", json={"on_shift": True}, headers=auth("rider"))
+    assert response.status_code == 404
+
+
+def test_shift_toggle_updates_the_dispatcher(client, auth):
+    rider_id = client.get("/auth/me", headers=auth("rider")).json()["user_id"]
+    with Session(engine) as session:
+        session.add(RiderProfile(user_id=rider_id, full_name="Rider User", phone_number="1", vehicle_details="bike"))
+        session.commit()
+    response = client.put("/rider/shift", json={"on_shift": True}, headers=auth("rider"))
+    assert response.status_code == 200
+    assert rider_id in dispatcher.on_shift
+    client.put("/rider/shift", json={"on_shift": False}, headers=auth("rider"))
+    assert rider_id not in dispatcher.on_shift
+
+
+def test_auto_assign_failure_keeps_the_committed_status_change(client, auth, monkeypatch):
+    async def broken(session, order):
+        raise RuntimeError("dispatch down")
+
+    monkeypatch.setattr(orders_router, "DISPATCH_AUTO_ASSIGN", True)
+    monkeypatch.setattr(orders_router, "auto_assign", broken)
+    order_id = client.post("/orders/", json={"items": [{"item_id": 1, "quantity": 1}]}, headers=auth("customer")).json()["order_id"]
+    assert client.put(f"/orders/{order_id}/status", params={"status": "preparing"}, headers=auth("admin")).status_code == 200
+    response = client.put(f"/orders/{order_id}/status", params={"status": "ready"}, headers=auth("admin"))
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+    assert client.get(f"/orders/{order_id}", headers=auth("admin")).json()["status"] == "ready"
@@ -0,0 +1,93 @@
+import itertools
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.dispatch import Dispatcher
+from app.dispatch_optimizer import haversine_matrix, make_bundles, min_cost_assignment, optimize
+
+LAHORE = (31.52, 74.35)
+
+
+def brute_force_cost(cost: np.ndarray) -> float:
+    rows, columns = cost.shape
+    if rows <= columns:
+        return min(sum(cost[row, column] for row, column in enumerate(perm)) for perm in itertools.permutations(range(columns), rows))
+    return brute_force_cost(cost.T)
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (3, 3), (4, 6), (6, 4), (5, 5), (2, 7)])
+def test_assignment_is_optimal(shape):
+    rng = np.random.default_rng(sum(shape))
+    for _ in range(20):
+        cost = rng.uniform(0, 10, size=shape)
+        pairs = min_cost_assignment(cost)
+        assert len(pairs) == min(shape)
+        assert len({row for row, _ in pairs}) == len({column for _, column in pairs}) == len(pairs)
+        assert sum(cost[row, column] for row, column in pairs) == pytest.approx(brute_force_cost(cost))
+
+
+def test_assignment_of_an_empty_matrix():
+    assert min_cost_assignment(np.zeros((0, 3))) == []
+
+
+def test_haversine_matrix_shape_and_symmetry():
+    lat, lng = [31.5, 31.6, 31.7], [74.3, 74.4, 74.5]
+    distances = haversine_matrix(lat, lng, lat, lng)
+    assert distances.shape == (3, 3)
+    assert np.allclose(np.diag(distances), 0)
+    assert np.allclose(distances, distances.T)
+
+
+def order(order_id, restaurant, customer):
+    return SimpleNamespace(
+        order_id=order_id, created_at=order_id,
+        restaurant_lat=restaurant[0], restaurant_lng=restaurant[1],
+        customer_lat=customer[0], customer_lng=customer[1],
+    )
+
+
+def test_bundles_share_pickup_and_nearby_drop_offs():
+    pickup, elsewhere = LAHORE, (LAHORE[0] + 0.1, LAHORE[1])
+    orders = [
+        order(1, pickup, (31.60, 74.40)),
+        order(2, pickup, (31.601, 74.401)),
+        order(3, pickup, (31.70, 74.50)),
+        order(4, elsewhere, (31.60, 74.40)),
+    ]
+    bundles = make_bundles(orders, max_bundle=3)
+    assert [[o.order_id for o in bundle.orders] for bundle in bundles] == [[1, 2], [3], [4]]
+    assert all(len(bundle.orders) == 1 for bundle in make_bundles(orders, max_bundle=1))
+
+
+def test_optimize_beats_or_ties_greedy_and_respects_range():
+    rng = random.Random(3)
+    dispatcher = Dispatcher()
+    for rider_id in range(1, 31):
+        dispatcher.track(rider_id, LAHORE[0] + rng.uniform(-0.1, 0.1), LAHORE[1] + rng.uniform(-0.1, 0.1))
+        dispatcher.set_on_shift(rider_id, True)
+    orders = [
+        order(order_id, (LAHORE[0] + rng.uniform(-0.1, 0.1), LAHORE[1] + rng.uniform(-0.1, 0.1)), LAHORE)
+        for order_id in range(1, 21)
+    ]
+    plan = optimize(dispatcher, orders)
+    greedy, _ = dispatcher.plan(orders)
+    assert len(plan.assigned) == 20 and not plan.unassigned
+    assert len({bundle.rider_id for bundle in plan.assigned}) == 20
+    assert plan.total_km <= sum(distance for _, _, distance in greedy) + 1e-9
+
+    far = order(99, (LAHORE[0] + 5, LAHORE[1]), LAHORE)
+    assert [o.order_id for o in optimize(dispatcher, [far]).unassigned] == [99]
+
+
+def test_optimize_skips_busy_and_off_shift_riders():
+    dispatcher = Dispatcher()
+    for rider_id in (1, 2, 3):
+        dispatcher.track(rider_id, *LAHORE)
+        dispatcher.set_on_shift(rider_id, rider_id != 3)
+    dispatcher.mark_busy(1, 50)
+    plan = optimize(dispatcher, [order(1, LAHORE, LAHORE), order(2, LAHORE, LAHORE)])
+    assert [bundle.rider_id for bundle in plan.assigned] == [2]
+    assert len(plan.unassigned) == 1
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+
+import pytest
+import redis.exceptions
+
+from app import events
+from app.events import EventBus, LocalBroker, RedisBroker
+
+
+def event(order_id: int = 1) -> dict:
+    return {
+        "type": "order.status_changed", "order_id": order_id, "status": "ready", "old_status": "preparing",
+        "customer_id": 3, "assigned_rider_id": None, "at": "2025-01-01T00:00:00+00:00",
+    }
+
+
+def test_publish_before_start_raises():
+    bus = EventBus(LocalBroker())
+    with pytest.raises(RuntimeError):
+        asyncio.run(bus.publish(event()))
+    with pytest.raises(RuntimeError):
+        asyncio.run(LocalBroker().publish(event()))
+
+
+def test_published_events_reach_listeners_and_subscribers():
+    async def scenario():
+        bus = EventBus(LocalBroker())
+        seen = []
+        bus.add_listener(seen.append)
+        subscription = bus.subscribe(lambda event: event["order_id"] == 2)
+        await bus.start()
+        await bus.publish(event(1))
+        await bus.publish(event(2))
+        await bus.stop()
+        return seen, subscription.queue.qsize(), bus.counters
+
+    seen, queued, counters = asyncio.run(scenario())
+    assert [event["order_id"] for event in seen] == [1, 2]
+    assert queued == 1
+    assert counters == {"published": 2, "delivered": 1, "publish_errors": 0, "listener_errors": 0}
+
+
+def test_broker_errors_are_counted_and_logged(caplog):
+    class DownBroker(LocalBroker):
+        async def publish(self, event: dict):
+            raise ConnectionError("broker down")
+
+    async def scenario():
+        bus = EventBus(DownBroker())
+        await bus.start()
+        await bus.publish(event())
+        return bus.counters
+
+    with caplog.at_level(logging.ERROR, logger="app.events"):
+        counters = asyncio.run(scenario())
+    assert counters["publish_errors"] == 1
+    assert "broker down" in caplog.text
+
+
+def test_failing_listener_does_not_starve_the_others(caplog):
+    async def scenario():
+        bus = EventBus(LocalBroker())
+        seen = []
+
+        def broken(event):
+            raise KeyError("assigned_rider_id")
+
+        bus.add_listener(broken)
+        bus.add_listener(seen.append)
+        subscription = bus.subscribe(lambda event: True)
+        await bus.start()
+        await bus.publish(event())
+        return seen, subscription.queue.qsize(), bus.counters
+
+    with caplog.at_level(logging.ERROR, logger="app.events"):
+        seen, queued, counters = asyncio.run(scenario())
+    assert (len(seen), queued) == (1, 1)
+    assert counters["listener_errors"] == 1
+    assert counters["publish_errors"] == 0
+    assert "assigned_rider_id" in caplog.text
+
+
+class FakePubSub:
+    """Plays back one connection's messages, then fails or waits like a quiet channel."""
+
+    def __init__(self, messages: list, fail: bool):
+        self.messages = messages
+        self.fail = fail
+        self.subscribed = False
+        self.closed = False
+
+    async def subscribe(self, channel):
+        self.subscribed = True
+
+    async def unsubscribe(self, channel):
+        self.subscribed = False
+
+    async def aclose(self):
+        self.closed = True
+
+    async def listen(self):
+        for data in self.messages:
+            yield {"type": "message", "data": data}
+        if self.fail:
+            raise redis.exceptions.ConnectionError("Connection reset by peer")
+        await asyncio.Event().wait()
+
+
+class FakeRedis:
+    def __init__(self, connections: list[FakePubSub]):
+        self.connections = connections
+        self.opened: list[FakePubSub] = []
+
+    def pubsub(self):
+        self.opened.append(self.connections[len(self.opened)])
+        return self.opened[-1]
+
+    async def aclose(self):
+        pass
+
+
+def test_redis_listener_survives_bad_messages_and_disconnects(monkeypatch, caplog):
+    monkeypatch.setattr(events, "EVENT_BUS_RETRY_DELAY", 0)
+    first = FakePubSub([b"not json", json.dumps(event(1)), json.dumps(event(2))], fail=True)
+    second = FakePubSub([json.dumps(event(3))], fail=False)
+    broker = RedisBroker("redis://localhost:6379/0")
+    broker._client = FakeRedis([first, second])
+
+    async def scenario():
+        bus = EventBus(broker)
+        seen = []
+
+        def listener(event):
+            if event["order_id"] == 1:
+                raise ValueError("listener bug")
+            seen.append(event["order_id"])
+
+        bus.add_listener(listener)
+        await bus.start()
+        for _ in range(100):
+            if seen == [2, 3]:
+                break
+            await asyncio.sleep(0)
+        await bus.stop()
+        return seen
+
+    with caplog.at_level(logging.WARNING, logger="app.events"):
+        seen = asyncio.run(scenario())
+    assert seen == [2, 3]
+    assert broker.reconnects == 1
+    assert "undecodable" in caplog.text and "listener bug" in caplog.text and "resubscribing" in caplog.text
+    # stop() leaves nothing subscribed or open
+    assert all(not pubsub.subscribed and pubsub.closed for pubsub in (first, second))
@@ -0,0 +1,141 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.idempotency import IdempotencyStore, fingerprint
+from app.result_cache import MemoryBackend
+
+ORDER = {"items": [{"item_id": 1, "quantity": 2}]}
+
+
+def key() -> dict:
+    return {"Idempotency-Key": uuid.uuid4().hex}
+
+
+def test_retry_replays_the_first_response(client, auth):
+    headers = {**auth("customer"), **key()}
+    first = client.post("/orders/", json=ORDER, headers=headers)
+    retry = client.post("/orders/", json=ORDER, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    orders = client.get("/orders/", headers=auth("customer")).json()
+    assert [order["order_id"] for order in orders].count(first.json()["order_id"]) == 1
+
+
+def test_keyed_response_matches_the_response_model(client, auth):
+    keyed = client.post("/orders/", json=ORDER, headers={**auth("customer"), **key()}).json()
+    plain = client.post("/orders/", json=ORDER, headers=auth("customer")).json()
+    assert set(keyed) == set(plain)
+    assert "items" not in keyed
+
+
+def test_same_key_with_another_body_is_rejected(client, auth):
+    headers = {**auth("customer"), **key()}
+    assert client.post("/orders/", json=ORDER, headers=headers).status_code == 201
+    response = client.post("/orders/", json={"items": [{"item_id": 2, "quantity": 1}]}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_keys_are_scoped_per_caller(client, auth):
+    idempotency_key = key()
+    first = client.post("/orders/", json=ORDER, headers={**auth("customer"), **idempotency_key})
+    other = client.post("/orders/", json=ORDER, headers={**auth("admin"), **idempotency_key})
+    assert other.status_code == 201
+    assert other.json()["order_id"] != first.json()["order_id"]
+
+
+def test_client_errors_are_replayed_too(client, auth):
+    headers = {**auth("customer"), **key()}
+    body = {"items": [{"item_id": 99999, "quantity": 1}]}
+    first = client.post("/orders/", json=body, headers=headers)
+    assert first.status_code == 404
+    retry = client.post("/orders/", json=body, headers=headers)
+    assert retry.status_code == first.status_code
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+
+def run_store(*coroutines):
+    async def scenario():
+        return await asyncio.gather(*coroutines, return_exceptions=True)
+
+    return asyncio.run(scenario())
+
+
+def test_concurrent_duplicates_run_once():
+    store = IdempotencyStore(MemoryBackend())
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"n": len(calls)}
+
+    responses = run_store(*(store.run("k", "scope", {"a": 1}, compute) for _ in range(5)))
+    assert len(calls) == 1
+    assert {response.body for response in responses} == {b'{"n":1}'}
+    assert sum("Idempotent-Replayed" in response.headers for response in responses) == 4
+
+
+def test_claim_is_shared_through_the_backend():
+    # Two stores over one backend stand in for two workers
+    backend = MemoryBackend()
+    first, second = IdempotencyStore(backend), IdempotencyStore(backend)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    run_store(first.run("k", "scope", {}, compute), second.run("k", "scope", {}, compute))
+    assert len(calls) == 1
+    assert first.counters["executed"] + second.counters["executed"] == 1
+
+
+def test_server_errors_free_the_key():
+    store = IdempotencyStore(MemoryBackend())
+
+    async def failing():
+        raise HTTPException(status_code=503, detail="down")
+
+    async def working():
+        return {"ok": True}
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await store.run("k", "scope", {}, failing)
+        return await store.run("k", "scope", {}, working)
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert store.counters["executed"] == 1
+
+
+def test_duplicate_with_another_body_is_rejected_while_the_first_runs():
+    backend = MemoryBackend()
+    store = IdempotencyStore(backend)
+
+    async def scenario():
+        await backend.add("idempotency:scope:k", 0.0, {"pending": True, "fingerprint": fingerprint({"a": 1})}, 60)
+        await store.run("k", "scope", {"a": 2}, lambda: None)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(scenario())
+    assert excinfo.value.status_code == 422
+
+
+def test_duplicate_gives_up_while_the_first_is_still_running():
+    backend = MemoryBackend()
+    store = IdempotencyStore(backend, lock_ttl=0.1)
+
+    async def scenario():
+        await backend.add("idempotency:scope:k", 0.0, {"pending": True, "fingerprint": fingerprint({})}, 60)
+        await store.run("k", "scope", {}, lambda: None)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(scenario())
+    assert excinfo.value.status_code == 409
+    assert store.counters["busy"] == 1
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.menu_bulk import iter_records
+
+BODY = (
+    'name,price,category_id\n12" Pizza,10,1\nSalad,5,1\n\n"Soup\nof the day",4,1\r\n'
+    'Tea,"2",1,extra\n"Unclosed,1,1\n'
+).encode()
+
+
+def parse(body: bytes, fmt: str = "csv", chunk_size: int = 1 << 16) -> list[tuple]:
+    async def chunks():
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+
+    async def collect():
+        return [record async for record in iter_records(chunks(), fmt)]
+
+    return asyncio.run(collect())
+
+
+# Quoted fields split across body chunks at every possible point read the same
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1 << 16])
+def test_csv_records(chunk_size):
+    assert parse(BODY, chunk_size=chunk_size) == [
+        (2, {"name": '12" Pizza', "price": "10", "category_id": "1"}, None),
+        (3, {"name": "Salad", "price": "5", "category_id": "1"}, None),
+        (5, {"name": "Soup\nof the day", "price": "4", "category_id": "1"}, None),
+        (7, None, "Expected 3 columns, got 4"),
+        (8, None, "Unterminated quoted field"),
+    ]
+
+
+def test_stray_quotes_in_unquoted_values_do_not_swallow_later_rows():
+    body = b'name,price,category_id\n12" Pizza,10,1\nSalad,5,1\nSoup,4,1\n'
+    assert [(line, data["name"]) for line, data, _ in parse(body)] == [(2, '12" Pizza'), (3, "Salad"), (4, "Soup")]
+
+
+def test_jsonl_records():
+    body = b'{"name": "Tea", "price": 2, "category_id": 1}\n\nnot json\n[1]\n'
+    records = parse(body, "jsonl")
+    assert records[0] == (1, {"name": "Tea", "price": 2, "category_id": 1}, None)
+    assert [(line, error.split(":")[0]) for line, _, error in records[1:]] == [(3, "Invalid JSON"), (4, "Expected a JSON object")]
+
+
+def import_items(client, auth, body: str, **params):
+    headers = {**auth("admin"), "Content-Type": "text/csv"}
+    return client.post("/menu/import", params=params, content=body.encode(), headers=headers)
+
+
+def test_import_inserts_and_upserts(client, auth):
+    before = client.get("/menu/").json()
+    first = before[0]
+    body = (
+        "item_id,name,price,category_id\n"
+        f"{first['item_id']},Renamed,{first['price'] + 1},{first['category_id']}\n"
+        f',"Soup, of the day",4.5,{first["category_id"]}\n'
+    )
+    response = import_items(client, auth, body)
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["rows"], report["inserted"], report["updated"], report["committed"]) == (2, 1, 1, True)
+
+    after = {item["name"]: item for item in client.get("/menu/").json()}
+    assert len(after) == len(before) + 1
+    assert after["Renamed"]["item_id"] == first["item_id"]
+    assert after["Renamed"]["price"] == first["price"] + 1
+    assert after["Soup, of the day"]["price"] == 4.5
+
+
+def test_invalid_rows_roll_back_the_import(client, auth):
+    before = client.get("/menu/").json()
+    body = "name,price,category_id\nTea,2,1\nCoffee,-1,1\nCake,3,999999\n"
+    response = import_items(client, auth, body)
+    assert response.status_code == 422
+    errors = response.json()["detail"]["errors"]
+    assert [error["line"] for error in errors] == [3, 4]
+    assert client.get("/menu/").json() == before
+
+    report = import_items(client, auth, body, skip_invalid="true").json()
+    assert (report["inserted"], report["error_count"], report["committed"]) == (1, 2, True)
+    assert "Tea" in {item["name"] for item in client.get("/menu/").json()}
@@ -0,0 +1,90 @@
+import os
+import subprocess
+
+import pytest
+
+from app.metrics import LATENCY_BUCKETS, MetricsRegistry, merge, render_text
+
+
+def parse(text: str) -> dict[str, float]:
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def scrape(client) -> str:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    return response.text
+
+
+def test_scrape_after_requests(client):
+    # The registry lives for the whole session, so compare against a first scrape
+    before = parse(scrape(client))
+    for _ in range(3):
+        assert client.get("/menu/").status_code == 200
+    text = scrape(client)
+    after = parse(text)
+
+    assert "# HELP http_requests_total HTTP requests by router, method and status code." in text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    requests = 'http_requests_total{router="menu",method="GET",status="200"}'
+    assert after[requests] - before.get(requests, 0) == 3
+    # Counted when the previous scrape finished
+    assert after['http_requests_total{router="other",method="GET",status="200"}'] >= 1
+
+    bounds = [f"{bound:g}" for bound in LATENCY_BUCKETS] + ["+Inf"]
+    buckets = [after[f'http_request_duration_seconds_bucket{{router="menu",le="{le}"}}'] for le in bounds]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == after['http_request_duration_seconds_count{router="menu"}']
+    assert after['http_request_duration_seconds_sum{router="menu"}'] > 0
+    assert after["http_requests_in_flight"] == 1
+
+
+def worker_snapshot(pid: int, requests: float, in_flight: float, latencies: list[float]) -> dict:
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests.", ("router",)).inc("menu", amount=requests)
+    registry.gauge("in_flight", "In flight.").set(value=in_flight)
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for latency in latencies:
+        histogram.observe(value=latency)
+    return {**registry.snapshot(), "pid": pid}
+
+
+def exited_pid() -> int:
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+def test_merge_sums_counters_and_labels_gauges_by_worker():
+    this, sibling, gone = os.getpid(), os.getppid(), exited_pid()
+    merged = merge([
+        worker_snapshot(this, 2, 1, [0.05, 2.0]),
+        worker_snapshot(sibling, 3, 4, [0.5]),
+        worker_snapshot(gone, 5, 9, [0.05]),
+    ], per_worker_gauges=True)
+    samples = parse(render_text(merged))
+
+    # Workers that exited still count, so totals never go backwards
+    assert samples['requests_total{router="menu"}'] == 10
+    assert [samples[f'latency_seconds_bucket{{le="{le}"}}'] for le in ("0.1", "1", "+Inf")] == [2, 3, 4]
+    assert samples["latency_seconds_sum"] == pytest.approx(2.6)
+    assert samples["latency_seconds_count"] == 4
+    # ...but their gauges are dropped
+    assert {name: value for name, value in samples.items() if name.startswith("in_flight")} == {
+        f'in_flight{{pid="{this}"}}': 1,
+        f'in_flight{{pid="{sibling}"}}': 4,
+    }
+
+
+def test_single_worker_gauges_have_no_pid_label():
+    merged = merge([worker_snapshot(os.getpid(), 1, 2, [])], per_worker_gauges=False)
+    text = render_text(merged)
+    assert "in_flight 2\n" in text
+    assert "# TYPE latency_seconds histogram" in text
+    assert "latency_seconds_count" not in text
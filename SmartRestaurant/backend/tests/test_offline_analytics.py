@@ -0,0 +1,93 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlmodel import Session
+
+from app import columnar
+from app.columnar import ColumnarExporter, ColumnarStore, Frame
+from app.offline_analytics import OfflineAnalytics, group_by
+from database import engine
+
+
+def timestamps(*values) -> np.ndarray:
+    return np.array([None if value is None else datetime.fromisoformat(value) for value in values], dtype="datetime64[us]")
+
+
+def test_timestamp_aggregates_skip_nat_and_come_back_as_datetimes():
+    frame = Frame({
+        "group": np.array([0, 0, 0, 1], dtype=np.int64),
+        "at": timestamps("2025-01-01T10:00:00", None, "2025-01-01T12:00:00", None),
+    })
+    rows = group_by(frame, ["group"], ["min:at", "max:at", "mean:at", "p50:at"], order_by="group", descending=False)
+    assert rows[0] == {
+        "group": 0,
+        "min_at": datetime(2025, 1, 1, 10),
+        "max_at": datetime(2025, 1, 1, 12),
+        "mean_at": datetime(2025, 1, 1, 11),
+        "p50_at": datetime(2025, 1, 1, 11),
+    }
+    assert rows[1] == {"group": 1, "min_at": None, "max_at": None, "mean_at": None, "p50_at": None}
+
+
+def test_timestamps_cannot_be_summed():
+    frame = Frame({"at": timestamps("2025-01-01T10:00:00")})
+    with pytest.raises(ValueError):
+        group_by(frame, [], ["sum:at"])
+
+
+def test_null_ids_are_left_out_of_integer_aggregates():
+    frame = Frame({"rider_id": np.array([4, -1, 6, -1], dtype=np.int64)})
+    row = group_by(frame, [], ["count", "sum:rider_id", "mean:rider_id", "min:rider_id"])[0]
+    assert row == {"count": 4, "sum_rider_id": 10, "mean_rider_id": 5.0, "min_rider_id": 4.0}
+    nothing = group_by(Frame({"rider_id": np.array([-1], dtype=np.int64)}), [], ["mean:rider_id", "max:rider_id"])[0]
+    assert nothing == {"mean_rider_id": None, "max_rider_id": None}
+
+
+def export(root) -> dict:
+    with Session(engine) as session:
+        return ColumnarExporter(session, str(root)).run(full=True)
+
+
+def test_group_by_endpoint(client, auth, tmp_path, monkeypatch):
+    export(tmp_path)
+    monkeypatch.setattr(columnar.columnar_store, "root", str(tmp_path))
+    params = {
+        "table": "orders", "by": "status", "order_by": "status", "descending": "false",
+        "aggregate": ["count", "rider=max:assigned_rider_id", "first=min:created_at", "ready=max:ready_at"],
+    }
+    response = client.get("/admin/analytics/offline/group-by", params=params, headers=auth("admin"))
+    assert response.status_code == 200, response.text
+    delivered, pending = response.json()["rows"]
+    assert (delivered["status"], delivered["count"]) == ("delivered", 2)
+    assert delivered["rider"] is not None
+    assert datetime.fromisoformat(delivered["ready"]) > datetime.fromisoformat(delivered["first"])
+    assert (pending["status"], pending["count"], pending["rider"], pending["ready"]) == ("pending", 1, None, None)
+    assert datetime.fromisoformat(pending["first"]) > datetime.fromisoformat(delivered["first"])
+
+    params = {"table": "orders", "aggregate": "sum:created_at"}
+    response = client.get("/admin/analytics/offline/group-by", params=params, headers=auth("admin"))
+    assert response.status_code == 400
+
+
+def partition_directories(root) -> set[str]:
+    return set(os.listdir(os.path.join(root, "partitions")))
+
+
+def test_readers_of_the_previous_export_keep_their_files(client, tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    export(tmp_path)
+    first = set(store.manifest()["partitions"].values())
+    pinned = OfflineAnalytics(store)
+
+    export(tmp_path)
+    second = set(store.manifest()["partitions"].values())
+    assert partition_directories(tmp_path) == first | second
+    assert pinned.total_orders() == {"total_orders": 3}
+
+    export(tmp_path)
+    assert partition_directories(tmp_path) == second | set(store.manifest()["partitions"].values())
+    # Two exports on, the pinned manifest's files are gone: it moves to the current one
+    assert pinned.total_orders() == {"total_orders": 3}
+    assert pinned.manifest == store.manifest()
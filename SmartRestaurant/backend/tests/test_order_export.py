@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+
+from sqlmodel import Session, select
+
+from app.models.orders import Order
+from app.models.payments import Payment
+from database import engine
+
+
+def export(client, auth, **params):
+    response = client.get("/orders/export", params=params, headers=auth("admin"))
+    assert response.status_code == 200, response.text
+    return response
+
+
+def retry_payment(status: str) -> int:
+    """Add a second payment attempt to the seeded pending order."""
+    with Session(engine) as session:
+        order = session.exec(select(Order).where(Order.status == "pending")).one()
+        session.add(Payment(order_id=order.order_id, method="cash", amount=order.total_amount, status=status))
+        session.commit()
+        return order.order_id
+
+
+def test_jsonl_reports_the_latest_payment_once(client, auth):
+    order_id = retry_payment("success")
+    orders = [json.loads(line) for line in export(client, auth, format="jsonl").text.splitlines()]
+    assert [order["order_id"] for order in orders] == sorted(order["order_id"] for order in orders)
+    assert len(orders) == 3
+    retried = next(order for order in orders if order["order_id"] == order_id)
+    assert (retried["payment_method"], retried["payment_status"]) == ("cash", "success")
+    assert len(retried["items"]) == 1
+
+
+def test_csv_has_a_row_per_line_item(client, auth):
+    retry_payment("failed")
+    rows = list(csv.DictReader(io.StringIO(export(client, auth, format="csv").text)))
+    # Seeded orders have 2, 2 and 1 line items; the extra payment adds no rows
+    assert len(rows) == 5
+    assert all(row["line_total"] for row in rows)
+
+
+def test_status_filter(client, auth):
+    order_id = retry_payment("failed")
+    orders = [json.loads(line) for line in export(client, auth, format="jsonl", status="pending").text.splitlines()]
+    assert [(order["order_id"], order["payment_status"]) for order in orders] == [(order_id, "failed")]
+    delivered = export(client, auth, format="jsonl", status=["delivered", "cancelled"]).text.splitlines()
+    assert len(delivered) == 2
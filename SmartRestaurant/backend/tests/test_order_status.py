@@ -0,0 +1,119 @@
+import pytest
+from sqlmodel import Session, select
+
+from app.models.order_status_history import OrderStatusHistory
+from app.order_status import ORDER_TRANSITIONS, RIDER_STATUSES
+from database import engine
+
+
+def new_order(client, auth) -> int:
+    response = client.post("/orders/", json={"items": [{"item_id": 1, "quantity": 1}]}, headers=auth("customer"))
+    assert response.status_code == 201
+    return response.json()["order_id"]
+
+
+def move(client, auth, role: str, order_id: int, status: str):
+    return client.put(f"/orders/{order_id}/status", params={"status": status}, headers=auth(role))
+
+
+def ready_order(client, auth) -> int:
+    order_id = new_order(client, auth)
+    for status in ("preparing", "ready"):
+        assert move(client, auth, "admin", order_id, status).status_code == 200
+    return order_id
+
+
+def history(order_id: int) -> list[tuple[str, str]]:
+    with Session(engine) as session:
+        rows = session.exec(
+            select(OrderStatusHistory).where(OrderStatusHistory.order_id == order_id).order_by(OrderStatusHistory.id)
+        ).all()
+        return [(row.old_status, row.new_status) for row in rows]
+
+
+def test_transition_table_is_closed():
+    for status, targets in ORDER_TRANSITIONS.items():
+        assert targets <= set(ORDER_TRANSITIONS), status
+    assert set(RIDER_STATUSES) <= set(ORDER_TRANSITIONS)
+
+
+def test_full_lifecycle_stamps_stages_and_history(client, auth):
+    order_id = new_order(client, auth)
+    for role, status in [("admin", "preparing"), ("admin", "ready"), ("rider", "assigned"), ("rider", "picked_up"), ("rider", "delivered")]:
+        response = move(client, auth, role, order_id, status)
+        assert response.status_code == 200, response.text
+    order = client.get(f"/orders/{order_id}", headers=auth("admin")).json()
+    assert order["status"] == "delivered"
+    assert order["ready_at"] and order["picked_up_at"] and order["delivered_at"]
+    assert history(order_id)[-5:] == [
+        ("pending", "preparing"), ("preparing", "ready"), ("ready", "assigned"),
+        ("assigned", "picked_up"), ("picked_up", "delivered"),
+    ]
+
+
+@pytest.mark.parametrize("start, target", [("pending", "delivered"), ("pending", "picked_up"), ("pending", "ready")])
+def test_illegal_transitions_conflict(client, auth, start, target):
+    order_id = new_order(client, auth)
+    response = move(client, auth, "admin", order_id, target)
+    assert response.status_code == 409
+    assert response.json()["detail"]["status"] == start
+
+
+def test_terminal_states_are_final(client, auth):
+    order_id = new_order(client, auth)
+    assert move(client, auth, "admin", order_id, "cancelled").status_code == 200
+    assert move(client, auth, "admin", order_id, "ready").status_code == 409
+
+
+def test_repeated_change_is_a_no_op(client, auth):
+    order_id = new_order(client, auth)
+    assert move(client, auth, "admin", order_id, "preparing").status_code == 200
+    assert move(client, auth, "admin", order_id, "preparing").status_code == 200
+    assert history(order_id).count(("pending", "preparing")) == 1
+
+
+@pytest.mark.parametrize("status", ["preparing", "ready", "cancelled", "pending"])
+def test_riders_only_claim_pick_up_and_deliver(client, auth, status):
+    order_id = new_order(client, auth)
+    response = move(client, auth, "rider", order_id, status)
+    assert response.status_code == 403
+    response = client.post(f"/rider/orders/{order_id}/status", params={"status": status}, headers=auth("rider"))
+    assert response.status_code == 403
+    assert client.get(f"/orders/{order_id}", headers=auth("admin")).json()["status"] == "pending"
+
+
+def test_rider_cannot_cancel_their_own_order(client, auth):
+    order_id = ready_order(client, auth)
+    assert move(client, auth, "rider", order_id, "assigned").status_code == 200
+    assert move(client, auth, "rider", order_id, "cancelled").status_code == 403
+
+
+def test_rider_claim_assigns_the_order_and_admins_can_still_cancel(client, auth):
+    order_id = ready_order(client, auth)
+    assert move(client, auth, "rider", order_id, "assigned").status_code == 200
+    rider_id = client.get("/auth/me", headers=auth("rider")).json()["user_id"]
+    order = client.get(f"/orders/{order_id}", headers=auth("admin")).json()
+    assert order["assigned_rider_id"] == rider_id
+    assert move(client, auth, "admin", order_id, "cancelled").status_code == 200
+
+
+def test_riders_claim_only_ready_orders(client, auth):
+    order_id = new_order(client, auth)
+    assert move(client, auth, "rider", order_id, "assigned").status_code == 409
+    order_id = ready_order(client, auth)
+    assert move(client, auth, "rider", order_id, "picked_up").status_code == 409
+
+
+def test_admin_cannot_assign_without_a_rider(client, auth):
+    order_id = ready_order(client, auth)
+    assert move(client, auth, "admin", order_id, "assigned").status_code == 400
+    order = client.get(f"/orders/{order_id}", headers=auth("admin")).json()
+    assert (order["status"], order["assigned_rider_id"]) == ("ready", None)
+
+
+def test_picked_up_orders_can_still_be_cancelled(client, auth):
+    order_id = ready_order(client, auth)
+    for status in ("assigned", "picked_up"):
+        assert move(client, auth, "rider", order_id, status).status_code == 200
+    assert move(client, auth, "admin", order_id, "cancelled").status_code == 200
+    assert history(order_id)[-1] == ("picked_up", "cancelled")
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from app.models.orders import Order
+from app.models.user import User
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor, split_page
+from database import engine
+
+
+class Row:
+    def __init__(self, row_id: int, created_at: datetime):
+        self.order_id = row_id
+        self.created_at = created_at
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 3, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_invalid_cursor_is_a_400():
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor("not-a-cursor")
+    assert excinfo.value.status_code == 400
+
+
+def test_split_page_uses_the_extra_row():
+    rows = [Row(row_id, datetime(2025, 1, row_id)) for row_id in (3, 2, 1)]
+    page, next_cursor = split_page(rows, 2, "created_at", "order_id")
+    assert [row.order_id for row in page] == [3, 2]
+    assert decode_cursor(next_cursor) == (datetime(2025, 1, 2), 2)
+    assert split_page(rows, 3, "created_at", "order_id") == (rows, None)
+
+
+def place_orders(client, headers, count: int) -> list[int]:
+    ids = []
+    for _ in range(count):
+        response = client.post("/orders/", json={"items": [{"item_id": 1, "quantity": 1}]}, headers=headers)
+        assert response.status_code == 201, response.text
+        ids.append(response.json()["order_id"])
+    return ids
+
+
+def test_orders_are_paged_by_default(client, auth):
+    # One more than a page, next to the 3 seeded orders
+    with Session(engine) as session:
+        customer_id = session.exec(select(User.user_id).where(User.email == "customer@example.com")).one()
+        session.add_all(Order(customer_id=customer_id, total_amount=1.0, status="pending") for _ in range(DEFAULT_PAGE_SIZE + 1))
+        session.commit()
+    first = client.get("/orders/", headers=auth("admin"))
+    assert first.status_code == 200
+    assert len(first.json()) == DEFAULT_PAGE_SIZE
+    rest = client.get("/orders/", params={"cursor": first.headers["X-Next-Cursor"]}, headers=auth("admin"))
+    assert len(rest.json()) == 4
+    assert "X-Next-Cursor" not in rest.headers
+    assert client.get("/orders/", params={"limit": MAX_PAGE_SIZE + 1}, headers=auth("admin")).status_code == 422
+
+
+def test_keyset_pages_cover_every_order_once(client, auth):
+    place_orders(client, auth("customer"), 4)
+    everything = [order["order_id"] for order in client.get("/orders/", headers=auth("admin")).json()]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2} if cursor is None else {"cursor": cursor, "limit": 2}
+        response = client.get("/orders/", params=params, headers=auth("admin"))
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(order["order_id"] for order in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == everything
+    created = [order["created_at"] for order in client.get("/orders/", headers=auth("admin")).json()]
+    assert created == sorted(created, reverse=True)
+
+
+def test_status_filter_and_exact_count(client, auth):
+    place_orders(client, auth("customer"), 2)
+    response = client.get(
+        "/orders/", params={"status": ["pending"], "count": "exact", "limit": 1}, headers=auth("admin"),
+    )
+    assert response.status_code == 200
+    pending = int(response.headers["X-Total-Count"])
+    assert pending >= 2
+    assert [order["status"] for order in response.json()] == ["pending"]
+    assert "X-Next-Cursor" in response.headers
@@ -0,0 +1,42 @@
+from app import profiling
+from app.menu_cache import menu_cache
+
+
+def request_stats(client, auth) -> dict:
+    response = client.get("/admin/system/requests", headers=auth("admin"))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_queries_and_rows_are_counted_per_endpoint(client, auth):
+    client.delete("/admin/system/requests", headers=auth("admin"))
+    items = client.get("/menu/").json()
+    # Served from the menu cache: no queries
+    client.get("/menu/")
+
+    stats = request_stats(client, auth)
+    menu = stats["endpoints"]["GET /menu/"]
+    assert (menu["count"], menu["flagged"], menu["errors"]) == (2, 0, 0)
+    assert (menu["max_queries"], menu["avg_queries"]) == (1, 0.5)
+    # The rows the menu query read, seen through the async adapter's buffered cursor
+    assert menu["avg_rows"] == len(items) / 2
+    assert menu["avg_db_ms"] > 0
+    assert stats["slow"] == []
+
+
+def test_requests_over_budget_are_flagged(client, auth, monkeypatch, caplog):
+    client.delete("/admin/system/requests", headers=auth("admin"))
+    monkeypatch.setattr(profiling, "PROFILE_MAX_QUERIES", 0)
+    menu_cache.invalidate()
+    with caplog.at_level("WARNING", logger="app.profiling"):
+        items = client.get("/menu/").json()
+        client.get("/menu/")
+
+    stats = request_stats(client, auth)
+    assert stats["budgets"]["max_queries"] == 0
+    assert stats["endpoints"]["GET /menu/"]["flagged"] == 1
+    [slow] = [entry for entry in stats["slow"] if entry["endpoint"] == "GET /menu/"]
+    assert (slow["queries"], slow["rows"], slow["status_code"]) == (1, len(items), 200)
+    assert slow["reasons"] == ["1 queries > 0"]
+    assert slow["top_statements"][0]["statement"].startswith("SELECT")
+    assert "Request over budget (1 queries > 0): GET /menu/" in caplog.text
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta, timezone
+
+
+def deliver_new_order(client, auth) -> int:
+    order_id = client.post("/orders/", json={"items": [{"item_id": 1, "quantity": 2}]}, headers=auth("customer")).json()["order_id"]
+    for status in ("preparing", "ready"):
+        assert client.put(f"/orders/{order_id}/status", params={"status": status}, headers=auth("admin")).status_code == 200
+    for status in ("assigned", "picked_up", "delivered"):
+        response = client.post(f"/rider/orders/{order_id}/status", params={"status": status}, headers=auth("rider"))
+        assert response.status_code == 200, response.text
+    return order_id
+
+
+def test_earnings_report_today_outside_the_requested_range(client, auth):
+    before = client.get("/rider/earnings", headers=auth("rider")).json()["today"]["delivered_orders"]
+    deliver_new_order(client, auth)
+    last_week = datetime.now(timezone.utc).date() - timedelta(days=7)
+    response = client.get("/rider/earnings", params={"start": str(last_week), "end": str(last_week)}, headers=auth("rider"))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["delivered_orders"] == 0
+    assert body["today"]["delivered_orders"] == before + 1
+
+
+def test_history_lists_the_riders_deliveries(client, auth):
+    order_id = deliver_new_order(client, auth)
+    response = client.get("/rider/orders/history", headers=auth("rider"))
+    assert response.status_code == 200
+    assert order_id in [order["order_id"] for order in response.json()]
+    assert client.get("/rider/orders/assigned", headers=auth("customer")).status_code == 403
@@ -0,0 +1,57 @@
+import asyncio
+import logging
+import time
+
+from app.rider_locations import LocationFlusher, RiderLocationStore
+
+
+def test_out_of_order_fixes_are_dropped():
+    store = RiderLocationStore()
+    now = time.time()
+    assert store.update(1, 1.0, 1.0, now - 10)
+    assert not store.update(1, 2.0, 2.0, now - 20)
+    assert store.get(1)[:2] == (1.0, 1.0)
+    assert store.counters["stale_fixes"] == 1
+
+
+def test_future_fixes_are_clamped_to_arrival_time():
+    store = RiderLocationStore()
+    before = time.time()
+    assert store.update(1, 1.0, 1.0, before + 86400)
+    assert before <= store.get(1)[2] <= time.time()
+    assert store.counters["future_fixes"] == 1
+    # The next correctly dated fix is not shadowed by the bogus timestamp
+    time.sleep(0.001)
+    assert store.update(1, 2.0, 2.0, time.time())
+    assert store.get(1)[:2] == (2.0, 2.0)
+
+
+def test_flush_failures_are_logged_and_positions_kept(caplog):
+    class BrokenSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        async def exec(self, statement, params=None):
+            raise RuntimeError("no such column: location_updated_at")
+
+    async def scenario():
+        store = RiderLocationStore()
+        store.update(7, 1.0, 2.0)
+        flusher = LocationFlusher(store, BrokenSession, interval=0.001)
+        flusher.start()
+        for _ in range(100):
+            if store.counters["flush_errors"]:
+                break
+            await asyncio.sleep(0.001)
+        await flusher.stop()
+        return store
+
+    with caplog.at_level(logging.ERROR, logger="app.rider_locations"):
+        store = asyncio.run(scenario())
+    assert store.counters["flush_errors"] >= 1
+    assert store.stats()["pending"] == 1
+    assert "no such column: location_updated_at" in caplog.text
+    assert "Final flush of rider locations failed" in caplog.text
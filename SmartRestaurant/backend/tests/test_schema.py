@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import inspect, text
+from sqlmodel import Session, select
+
+import add_timestamp_columns
+from app.models.orders import Order
+from database import create_db_and_tables, engine
+
+
+def drop_timestamp_columns():
+    """Put the seeded database back to its shape before the stage columns."""
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_orders_delivered_at"))
+        for table, column, _ in add_timestamp_columns.STATEMENTS:
+            connection.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+
+
+def test_startup_refuses_an_outdated_schema_until_migrated(client):
+    drop_timestamp_columns()
+    with pytest.raises(RuntimeError, match="orders.ready_at"):
+        create_db_and_tables()
+
+    add_timestamp_columns.main()
+    assert "ix_orders_delivered_at" in {index["name"] for index in inspect(engine).get_indexes("orders")}
+    with Session(engine) as session:
+        delivered = session.exec(select(Order).where(Order.status == "delivered")).all()
+        assert all(order.ready_at and order.delivered_at for order in delivered)
+
+    # A second run finds nothing to do
+    assert add_timestamp_columns.add_columns() == []
+    create_db_and_tables()
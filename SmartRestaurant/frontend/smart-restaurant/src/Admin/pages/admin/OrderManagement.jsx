@@ -8,49 +8,80 @@ import {
   MoreHorizontal,
 } from "lucide-react";
 import api from "../../../api/axios";
+import { fetchPage } from "../../../api/pagination";
+
+// Newest orders first; the list is paged and older pages load on demand
+const filterParams = (filter) => (filter === "all" ? {} : { status: filter });
 
 export default function OrderManagement() {
-  const [orders, setOrders] = useState([]);
+  // The newest page (refreshed by polling) and pages loaded with "Load more"
+  const [recent, setRecent] = useState([]);
+  const [older, setOlder] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [filter, setFilter] = useState("all");
 
   useEffect(() => {
-    fetchOrders();
+    setOlder([]);
+    setNextCursor(null);
+    setLoading(true);
+    fetchOrders(true);
     // Poll for updates every 10s
-    const interval = setInterval(fetchOrders, 10000);
+    const interval = setInterval(() => fetchOrders(false), 10000);
     return () => clearInterval(interval);
-  }, []);
+  }, [filter]);
 
-  const fetchOrders = async () => {
+  const fetchOrders = async (reset) => {
     try {
-      const res = await api.get("/orders/");
-      // Admin sees all orders, sort by new
-      const sorted = res.data.sort(
-        (a, b) => new Date(b.created_at) - new Date(a.created_at)
+      const { data, nextCursor: cursor } = await fetchPage(
+        "/orders/",
+        filterParams(filter)
       );
-      setOrders(sorted);
+      setRecent(data);
+      // Once older pages are loaded, the cursor points past them; keep it
+      if (reset) setNextCursor(cursor);
       setLoading(false);
     } catch (error) {
       console.error("Failed to fetch orders:", error);
     }
   };
 
+  const loadMore = async () => {
+    try {
+      const { data, nextCursor: cursor } = await fetchPage(
+        "/orders/",
+        filterParams(filter),
+        nextCursor
+      );
+      setOlder([...older, ...data]);
+      setNextCursor(cursor);
+    } catch (error) {
+      console.error("Failed to load more orders:", error);
+    }
+  };
+
+  // Orders can move between pages while polling; show each once
+  const recentIds = new Set(recent.map((o) => o.order_id));
+  const orders = [...recent, ...older.filter((o) => !recentIds.has(o.order_id))];
+
   const updateStatus = async (orderId, newStatus) => {
     try {
       await api.put(`/orders/${orderId}/status`, null, {
         params: { status: newStatus },
       });
-      setOrders(
-        orders.map((o) =>
+      const update = (list) =>
+        list.map((o) =>
           o.order_id === orderId ? { ...o, status: newStatus } : o
-        )
-      );
+        );
+      setRecent(update);
+      setOlder(update);
     } catch (error) {
       console.error("Failed to update status:", error);
       alert("Failed to update status");
     }
   };
 
+  // The server filters; this only hides orders that just changed status
   const filteredOrders =
     filter === "all" ? orders : orders.filter((o) => o.status === filter);
 
@@ -58,6 +89,8 @@ export default function OrderManagement() {
     switch (status) {
       case "pending":
         return "bg-yellow-100 text-yellow-800 border-yellow-200";
+      case "preparing":
+        return "bg-orange-100 text-orange-800 border-orange-200";
       case "assigned":
         return "bg-blue-100 text-blue-800 border-blue-200";
       case "ready":
@@ -100,8 +133,9 @@ export default function OrderManagement() {
             {[
               "all",
               "pending",
-              "assigned",
+              "preparing",
               "ready",
+              "assigned",
               "picked_up",
               "delivered",
             ].map((s) => (
@@ -158,12 +192,20 @@ export default function OrderManagement() {
               <div className="flex gap-2">
                 {order.status === "pending" && (
                   <button
-                    onClick={() => updateStatus(order.order_id, "ready")}
+                    onClick={() => updateStatus(order.order_id, "preparing")}
                     className="px-3 py-1 bg-primary-600 text-white text-xs font-bold rounded hover:bg-primary-700 transition-colors"
                   >
                     Prepare
                   </button>
                 )}
+                {order.status === "preparing" && (
+                  <button
+                    onClick={() => updateStatus(order.order_id, "ready")}
+                    className="px-3 py-1 bg-primary-600 text-white text-xs font-bold rounded hover:bg-primary-700 transition-colors"
+                  >
+                    Mark Ready
+                  </button>
+                )}
                 {order.status === "ready" && (
                   <span className="text-xs text-slate-400 italic">
                     Waiting for Rider...
@@ -181,6 +223,17 @@ export default function OrderManagement() {
           </div>
         )}
       </div>
+
+      {nextCursor && (
+        <div className="text-center">
+          <button
+            onClick={loadMore}
+            className="px-4 py-2 bg-white border border-slate-200 rounded-lg text-slate-700 hover:bg-slate-50"
+          >
+            Load more
+          </button>
+        </div>
+      )}
     </div>
   );
 }
@@ -1,6 +1,7 @@
 import { useState, useEffect } from "react";
 import { useLocation, Link } from "react-router-dom";
 import api from "../../api/axios";
+import { fetchPage } from "../../api/pagination";
 
 export default function OrderTracking() {
   const location = useLocation();
@@ -11,12 +12,12 @@ export default function OrderTracking() {
     const fetchOrderId = async () => {
       if (!orderId) {
         try {
-          // Fetch latest active order if none provided
-          const res = await api.get("/orders/");
-          // Find first order that is NOT delivered or cancelled
-          const activeOrder = res.data
-            .sort((a, b) => new Date(b.created_at) - new Date(a.created_at)) // Newest first
-            .find((o) => !["delivered", "cancelled"].includes(o.status));
+          // Fetch latest active order (NOT delivered or cancelled) if none provided
+          const { data } = await fetchPage("/orders/", {
+            status: ["pending", "preparing", "ready", "assigned", "picked_up"],
+            limit: 1,
+          });
+          const activeOrder = data[0];
 
           if (activeOrder) {
             setOrderId(activeOrder.order_id);
@@ -151,7 +151,7 @@ export default function RiderOrderDetails() {
 
         {/* Action Button Fixed at Bottom */}
         <div className="p-4 bg-background border-t border-border">
-          {order.status === "pending" && (
+          {order.status === "ready" && (
             <button
               onClick={() => updateStatus("assigned")}
               className="w-full py-4 bg-primary hover:bg-primary-hover text-white font-bold rounded-xl shadow-lg shadow-primary/25 transition-all text-center flex items-center justify-center space-x-2"
@@ -159,7 +159,7 @@ export default function RiderOrderDetails() {
               <span>Accept Delivery</span>
             </button>
           )}
-          {(order.status === "assigned" || order.status === "ready") && (
+          {order.status === "assigned" && (
             <button
               onClick={() => updateStatus("picked_up")}
               className="w-full py-4 bg-blue-600 hover:bg-blue-500 text-white font-bold rounded-xl shadow-lg shadow-blue-500/25 transition-all text-center flex items-center justify-center space-x-2"
@@ -1,11 +1,12 @@
 import api from "../../api/axios"; // Use the shared axios instance with interceptors
+import { fetchAllPages } from "../../api/pagination";
 
 export const riderApi = {
   // Get orders assigned to the rider + available orders
   getAssignedOrders: async () => {
     try {
-      // GET /orders/ for rider (requires trailing slash)
-      return await api.get("/orders/");
+      // GET /orders/ for rider (requires trailing slash), every page of it
+      return { data: await fetchAllPages("/orders/", { limit: 200 }) };
     } catch (error) {
       console.error("API Error:", error);
       return { data: [] };
@@ -15,11 +16,11 @@ export const riderApi = {
   // Get order history
   getOrderHistory: async () => {
     try {
-      const response = await api.get("/orders");
-      // Filter locally for delivered/cancelled/done
-      const history = response.data.filter(
-        (o) => o.status === "delivered" || o.status === "cancelled"
-      );
+      // Finished orders only, filtered by the server
+      const history = await fetchAllPages("/orders/", {
+        status: ["delivered", "cancelled"],
+        limit: 200,
+      });
       return { data: history };
     } catch (error) {
       console.error("History API Error:", error);
@@ -0,0 +1,28 @@
+import api from "./axios";
+
+// List endpoints such as GET /orders/ return one page at a time, newest
+// first, with the cursor of the next page in the X-Next-Cursor header
+export async function fetchPage(path, params = {}, cursor = null) {
+  const response = await api.get(path, {
+    params: cursor ? { ...params, cursor } : params,
+    // status=a&status=b, the way FastAPI reads repeated query parameters
+    paramsSerializer: { indexes: null },
+  });
+  return {
+    data: response.data,
+    nextCursor: response.headers["x-next-cursor"] || null,
+  };
+}
+
+// Follows X-Next-Cursor until the list ends (or maxPages, as a safety net)
+export async function fetchAllPages(path, params = {}, maxPages = 20) {
+  let items = [];
+  let cursor = null;
+  for (let page = 0; page < maxPages; page++) {
+    const { data, nextCursor } = await fetchPage(path, params, cursor);
+    items = items.concat(data);
+    cursor = nextCursor;
+    if (!cursor) break;
+  }
+  return items;
+}